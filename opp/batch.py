@@ -0,0 +1,189 @@
+from opp import fingerprint_handler
+from opp import ftype
+from opp import search
+from opp import refresh
+from concurrent.futures import ThreadPoolExecutor
+import json
+import threading
+import time
+
+# Same bounds as the depth of the REST API
+MIN_DEPTH = 1
+MAX_DEPTH = 10
+FILTER_TYPES = set(ftype.SCRAPABLE_TYPES) | set(ftype.SCRAP_RETURN)
+TARGET_OPTIONS = ["target", "depth", "initial_filters", "active_search", "osint_allow", "osint_deny", "timeout", "id"]
+
+def read_targets(lines):
+    """ This generator reads the targets of a batch, one per line.
+    A line is either a JSON object with a "target" and optionally "depth", "initial_filters", "active_search", "osint_allow", "osint_deny", "timeout" and "id",
+    or a plain target. Empty lines and lines starting with # are skipped.
+
+    Args:
+        lines (iterable): Lines of the targets file.
+
+    Yields:
+        tuple: Line number, options of the target (or None) and error (or None).
+    """
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if not line.startswith("{"):
+            yield line_number, {"target": line}, None
+            continue
+        try:
+            spec = json.loads(line)
+        except ValueError as error:
+            yield line_number, None, "invalid JSON: %s" % error
+            continue
+        error = check_target(spec)
+        yield line_number, (None if error else spec), error
+
+def check_target(spec: dict) -> str:
+    """ This function checks the options of a target.
+
+    Args:
+        spec (dict): Options of the target.
+
+    Returns:
+        str: Description of the first error found, or None.
+    """
+    if not isinstance(spec, dict):
+        return "a JSON object is expected"
+    unknown = [name for name in spec if name not in TARGET_OPTIONS]
+    if unknown:
+        return "unknown options: %s" % ", ".join(unknown)
+    if not isinstance(spec.get("target"), str) or not spec["target"]:
+        return "target is missing"
+    depth = spec.get("depth", 1)
+    # bool is a subclass of int, true must not be read as a depth of 1
+    if not isinstance(depth, int) or isinstance(depth, bool) or not MIN_DEPTH <= depth <= MAX_DEPTH:
+        return "depth must be an integer from %d to %d" % (MIN_DEPTH, MAX_DEPTH)
+    timeout = spec.get("timeout", 1)
+    if not isinstance(timeout, (int, float)) or isinstance(timeout, bool) or timeout <= 0:
+        return "timeout must be a positive number"
+    if not isinstance(spec.get("active_search", False), bool):
+        return "active_search must be a boolean"
+    for name in ["osint_allow", "osint_deny"]:
+        modules = spec.get(name, [])
+        if not isinstance(modules, list) or not all(isinstance(module, str) for module in modules):
+            return "%s must be a list of module names" % name
+    filters = spec.get("initial_filters", [])
+    if not isinstance(filters, list) or not all(isinstance(f, dict) and "value" in f and "type" in f and "positive" in f for f in filters):
+        return "initial_filters must be a list of {value, type, positive}"
+    # Same checks as the filters of the REST API
+    for f in filters:
+        if not isinstance(f["value"], str) or not f["value"]:
+            return "the value of a filter must be a non-empty string"
+        if f["type"] is not None and f["type"] not in FILTER_TYPES:
+            return "the type of a filter must be null or one of %s" % ", ".join(sorted(FILTER_TYPES))
+        if not isinstance(f["positive"], bool):
+            return "positive must be a boolean in a filter"
+    return None
+
+def run_target(line_number: int, spec: dict, search_depth: int, initial_filters: list, workers: int, context_options: dict, storage=None, refresh_ttl: dict = None,
+               strategy: str = None, budget=None, timeout: float = None) -> dict:
+    """ This function builds the fingerprint of a target of a batch.
+
+    Args:
+        line_number (int): Line of the target in the targets file.
+        spec (dict): Options of the target, they take precedence over the ones of the batch.
+        search_depth (int): Default maximum depth of the search.
+        initial_filters (list): Initial filters added to the ones of the target.
+        workers (int): Maximum number of concurrent searches and scraps of the target.
+        context_options (dict): Default keyword arguments of :class:`search.SearchContext`.
+        storage (:class:`storage.Storage`, optional): If given, the fingerprint is stored in it and the ID of its run is added to the record. Defaults to None.
+        refresh_ttl (dict, optional): If given with `storage`, the last stored fingerprint of the target is refreshed with these lifetimes,
+            and the changes are added to the record. Defaults to None.
+        strategy (str, optional): Strategy of the crawl, see :class:`fingerprint_handler.FingerprintHandler`. Defaults to None.
+        budget (:class:`crawler.Budget`, optional): Limits of the crawl of the target. Defaults to None.
+        timeout (float, optional): Default maximum duration of the search in seconds. Defaults to None.
+
+    Returns:
+        dict: JSON compatible record with the nodes and edges of the fingerprint, or the error raised.
+    """
+    record = {"line": line_number, "target": spec["target"]}
+    if "id" in spec:
+        record["id"] = spec["id"]
+    record["started_at"] = time.time()
+    start = time.perf_counter()
+    research_instance = None
+    # Every error must give a record : the callback writing it cannot report one
+    try:
+        options = dict(context_options)
+        options.update({name: spec[name] for name in ["active_search", "osint_allow", "osint_deny"] if name in spec})
+        target_filters = spec.get("initial_filters", []) + initial_filters
+        context = search.SearchContext(**options)
+        previous = None
+        if storage is not None and refresh_ttl is not None:
+            previous = refresh.PreviousFingerprint.load(storage, spec["target"], refresh_ttl, initial_filters=target_filters, search_context=context.get_settings())
+        research_instance = fingerprint_handler.FingerprintHandler(target=spec["target"], search_depth=spec.get("depth", search_depth), initial_filters=target_filters,
+                                                                   workers=workers, context=context, previous=previous,
+                                                                   strategy=strategy, budget=budget, timeout=spec.get("timeout", timeout))
+        fingerprint = research_instance.get_fingerprint()
+        record["status"] = "done"
+        record["result"] = research_instance.get_json_nodes_edges(fingerprint)
+        if storage is not None:
+            record["run_id"] = storage.store_graph(fingerprint, started_at=record["started_at"], initial_filters=target_filters, fetched_at=research_instance.fetched_at,
+                                                   search_context=context.get_settings())
+        if previous is not None:
+            record["changes"] = previous.diff(fingerprint)
+    except Exception as error:
+        record["status"] = "failed"
+        record["error"] = repr(error)
+    record["elapsed"] = round(time.perf_counter() - start, 3)
+    if research_instance is not None:
+        record["progress"] = research_instance.progress.as_dict()
+    return record
+
+def run_batch(lines, output, concurrency: int = 4, search_depth: int = 3, initial_filters: list = [], workers: int = 8, context_options: dict = {}, storage=None, refresh_ttl: dict = None,
+              strategy: str = None, budget=None, timeout: float = None) -> int:
+    """ This function builds the fingerprints of all targets of a batch, `concurrency` at a time, in the same process so HTTP pools and caches are shared.
+    One JSON record is written per target to `output` as soon as its fingerprint is built, so records are in completion order.
+    Targets are read as they are needed, so the targets file can be as large as wanted.
+
+    Args:
+        lines (iterable): Lines of the targets file, see `read_targets()`.
+        output: Text file in which records are written.
+        concurrency (int, optional): Number of fingerprints built at the same time. Defaults to 4.
+        search_depth (int, optional): Default maximum depth of the search. Defaults to 3.
+        initial_filters (list, optional): Initial filters added to the ones of each target. Defaults to [].
+        workers (int, optional): Maximum number of concurrent searches and scraps per target. Defaults to 8.
+        context_options (dict, optional): Default keyword arguments of :class:`search.SearchContext`. Defaults to {}.
+        storage (:class:`storage.Storage`, optional): If given, each fingerprint is stored in it as a new run. Defaults to None.
+        refresh_ttl (dict, optional): If given with `storage`, the last stored fingerprint of each target is refreshed with these lifetimes. Defaults to None.
+        strategy (str, optional): Strategy of the crawls, see :class:`fingerprint_handler.FingerprintHandler`. Defaults to None.
+        budget (:class:`crawler.Budget`, optional): Limits of the crawl of each target. Defaults to None.
+        timeout (float, optional): Default maximum duration of the search of each target in seconds. Defaults to None.
+
+    Returns:
+        int: Number of targets which failed.
+    """
+    concurrency = max(1, concurrency)
+    write_lock = threading.Lock()
+    pending = threading.BoundedSemaphore(2 * concurrency)
+    failed = 0
+
+    def write(record):
+        nonlocal failed
+        with write_lock:
+            if record["status"] != "done":
+                failed += 1
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+
+    def done(future):
+        try:
+            write(future.result())
+        finally:
+            pending.release()
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="opp-batch") as executor:
+        for line_number, spec, error in read_targets(lines):
+            if error:
+                write({"line": line_number, "status": "invalid", "error": error})
+                continue
+            pending.acquire()
+            executor.submit(run_target, line_number, spec, search_depth, initial_filters, workers, context_options, storage, refresh_ttl,
+                            strategy, budget, timeout).add_done_callback(done)
+    return failed
@@ -0,0 +1,171 @@
+from contextlib import contextmanager
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import WebDriverException
+from opp import deadline
+import atexit
+import queue
+import threading
+
+class BrowserPool:
+    """ This singleton class keeps a bounded pool of headless Chrome browsers, so scrappers do not pay the start of a browser for every page.
+
+    Between two uses, cookies and storage of the browser are cleared. Browsers are health-checked before being lent,
+    and recycled after `max_pages` pages to bound their memory.
+
+    Attributes:
+        size (int, optional): Maximum number of browsers. Defaults to 2.
+        max_pages (int, optional): Number of pages loaded by a browser before it is recycled. Defaults to 50.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls, size: int = 2, max_pages: int = 50):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls.create(size, max_pages)
+        return cls._instance
+
+    @classmethod
+    def configure(cls, size: int = 2, max_pages: int = 50) -> "BrowserPool":
+        """ This method replaces the pool by a new one with the given options, browsers of the previous pool are closed.
+
+        Returns:
+            BrowserPool: Configured pool.
+        """
+        with cls._lock:
+            if cls._instance is not None:
+                cls._instance.close()
+            cls._instance = cls.create(size, max_pages)
+        return cls._instance
+
+    @classmethod
+    def create(cls, size: int, max_pages: int) -> "BrowserPool":
+        """ This method creates a pool, browsers are only started when needed.
+
+        Returns:
+            BrowserPool: Created pool.
+        """
+        instance = super().__new__(cls)
+        instance.size = max(1, size)
+        instance.max_pages = max_pages
+        instance.slots = threading.BoundedSemaphore(instance.size)
+        instance.idle = queue.LifoQueue()
+        instance.pages = {}
+        atexit.register(instance.close)
+        return instance
+
+    def new_browser(self) -> webdriver.Chrome:
+        """ This method starts a new headless browser.
+
+        Returns:
+            webdriver.Chrome: Started browser.
+        """
+        options = Options()
+        options.add_argument("--headless")
+        options.add_argument("--disable-dev-shm-usage")
+        options.add_argument("--disable-gpu")
+        driver = webdriver.Chrome(options=options)
+        self.pages[driver] = 0
+        return driver
+
+    def acquire(self) -> webdriver.Chrome:
+        """ This method lends a healthy browser, it waits for a browser to be released if all of them are in use.
+
+        Raises:
+            deadline.DeadlineExceeded: If no browser is released before the deadline of the current run.
+
+        Returns:
+            webdriver.Chrome: Browser to use.
+        """
+        left = deadline.remaining()
+        if not self.slots.acquire(timeout=max(0.0, left) if left is not None else None):
+            raise deadline.DeadlineExceeded("no browser is available before the deadline")
+        try:
+            while True:
+                try:
+                    driver = self.idle.get_nowait()
+                except queue.Empty:
+                    return self.new_browser()
+                if self.is_healthy(driver):
+                    return driver
+                self.discard(driver)
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def release(self, driver: webdriver.Chrome) -> None:
+        """ This method gives back a browser to the pool once its cookies and storage are cleared, or closes it if it must be recycled.
+
+        Args:
+            driver (webdriver.Chrome): Browser to give back.
+        """
+        try:
+            self.pages[driver] = self.pages.get(driver, 0) + 1
+            if self.pages[driver] >= self.max_pages:
+                self.discard(driver)
+                return
+            try:
+                driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+            except WebDriverException:
+                pass
+            try:
+                # Cookies of all domains, not only the ones of the current page
+                driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+                driver.get("about:blank")
+            except WebDriverException:
+                self.discard(driver)
+                return
+            self.idle.put(driver)
+        finally:
+            self.slots.release()
+
+    def discard(self, driver: webdriver.Chrome) -> None:
+        """ This method closes a browser.
+
+        Args:
+            driver (webdriver.Chrome): Browser to close.
+        """
+        self.pages.pop(driver, None)
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+
+    def is_healthy(self, driver: webdriver.Chrome) -> bool:
+        """ This method checks that a browser still answers.
+
+        Args:
+            driver (webdriver.Chrome): Browser to check.
+
+        Returns:
+            bool: True if the browser can be used.
+        """
+        try:
+            driver.current_url
+            return len(driver.window_handles) > 0
+        except WebDriverException:
+            return False
+
+    @contextmanager
+    def browser(self):
+        """ This context manager lends a browser and gives it back to the pool at the end of the block.
+
+        Yields:
+            webdriver.Chrome: Browser to use.
+        """
+        driver = self.acquire()
+        try:
+            yield driver
+        finally:
+            self.release(driver)
+
+    def close(self) -> None:
+        """ This method closes all idle browsers of the pool.
+
+        """
+        while True:
+            try:
+                self.discard(self.idle.get_nowait())
+            except queue.Empty:
+                return
@@ -0,0 +1,339 @@
+from opp import ftype
+from opp import http_client
+from collections import OrderedDict
+from typing import Optional
+from urllib.parse import urlparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+DEFAULT_DB_FILE = os.environ.get("OPP_CACHE_FILE", os.path.join(os.path.expanduser("~"), ".cache", "opp", "cache.db"))
+
+def open_database(db_file: str) -> sqlite3.Connection:
+    """ This function opens a SQLite database shared by the threads of the process, creating its directory if necessary.
+
+    Args:
+        db_file (str): Path of the database file, ":memory:" for a database which does not survive the process.
+
+    Returns:
+        sqlite3.Connection: Connection to the database, access must be serialized by the caller.
+    """
+    if db_file != ":memory:" and os.path.dirname(db_file):
+        os.makedirs(os.path.dirname(db_file), exist_ok=True)
+    db_conn = sqlite3.connect(db_file, check_same_thread=False, isolation_level=None)
+    db_conn.execute("PRAGMA journal_mode=WAL")
+    db_conn.execute("PRAGMA synchronous=NORMAL")
+    return db_conn
+
+
+class SearchCache:
+    """ This singleton class caches the results of search engines, keyed by the backend and the query prepared by :class:`Search <src.search.Search>`.
+
+    Recent entries are kept in memory with a LRU eviction, all entries are stored in a SQLite file so they survive restarts and are shared between processes.
+    Empty results are often due to a temporary blocking of the search engine, so they expire sooner.
+
+    Attributes:
+        db_file (str, optional): SQLite file of the cache. Defaults to `DEFAULT_DB_FILE`, which can be set with the `OPP_CACHE_FILE` environment variable.
+        ttl (int, optional): Lifetime of entries in seconds, 0 disables the cache. Defaults to 1 day.
+        empty_ttl (int, optional): Lifetime of empty results in seconds. Defaults to 1 hour.
+        max_entries (int, optional): Number of entries kept in memory. Defaults to 1024.
+        max_stored_entries (int, optional): Number of entries kept in the SQLite file. Defaults to 100000.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls, db_file: str = None, ttl: int = None, empty_ttl: int = None, max_entries: int = None, max_stored_entries: int = None):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls.create(db_file=db_file or DEFAULT_DB_FILE, ttl=ttl, empty_ttl=empty_ttl, max_entries=max_entries, max_stored_entries=max_stored_entries)
+        return cls._instance
+
+    @classmethod
+    def configure(cls, db_file: str = DEFAULT_DB_FILE, ttl: int = None, empty_ttl: int = None, max_entries: int = None, max_stored_entries: int = None) -> "SearchCache":
+        """ This method (re)creates the instance of the cache with the given options.
+
+        Returns:
+            SearchCache: Configured cache.
+        """
+        with cls._lock:
+            cls._instance = cls.create(db_file=db_file, ttl=ttl, empty_ttl=empty_ttl, max_entries=max_entries, max_stored_entries=max_stored_entries)
+        return cls._instance
+
+    @classmethod
+    def create(cls, db_file: str = DEFAULT_DB_FILE, ttl: int = None, empty_ttl: int = None, max_entries: int = None, max_stored_entries: int = None) -> "SearchCache":
+        """ This method creates a cache with the given options, the SQLite file is opened only if the cache is enabled.
+
+        Returns:
+            SearchCache: New cache.
+        """
+        instance = super().__new__(cls)
+        instance.db_file = db_file
+        instance.ttl = 24 * 3600 if ttl is None else ttl
+        instance.empty_ttl = min(3600, instance.ttl) if empty_ttl is None else empty_ttl
+        instance.max_entries = 1024 if max_entries is None else max_entries
+        instance.max_stored_entries = 100000 if max_stored_entries is None else max_stored_entries
+        instance.entries = OrderedDict()
+        instance.lock = threading.Lock()
+        instance.hits = 0
+        instance.misses = 0
+        instance.writes = 0
+        instance.db_conn = None
+        if instance.ttl > 0:
+            instance.db_conn = open_database(db_file)
+            instance.db_conn.execute("CREATE TABLE IF NOT EXISTS search_cache (backend TEXT, query TEXT, results TEXT, expires_at REAL, accessed_at REAL, PRIMARY KEY (backend, query))")
+            instance.db_conn.execute("CREATE INDEX IF NOT EXISTS search_cache_accessed_at ON search_cache (accessed_at)")
+            instance.db_conn.execute("DELETE FROM search_cache WHERE expires_at < ?", (time.time(),))
+        return instance
+
+    def get(self, backend: str, query: str) -> Optional[list]:
+        """ This method returns the cached results of a query.
+
+        Args:
+            backend (str): Search engine used for the query.
+            query (str): Query prepared by :class:`Search <src.search.Search>`.
+
+        Returns:
+            list: Cached :class:`ftype.Result` items, None if the query is not cached or expired.
+        """
+        if self.ttl <= 0:
+            return None
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get((backend, query))
+            if entry and entry[0] >= now:
+                self.entries.move_to_end((backend, query))
+                self.hits += 1
+                return list(entry[1])
+            try:
+                row = self.db_conn.execute("SELECT results, expires_at FROM search_cache WHERE backend = ? AND query = ? AND expires_at >= ?", (backend, query, now)).fetchone()
+                if row is not None:
+                    self.db_conn.execute("UPDATE search_cache SET accessed_at = ? WHERE backend = ? AND query = ?", (now, backend, query))
+            except sqlite3.OperationalError:
+                # e.g. database locked by another process : the query is searched again
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            results = tuple(ftype.Result(*item) for item in json.loads(row[0]))
+            self.remember(backend, query, row[1], results)
+            self.hits += 1
+            return list(results)
+
+    def set(self, backend: str, query: str, results: list) -> None:
+        """ This method stores the results of a query.
+
+        Args:
+            backend (str): Search engine used for the query.
+            query (str): Query prepared by :class:`Search <src.search.Search>`.
+            results (list): Obtained :class:`ftype.Result` items.
+        """
+        if self.ttl <= 0:
+            return
+        now = time.time()
+        expires_at = now + (self.ttl if results else self.empty_ttl)
+        results = tuple(results)
+        with self.lock:
+            self.remember(backend, query, expires_at, results)
+            self.writes += 1
+            try:
+                self.db_conn.execute("INSERT OR REPLACE INTO search_cache (backend, query, results, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)", (backend, query, json.dumps([list(item) for item in results]), expires_at, now))
+                # Evict least recently used entries of the file from time to time
+                if self.writes % 1000 == 0:
+                    self.db_conn.execute("DELETE FROM search_cache WHERE rowid IN (SELECT rowid FROM search_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)", (self.max_stored_entries,))
+            except sqlite3.OperationalError:
+                # A failed write only loses the entry of the file, the connection is shared so no transaction is left open
+                if self.db_conn.in_transaction:
+                    self.db_conn.execute("ROLLBACK")
+
+    def remember(self, backend: str, query: str, expires_at: float, results: tuple) -> None:
+        """ This method adds an entry in memory, evicting the least recently used ones. The lock must be held by the caller.
+
+        """
+        self.entries[(backend, query)] = (expires_at, results)
+        self.entries.move_to_end((backend, query))
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        """ This method returns the counters of the cache.
+
+        Returns:
+            dict: Number of hits, misses and entries in memory.
+        """
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries)}
+
+
+class ResponseCache:
+    """ This singleton class caches the HTTP responses used by the scrappers.
+
+    Bodies are compressed and stored once per content, several URLs returning the same page share the same body.
+    A response younger than the freshness of its domain is returned without any request, an older one is revalidated
+    with its ETag and Last-Modified headers, so an unchanged page only costs a 304 response.
+
+    Attributes:
+        db_file (str, optional): SQLite file of the cache. Defaults to `DEFAULT_DB_FILE`, which can be set with the `OPP_CACHE_FILE` environment variable.
+        freshness (dict, optional): Freshness in seconds by domain, a domain also applies to its subdomains. Defaults to `DEFAULT_FRESHNESS`.
+        default_freshness (int, optional): Freshness in seconds of the other domains. Defaults to 1 day.
+        enabled (bool, optional): If False, all requests are sent and nothing is stored. Defaults to True.
+    """
+    DEFAULT_FRESHNESS = {
+        "github.com": 7 * 24 * 3600,
+        "nitter.net": 24 * 3600,
+        "picnob.com": 24 * 3600,
+        "tiktok.com": 24 * 3600,
+    }
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls, db_file: str = None, freshness: dict = None, default_freshness: int = None, enabled: bool = True):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls.create(db_file=db_file or DEFAULT_DB_FILE, freshness=freshness, default_freshness=default_freshness, enabled=enabled)
+        return cls._instance
+
+    @classmethod
+    def configure(cls, db_file: str = DEFAULT_DB_FILE, freshness: dict = None, default_freshness: int = None, enabled: bool = True) -> "ResponseCache":
+        """ This method (re)creates the instance of the cache with the given options.
+
+        Returns:
+            ResponseCache: Configured cache.
+        """
+        with cls._lock:
+            cls._instance = cls.create(db_file=db_file, freshness=freshness, default_freshness=default_freshness, enabled=enabled)
+        return cls._instance
+
+    @classmethod
+    def create(cls, db_file: str = DEFAULT_DB_FILE, freshness: dict = None, default_freshness: int = None, enabled: bool = True) -> "ResponseCache":
+        """ This method creates a cache with the given options, the SQLite file is opened only if the cache is enabled.
+
+        Returns:
+            ResponseCache: New cache.
+        """
+        instance = super().__new__(cls)
+        instance.db_file = db_file
+        instance.freshness = dict(cls.DEFAULT_FRESHNESS if freshness is None else freshness)
+        instance.default_freshness = 24 * 3600 if default_freshness is None else default_freshness
+        instance.enabled = enabled
+        instance.lock = threading.Lock()
+        instance.counters = {"hits": 0, "revalidated": 0, "misses": 0, "uncacheable": 0}
+        instance.db_conn = None
+        if enabled:
+            instance.db_conn = open_database(db_file)
+            instance.db_conn.execute("CREATE TABLE IF NOT EXISTS http_bodies (digest TEXT PRIMARY KEY, body BLOB)")
+            instance.db_conn.execute("CREATE TABLE IF NOT EXISTS http_responses (url TEXT PRIMARY KEY, digest TEXT, etag TEXT, last_modified TEXT, fetched_at REAL)")
+            instance.db_conn.execute("CREATE INDEX IF NOT EXISTS http_responses_digest ON http_responses (digest)")
+        return instance
+
+    def get_freshness(self, url: str) -> int:
+        """ This method returns the freshness of the domain of an URL, the most specific configured domain wins.
+
+        Args:
+            url (str): Requested URL.
+
+        Returns:
+            int: Freshness in seconds.
+        """
+        domain = (urlparse(url).hostname or "").lower()
+        while domain:
+            if domain in self.freshness:
+                return self.freshness[domain]
+            domain = domain.partition(".")[2]
+        return self.default_freshness
+
+    def fetch(self, url: str, headers: dict = None) -> bytes:
+        """ This method returns the body of an URL, from the cache if it is fresh or still valid, from the network otherwise.
+
+        Args:
+            url (str): URL to get.
+            headers (dict, optional): Headers of the request. Defaults to None.
+
+        Returns:
+            bytes: Body of the response.
+        """
+        headers = dict(headers or {})
+        if not self.enabled:
+            return http_client.HttpClient().get(url, headers=headers).content
+        with self.lock:
+            row = self.db_conn.execute("SELECT http_responses.digest, etag, last_modified, fetched_at, body FROM http_responses JOIN http_bodies ON http_responses.digest = http_bodies.digest WHERE url = ?", (url,)).fetchone()
+        if row is not None:
+            digest, etag, last_modified, fetched_at, body = row
+            if fetched_at + self.get_freshness(url) >= time.time():
+                self.count("hits")
+                return zlib.decompress(body)
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        response = http_client.HttpClient().get(url, headers=headers)
+        if response.status_code == 304 and row is not None:
+            self.count("revalidated")
+            try:
+                with self.lock:
+                    self.db_conn.execute("UPDATE http_responses SET fetched_at = ? WHERE url = ?", (time.time(), url))
+            except sqlite3.OperationalError:
+                # e.g. database locked by another process : the response is revalidated again next time
+                pass
+            return zlib.decompress(body)
+        if response.status_code != 200:
+            self.count("uncacheable")
+            return response.content
+
+        self.count("misses")
+        try:
+            self.store(url, response.content, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        except sqlite3.OperationalError:
+            # A failed write is a cache miss, the page is still returned
+            pass
+        return response.content
+
+    def store(self, url: str, content: bytes, etag: str = None, last_modified: str = None) -> None:
+        """ This method stores a response, its body is only stored if no other URL returned the same content.
+
+        Args:
+            url (str): Requested URL.
+            content (bytes): Body of the response.
+            etag (str, optional): ETag header of the response. Defaults to None.
+            last_modified (str, optional): Last-Modified header of the response. Defaults to None.
+
+        Raises:
+            sqlite3.OperationalError: If the database cannot be written, e.g. locked by another process, the transaction is rolled back.
+        """
+        digest = hashlib.sha256(content).hexdigest()
+        with self.lock:
+            self.db_conn.execute("BEGIN")
+            try:
+                previous = self.db_conn.execute("SELECT digest FROM http_responses WHERE url = ?", (url,)).fetchone()
+                self.db_conn.execute("INSERT OR IGNORE INTO http_bodies (digest, body) VALUES (?, ?)", (digest, zlib.compress(content)))
+                self.db_conn.execute("INSERT OR REPLACE INTO http_responses (url, digest, etag, last_modified, fetched_at) VALUES (?, ?, ?, ?, ?)", (url, digest, etag, last_modified, time.time()))
+                # Remove the previous body of the URL if no other URL uses it
+                if previous and previous[0] != digest:
+                    self.db_conn.execute("DELETE FROM http_bodies WHERE digest = ? AND NOT EXISTS (SELECT 1 FROM http_responses WHERE digest = ?)", (previous[0], previous[0]))
+                self.db_conn.execute("COMMIT")
+            except BaseException:
+                # The connection is shared, an open transaction would make every later store fail
+                self.db_conn.execute("ROLLBACK")
+                raise
+
+    def count(self, counter: str) -> None:
+        """ This method increments a counter of the cache.
+
+        Args:
+            counter (str): Name of the counter.
+        """
+        with self.lock:
+            self.counters[counter] += 1
+
+    def stats(self) -> dict:
+        """ This method returns the counters of the cache : fresh hits, revalidated responses, misses and uncacheable responses.
+
+        Returns:
+            dict: Counters of the cache.
+        """
+        with self.lock:
+            return dict(self.counters)
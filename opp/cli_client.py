@@ -1,8 +1,15 @@
 from opp import fingerprint_handler
 from opp import storage
 from opp import search
+from opp import cache
+from opp import osint
+from opp import batch
+from opp import refresh
+from opp import crawler
+from opp import parse_pool
 import sys
 import getopt
+import time
 from asciitree import LeftAligned
 
 def cli_usage(output: str):
@@ -12,7 +19,8 @@ def cli_usage(output: str):
         output (str): Output to print in.
     """
     program_name = sys.argv[0].split("/")[-1]
-    print(f"Usage: {program_name} [OPTIONS] <target>\n", file=output)
+    print(f"Usage: {program_name} [OPTIONS] <target>", file=output)
+    print(f"       {program_name} [OPTIONS] --targets-file <file>\n", file=output)
     print("General:", file=output)
     print("\t-h,\t--help\t\t\tprint this help.", file=output)
     print("\t-d,\t--depth\t\t\tspecify the maximum depth of the search.", file=output)
@@ -21,8 +29,25 @@ def cli_usage(output: str):
     print("\t-o,\t--active_search\t\tactivate OSINT techniques in the research process", file=output)
     print("\t-q,\t--quiet\t\t\tdisable the display of the ascii tree in output", file=output)
     print("\t-s,\t--store\t\t\tstore obtained fingerprint as : none (default), db (SQLITE file only), dot (SQLITE file + DOT file + PNG)", file=output)
+    print("\t\t--db-file\t\tspecify the SQLITE file in which fingerprints are stored, each one as a new run (default opp.db)", file=output)
+    print("\t\t--refresh\t\tstart from the last stored fingerprint of the target, only refresh stale footprints, store the new one and print the changes", file=output)
+    print("\t\t--refresh-ttl\t\tspecify the lifetime of stored results in seconds, by footprint type or request kind (default search=86400,scrap=604800)", file=output)
     print("\t-k,\t--api_key\t\tspecify Google search API Key, if empty, the program will get results using a scrapping library", file=output)
     print("\t-c,\t--cse_id\t\tspecify Custom Search Engine ID, if empty, the program will get results using a scrapping library", file=output)
+    print("\t-w,\t--workers\t\tspecify the maximum number of concurrent searches and scraps (default 8)", file=output)
+    print("\t-t,\t--timeout\t\tspecify the maximum duration of the search in seconds, the footprints found so far are returned and the unfinished ones marked as truncated", file=output)
+    print("\t\t--strategy\t\tspecify the order in which footprints are expanded : depth_first (default) or best_first (default with a budget)", file=output)
+    print("\t\t--max-requests\t\tspecify the maximum number of searches and scraps, the most promising footprints being expanded first", file=output)
+    print("\t\t--max-fanout\t\tspecify the maximum number of footprints expanded at each level of the tree", file=output)
+    print("\t\t--max-time\t\tspecify the maximum duration of the search in seconds", file=output)
+    print("\t\t--parse-workers\t\tspecify the number of processes parsing scrapped pages, 0 parses them in the search threads (default 0)", file=output)
+    print("\t\t--cache-file\t\tspecify the SQLITE file used to cache search results and scrapped pages (default ~/.cache/opp/cache.db)", file=output)
+    print("\t\t--cache-ttl\t\tspecify the lifetime of cached search results in seconds, 0 disables the caches (default 86400)", file=output)
+    print("\t\t--osint-allow\t\tspecify a comma-separated list of the only OSINT modules to launch (e.g. instagram,holehe_github)", file=output)
+    print("\t\t--osint-deny\t\tspecify a comma-separated list of OSINT modules not to launch", file=output)
+    print("Batch:", file=output)
+    print("\t\t--targets-file\t\tread targets from a file (- for stdin), one per line, as text or JSON with per-target options, and write one NDJSON record per target", file=output)
+    print("\t\t--concurrency\t\tspecify the number of targets investigated at the same time in batch mode (default 4)", file=output)
     print("\n", file=output)
 
 def run():
@@ -31,15 +56,11 @@ def run():
 
     """
     try:
-        opts, args = getopt.getopt(sys.argv[1:], "hd:n:p:ok:c:qs:", ["help", "depth=", "negative-filter=", "positive-filter=", "active_search=", "api_key=", "cse_id=", "quiet", "store="])
+        opts, args = getopt.getopt(sys.argv[1:], "hd:n:p:ok:c:qs:w:t:", ["help", "depth=", "negative-filter=", "positive-filter=", "active_search=", "api_key=", "cse_id=", "quiet", "store=", "db-file=", "refresh", "refresh-ttl=", "workers=", "timeout=", "strategy=", "max-requests=", "max-fanout=", "max-time=", "parse-workers=", "cache-file=", "cache-ttl=", "osint-allow=", "osint-deny=", "targets-file=", "concurrency="])
     except getopt.GetoptError as error:
         print(str(error), file=sys.stderr)
         sys.exit(2)
 
-    if len(args) == 0:
-        cli_usage(sys.stderr)
-        sys.exit(2)
-
     # Default search depth
     search_depth = 3
     initial_filters = []
@@ -48,6 +69,19 @@ def run():
     cse_id = ""
     quiet = False
     store = "none"
+    db_file = storage.DEFAULT_DB_FILE
+    refresh_ttl = None
+    workers = 8
+    timeout = None
+    strategy = None
+    budget = crawler.Budget()
+    parse_workers = None
+    cache_file = cache.DEFAULT_DB_FILE
+    cache_ttl = None
+    osint_allow = []
+    osint_deny = []
+    targets_file = None
+    concurrency = 4
 
     for opt, value in opts:
         if opt in ["-h", "--help"]:
@@ -80,15 +114,82 @@ def run():
         elif opt in ["-s", "--store"]:
             if value in ["db", "dot"]:
                 store = value
+        elif opt == "--db-file":
+            db_file = value
+        elif opt == "--refresh":
+            refresh_ttl = refresh_ttl or dict(refresh.DEFAULT_TTL)
+        elif opt == "--refresh-ttl":
+            refresh_ttl = refresh.parse_ttl(value)
+        elif opt in ["-w", "--workers"]:
+            workers = int(value)
+        elif opt in ["-t", "--timeout"]:
+            timeout = float(value)
+        elif opt == "--strategy":
+            if value not in crawler.STRATEGIES:
+                print("Unknown strategy %s, expected one of: %s" % (value, ", ".join(crawler.STRATEGIES)), file=sys.stderr)
+                sys.exit(2)
+            strategy = value
+        elif opt == "--max-requests":
+            budget.max_requests = int(value)
+        elif opt == "--max-fanout":
+            budget.max_fanout = int(value)
+        elif opt == "--max-time":
+            budget.max_time = float(value)
+        elif opt == "--parse-workers":
+            parse_workers = int(value)
+        elif opt == "--cache-file":
+            cache_file = value
+        elif opt == "--cache-ttl":
+            cache_ttl = int(value)
+        elif opt == "--osint-allow":
+            osint_allow += [name.strip() for name in value.split(",") if name.strip()]
+        elif opt == "--osint-deny":
+            osint_deny += [name.strip() for name in value.split(",") if name.strip()]
+        elif opt == "--targets-file":
+            targets_file = value
+        elif opt == "--concurrency":
+            concurrency = int(value)
+
+    if len(args) == 0 and targets_file is None:
+        cli_usage(sys.stderr)
+        sys.exit(2)
 
     # Set search options
-    search.SearchOptions()
-    search.SearchOptions().set_api_key(api_key=api_key)
-    search.SearchOptions().set_cse_id(cse_id=cse_id)
-    search.SearchOptions().set_active_search(active_search=active_search)
+    context = search.SearchContext(api_key=api_key, cse_id=cse_id, active_search=active_search, osint_allow=osint_allow, osint_deny=osint_deny)
+    cache.SearchCache.configure(db_file=cache_file, ttl=cache_ttl)
+    cache.ResponseCache.configure(db_file=cache_file, enabled=(cache_ttl != 0))
+    osint.ModuleStats.configure(db_file=cache_file)
+    parse_pool.ParsePool.configure(workers=parse_workers)
+
+    # Refreshed fingerprints must be stored to be refreshed again
+    if refresh_ttl is not None and store == "none":
+        store = "db"
+
+    # Batch mode
+    if targets_file is not None:
+        if store == "dot":
+            print("DOT files are not generated in batch mode, fingerprints are only stored in the SQLITE file", file=sys.stderr)
+        context_options = {"api_key": api_key, "cse_id": cse_id, "active_search": active_search, "osint_allow": osint_allow, "osint_deny": osint_deny}
+        targets = sys.stdin if targets_file == "-" else open(targets_file, encoding="utf-8")
+        try:
+            failed = batch.run_batch(targets, sys.stdout, concurrency=concurrency, search_depth=search_depth, initial_filters=initial_filters, workers=workers, context_options=context_options,
+                                     storage=storage.Storage(db_file) if store != "none" else None, refresh_ttl=refresh_ttl, strategy=strategy, budget=budget, timeout=timeout)
+        finally:
+            # Standard input is not closed, it was not opened here
+            if targets is not sys.stdin:
+                targets.close()
+        sys.exit(1 if failed else 0)
+
     # Generate Fingerprint
-    research_instance = fingerprint_handler.FingerprintHandler(target=" ".join(args), search_depth=search_depth, initial_filters = initial_filters)
+    previous = None
+    if refresh_ttl is not None:
+        previous = refresh.PreviousFingerprint.load(storage.Storage(db_file), " ".join(args), refresh_ttl, initial_filters=initial_filters, search_context=context.get_settings())
+    research_instance = fingerprint_handler.FingerprintHandler(target=" ".join(args), search_depth=search_depth, initial_filters = initial_filters, workers=workers, context=context, previous=previous,
+                                                               strategy=strategy, budget=budget, timeout=timeout)
+    started_at = time.time()
     fingerprint = research_instance.get_fingerprint()
+    if research_instance.truncated:
+        print(f"Search stopped before its end, {len(research_instance.truncated)} footprints were not investigated", file=sys.stderr)
 
     # Console output
     if not quiet:
@@ -96,10 +197,19 @@ def run():
     
     # Results storage
     if store in ["db", "dot"]:
-        db = storage.Storage("_".join(args).replace(' ', '_')+".db")
-        db.store_graph(fingerprint)
+        db = storage.Storage(db_file)
+        run_id = db.store_graph(fingerprint, started_at=started_at, initial_filters=initial_filters, fetched_at=research_instance.fetched_at, search_context=context.get_settings())
+        print(f"Fingerprint stored in {db_file} as run {run_id}", file=sys.stderr)
+
+    # Changes since the previous run
+    if previous is not None:
+        changes = previous.diff(fingerprint)
+        print(f"Changes since run {changes['previous_run']} : {research_instance.progress.reused} results reused, {research_instance.progress.fetched} fetched")
+        for sign, name in [("+", "added"), ("-", "removed")]:
+            for fp in changes[name]:
+                print(f"{sign} %s (type: %s, method: %s)" % (fp["value"].replace('\n', ' '), fp["type"], fp["method"]))
     if store == "dot":
-        db.gen_graphviz()
+        db.gen_graphviz(run_id)
 
 if __name__ == '__main__':
     run()
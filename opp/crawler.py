@@ -0,0 +1,477 @@
+from opp import footprint
+from opp import scrap
+from opp import deadline
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Optional
+import collections
+import heapq
+import itertools
+import threading
+import time
+
+# Scores of footprints by type, used by the best-first strategy
+TYPE_SCORES = {
+    "username": 2.0,
+    "email": 2.0,
+    "phone": 2.0,
+    "name": 1.0,
+    "url": 0.5
+}
+DEFAULT_SCORE = 0.2
+# Known social profiles have a dedicated scrapper, generic pages are not scrapped
+PROFILE_URL_SCORE = 3.0
+GENERIC_URL_SCORE = 0.1
+EXACT_NAME_SCORE = 3.0
+# The score of a footprint is divided by this factor at each level, so close footprints come first when scores are equal
+LEVEL_DECAY = 0.7
+
+
+class Progress:
+    """ This class counts what has been done while building a fingerprint tree, it can be read from another thread.
+
+    Attributes:
+        nodes (int): Number of footprints added to the tree.
+        requests (int): Number of distinct searches and scraps requested, anticipated ones included.
+        fetched (int): Number of searches and scraps done.
+        failed (int): Number of searches and scraps which raised an error.
+        reused (int): Number of searches and scraps whose results were reused from a previous run.
+        skipped (int): Number of footprints left unexpanded because of the budget of the crawl.
+        truncated (int): Number of footprints left unexpanded because of the budget or the deadline of the crawl.
+    """
+    __slots__ = ("nodes", "requests", "fetched", "failed", "reused", "skipped", "truncated")
+
+    def __init__(self):
+        self.nodes = 0
+        self.requests = 0
+        self.fetched = 0
+        self.failed = 0
+        self.reused = 0
+        self.skipped = 0
+        self.truncated = 0
+
+    def as_dict(self) -> dict:
+        """ This method returns the counters as a JSON compatible dict.
+
+        Returns:
+            dict: Counters by name.
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Budget:
+    """ This class gives the limits of a best-first crawl, each limit being disabled when None.
+    Once a limit is reached, the remaining footprints are kept in the tree without being expanded.
+
+    Attributes:
+        max_requests (int, optional): Maximum number of distinct searches and scraps. Defaults to None.
+        max_fanout (int, optional): Maximum number of footprints expanded at each level of the tree. Defaults to None.
+        max_time (float, optional): Maximum duration of the crawl in seconds. Defaults to None.
+    """
+    def __init__(self, max_requests: int = None, max_fanout: int = None, max_time: float = None):
+        self.max_requests = max_requests
+        self.max_fanout = max_fanout
+        self.max_time = max_time
+
+    def is_limited(self) -> bool:
+        """ This method checks if at least one limit is set.
+
+        Returns:
+            bool: True if the crawl is limited.
+        """
+        return any(limit is not None for limit in (self.max_requests, self.max_fanout, self.max_time))
+
+
+def score_footprint(fp: footprint.Footprint, level: int) -> float:
+    """ This function scores a footprint waiting to be expanded, the best footprints being expanded first by :class:`BestFirstCrawler`.
+    Known social profiles and names matching the target exactly come first, then usernames, emails and phones, then other names, and generic pages last.
+
+    Args:
+        fp (footprint.Footprint): Footprint to score.
+        level (int): Level of the footprint in the tree, the root being 0.
+
+    Returns:
+        float: Score of the footprint, the higher the better.
+    """
+    if fp.target_type == "url":
+        score = PROFILE_URL_SCORE if scrap.isurl_profile(fp.target) else GENERIC_URL_SCORE
+    elif fp.target_type == "name" and " ".join(fp.target.split()).casefold() == " ".join(str(fp.belongs_to.target).split()).casefold():
+        score = EXACT_NAME_SCORE
+    else:
+        score = TYPE_SCORES.get(fp.target_type, DEFAULT_SCORE)
+    return score * LEVEL_DECAY ** level
+
+
+class Crawler:
+    """ This class builds the fingerprint tree from its root footprint.
+
+    Footprints waiting for their search or scrap results are kept in a frontier and their external calls are done concurrently by a pool of workers.
+    The tree itself is still assembled in depth-first order, so the duplicate checks of :class:`RecursionHandler <src.footprint.RecursionHandler>` give
+    exactly the same tree as a sequential run. To make the calls overlap, as soon as the results of a footprint are known, the footprints which will probably be
+    created from them are added to the frontier, before the tree reaches them.
+
+    The frontier is ordered by the position of the footprints in the depth-first traversal, so workers always start with the call the tree will need first.
+
+    Footprints are added to the tree in pre-order, `on_node` is called with each of them as soon as it is created.
+    `on_edge` is called with a footprint and one of its children once the subtree of the child is complete, so in post-order.
+
+    Once the deadline is over, the crawl returns the tree built so far : the calls in progress are bounded by the deadline through :mod:`deadline`,
+    and the footprints whose results are not known yet are left unexpanded and marked as truncated.
+
+    Attributes:
+        fingerprint (:class:`FingerprintHandler`): Fingerprint to which the tree belongs.
+        workers (int, optional): Maximum number of concurrent external calls. Defaults to 8.
+        progress (:class:`Progress`, optional): Counters updated during the crawl. Defaults to a new one.
+        on_node (callable, optional): Function called with each footprint added to the tree. Defaults to None.
+        on_edge (callable, optional): Function called with a footprint and its child when the subtree of the child is complete. Defaults to None.
+        previous (:class:`refresh.PreviousFingerprint`, optional): Previous run of the fingerprint, whose fresh results are reused instead of being fetched again. Defaults to None.
+        deadline (float, optional): `time.monotonic()` timestamp at which the crawl stops. Defaults to None.
+    """
+    def __init__(self, fingerprint, workers: int = 8, progress: Progress = None, on_node=None, on_edge=None, previous=None, deadline: float = None):
+        self.fingerprint = fingerprint
+        self.workers = max(1, workers)
+        self.progress = progress if progress is not None else Progress()
+        self.on_node = on_node
+        self.on_edge = on_edge
+        self.previous = previous
+        self.deadline = deadline
+        self.reused = {}
+        self.frontier = []
+        self.requests = {}
+        self.anticipated = set()
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+        self.closed = False
+        self.executor = None
+
+    def crawl(self, root: footprint.Footprint) -> footprint.Footprint:
+        """ This method expands the whole tree from the given root footprint.
+
+        Args:
+            root (footprint.Footprint): Root footprint of the fingerprint.
+
+        Returns:
+            footprint.Footprint: Root footprint, with all its children.
+        """
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="opp-crawler")
+        self.progress.nodes += 1
+        try:
+            if self.on_node:
+                self.on_node(root)
+            self.expand(root, ())
+        finally:
+            # Anticipated calls which have not started yet are no longer needed
+            with self.lock:
+                self.closed = True
+                self.frontier.clear()
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        return root
+
+    def expand(self, fp: footprint.Footprint, path: tuple) -> None:
+        """ This method waits for the results of a footprint, then creates its children one by one, each child being expanded before the next one is created.
+
+        Args:
+            fp (footprint.Footprint): Footprint to expand.
+            path (tuple): Position of the footprint in the tree.
+        """
+        try:
+            items = self.submit(fp, path).result(timeout=self.get_remaining())
+        except Exception:
+            # Once the deadline is over, footprints are only expanded with the results already obtained
+            if not self.is_expired():
+                raise
+            self.truncate(fp)
+            return
+        # Reused results keep the date they were obtained
+        fetched_at = self.reused.get(fp.get_request())
+        if fetched_at is not None:
+            self.fingerprint.fetched_at[fp.key] = fetched_at
+        for index, item in enumerate(items):
+            child = fp.add_child(item)
+            if not child:
+                continue
+            self.progress.nodes += 1
+            if self.on_node:
+                self.on_node(child)
+            if not isinstance(child, footprint.TerminalFootprint):
+                self.expand(child, path + (index,))
+            if self.on_edge:
+                self.on_edge(fp, child)
+
+    def submit(self, fp: footprint.Footprint, path: tuple) -> Future:
+        """ This method adds a footprint to the frontier, unless its request is already done or running.
+
+        Args:
+            fp (footprint.Footprint): Footprint to investigate.
+            path (tuple): Position of the footprint in the tree, used as priority.
+
+        Returns:
+            Future: Future of the results of the request of the footprint.
+        """
+        key = fp.get_request()
+        with self.lock:
+            future = self.requests.get(key)
+            if future is None:
+                future = self.requests[key] = Future()
+                self.progress.requests += 1
+            if not self.closed and not future.running() and not future.done():
+                heapq.heappush(self.frontier, (path, next(self.counter), key, fp))
+                self.executor.submit(self.work)
+        return future
+
+    def work(self) -> None:
+        """ This method is run by workers : it pops the first pending footprint of the frontier and fetches its results,
+        unless they are still fresh in the previous run.
+
+        """
+        with self.lock:
+            while self.frontier:
+                path, _, key, fp = heapq.heappop(self.frontier)
+                future = self.requests[key]
+                # The same request can be queued several times with different priorities
+                if not future.running() and not future.done():
+                    future.set_running_or_notify_cancel()
+                    break
+            else:
+                return
+        try:
+            items = self.fetch(fp, key)
+        except Exception as error:
+            future.set_exception(error)
+            return
+        future.set_result(items)
+        # With a single worker, anticipated calls would only delay the ones the tree is waiting for
+        if self.workers > 1:
+            self.anticipate(fp, path, items)
+
+    def fetch(self, fp: footprint.Footprint, key: tuple) -> list:
+        """ This method returns the results of the request of a footprint, reused from the previous run if they are still fresh, otherwise fetched.
+
+        Args:
+            fp (footprint.Footprint): Footprint to investigate.
+            key (tuple): Request of the footprint.
+
+        Returns:
+            list: Obtained :class:`ftype.Result` items.
+        """
+        previous_results = self.previous.get_fresh_results(fp) if self.previous is not None else None
+        if previous_results is not None:
+            items, fetched_at = previous_results
+            with self.lock:
+                self.reused[key] = fetched_at
+                self.progress.reused += 1
+            return items
+        try:
+            with deadline.scope(self.deadline):
+                items = fp.fetch()
+        except Exception:
+            with self.lock:
+                self.progress.fetched += 1
+                self.progress.failed += 1
+            raise
+        with self.lock:
+            self.progress.fetched += 1
+        return items
+
+    def get_remaining(self) -> Optional[float]:
+        """ This method returns the time left before the deadline of the crawl.
+
+        Returns:
+            Optional[float]: Seconds left, at least 0, or None if there is no deadline.
+        """
+        return max(0.0, self.deadline - time.monotonic()) if self.deadline is not None else None
+
+    def is_expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def truncate(self, fp: footprint.Footprint) -> None:
+        """ This method leaves a footprint unexpanded because the crawl is stopped, it is marked as truncated and has no fetch date,
+        so a refresh investigates it.
+
+        Args:
+            fp (footprint.Footprint): Truncated footprint.
+        """
+        self.fingerprint.fetched_at[fp.key] = None
+        self.fingerprint.truncated.add(fp.key)
+        self.progress.truncated += 1
+
+    def anticipate(self, fp: footprint.Footprint, path: tuple, items: list) -> None:
+        """ This method adds to the frontier the footprints which will probably be created from the given results.
+        A footprint already found in the tree will not be expanded, so it is not anticipated, and each target is only anticipated once.
+
+        Args:
+            fp (footprint.Footprint): Footprint from which the results were obtained.
+            path (tuple): Position of the footprint in the tree.
+            items (list): Results of the footprint.
+        """
+        if fp.search_depth <= 0:
+            return
+        for index, item in enumerate(items):
+            if fp.is_excluded(item.value) or not footprint.RecursionHandler.check_target_not_duplicate(self.fingerprint, item.value):
+                continue
+            with self.lock:
+                if item.value.lower() in self.anticipated:
+                    continue
+                self.anticipated.add(item.value.lower())
+            candidate = footprint.RecursionHandler.build(fingerprint=self.fingerprint, target=item.value, source_footprint=fp, method=item.method, target_type=item.type)
+            if not isinstance(candidate, footprint.TerminalFootprint):
+                self.submit(candidate, path + (index,))
+
+
+class BestFirstCrawler(Crawler):
+    """ This class builds the fingerprint tree by expanding the most promising footprints first, within a :class:`Budget`.
+
+    Footprints waiting to be expanded are kept in a frontier ordered by their score, given by `scorer`, and the best ones are fetched
+    concurrently by the pool of workers. Children are created as soon as the results of their parent are known, so the tree depends on the order
+    in which results arrive, but the most valuable part of it is obtained first. Once a limit of the budget is reached, the remaining footprints stay
+    in the tree without children, they are counted as skipped and marked as truncated. The maximum duration of the budget is a deadline,
+    like the one of the crawl : once it is over, the footprints waiting for results are marked as truncated.
+
+    `on_node` is called with each footprint as soon as it is created, and `on_edge` right after with its parent.
+
+    Attributes:
+        fingerprint (:class:`FingerprintHandler`): Fingerprint to which the tree belongs.
+        workers (int, optional): Maximum number of concurrent external calls. Defaults to 8.
+        progress (:class:`Progress`, optional): Counters updated during the crawl. Defaults to a new one.
+        on_node (callable, optional): Function called with each footprint added to the tree. Defaults to None.
+        on_edge (callable, optional): Function called with a footprint and its child once the child is added to the tree. Defaults to None.
+        previous (:class:`refresh.PreviousFingerprint`, optional): Previous run of the fingerprint, whose fresh results are reused. Defaults to None.
+        deadline (float, optional): `time.monotonic()` timestamp at which the crawl stops. Defaults to None.
+        budget (:class:`Budget`, optional): Limits of the crawl. Defaults to no limit.
+        scorer (callable, optional): Function scoring a footprint and its level. Defaults to `score_footprint()`.
+    """
+    def __init__(self, fingerprint, workers: int = 8, progress: Progress = None, on_node=None, on_edge=None, previous=None, deadline: float = None,
+                 budget: Budget = None, scorer=score_footprint):
+        super().__init__(fingerprint, workers=workers, progress=progress, on_node=on_node, on_edge=on_edge, previous=previous, deadline=deadline)
+        self.budget = budget if budget is not None else Budget()
+        self.scorer = scorer
+        self.expanded = collections.Counter()
+
+    def crawl(self, root: footprint.Footprint) -> footprint.Footprint:
+        """ This method expands the tree from the given root footprint until the frontier is empty or the budget is spent.
+
+        Args:
+            root (footprint.Footprint): Root footprint of the fingerprint.
+
+        Returns:
+            footprint.Footprint: Root footprint, with the children found within the budget.
+        """
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="opp-crawler")
+        if self.budget.max_time is not None:
+            end = time.monotonic() + self.budget.max_time
+            self.deadline = end if self.deadline is None else min(self.deadline, end)
+        self.progress.nodes += 1
+        # Footprints waiting for results, by future of their request
+        running = {}
+        try:
+            if self.on_node:
+                self.on_node(root)
+            self.push(root, 0)
+            while self.frontier or running:
+                while self.frontier and len(running) < self.workers and not self.is_expired():
+                    _, level, _, fp = heapq.heappop(self.frontier)
+                    future = self.submit_best(fp, level)
+                    if future is None:
+                        self.skip(fp)
+                    else:
+                        running.setdefault(future, []).append((fp, level))
+                if not running:
+                    if self.is_expired():
+                        break
+                    continue
+                done, _ = wait(running, timeout=self.get_remaining(), return_when=FIRST_COMPLETED)
+                if not done:
+                    break
+                for future in done:
+                    for fp, level in running.pop(future):
+                        try:
+                            items = future.result()
+                        except Exception:
+                            # A call cut by the deadline is not an error of the crawl
+                            if not self.is_expired():
+                                raise
+                            self.truncate(fp)
+                            continue
+                        self.add_children(fp, level, items)
+        finally:
+            leave = self.truncate if self.is_expired() else self.skip
+            for waiting in running.values():
+                for fp, _ in waiting:
+                    leave(fp)
+            while self.frontier:
+                leave(heapq.heappop(self.frontier)[3])
+            with self.lock:
+                self.closed = True
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        return root
+
+    def push(self, fp: footprint.Footprint, level: int) -> None:
+        """ This method adds a footprint to the frontier, with its score.
+
+        Args:
+            fp (footprint.Footprint): Footprint to expand.
+            level (int): Level of the footprint in the tree.
+        """
+        heapq.heappush(self.frontier, (-self.scorer(fp, level), level, next(self.counter), fp))
+
+    def submit_best(self, fp: footprint.Footprint, level: int) -> Optional[Future]:
+        """ This method starts the request of a footprint popped from the frontier, unless the budget forbids it.
+        A request already done or running is shared, and does not count in the budget.
+
+        Args:
+            fp (footprint.Footprint): Footprint to expand.
+            level (int): Level of the footprint in the tree.
+
+        Returns:
+            Optional[Future]: Future of the results of the request, or None if the footprint is skipped.
+        """
+        if self.budget.max_fanout is not None and self.expanded[level] >= self.budget.max_fanout:
+            return None
+        key = fp.get_request()
+        with self.lock:
+            future = self.requests.get(key)
+            if future is None:
+                if self.budget.max_requests is not None and len(self.requests) >= self.budget.max_requests:
+                    return None
+                future = self.requests[key] = self.executor.submit(self.fetch, fp, key)
+                self.progress.requests += 1
+        self.expanded[level] += 1
+        return future
+
+    def add_children(self, fp: footprint.Footprint, level: int, items: list) -> None:
+        """ This method creates the children of a footprint from its results, and adds the ones to investigate to the frontier.
+
+        Args:
+            fp (footprint.Footprint): Expanded footprint.
+            level (int): Level of the footprint in the tree.
+            items (list): Results of the footprint.
+        """
+        # Reused results keep the date they were obtained
+        fetched_at = self.reused.get(fp.get_request())
+        if fetched_at is not None:
+            self.fingerprint.fetched_at[fp.key] = fetched_at
+        for item in items:
+            child = fp.add_child(item)
+            if not child:
+                continue
+            self.progress.nodes += 1
+            if self.on_node:
+                self.on_node(child)
+            if not isinstance(child, footprint.TerminalFootprint):
+                self.push(child, level + 1)
+            if self.on_edge:
+                self.on_edge(fp, child)
+
+    def skip(self, fp: footprint.Footprint) -> None:
+        """ This method leaves a footprint unexpanded because the budget is spent.
+
+        Args:
+            fp (footprint.Footprint): Skipped footprint.
+        """
+        self.progress.skipped += 1
+        self.truncate(fp)
+
+
+STRATEGIES = {
+    "depth_first": Crawler,
+    "best_first": BestFirstCrawler
+}
@@ -0,0 +1,72 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+import time
+
+# Deadline of the current run, as a time.monotonic() timestamp
+_deadline = ContextVar("opp_deadline", default=None)
+
+class DeadlineExceeded(TimeoutError):
+    """ This exception is raised when an external call is about to start or wait after the deadline of its run.
+
+    """
+
+
+@contextmanager
+def scope(deadline: Optional[float]):
+    """ This context manager sets the deadline of the calls made in its block, in the current thread.
+    Threads and event loops do not inherit it, so the deadline must be set again in the workers of a run, or the calls bounded with `clip()`.
+
+    Args:
+        deadline (Optional[float]): `time.monotonic()` timestamp, None for no deadline.
+    """
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def get() -> Optional[float]:
+    """ This function returns the deadline of the current run.
+
+    Returns:
+        Optional[float]: `time.monotonic()` timestamp, or None if there is no deadline.
+    """
+    return _deadline.get()
+
+def remaining() -> Optional[float]:
+    """ This function returns the time left before the deadline of the current run.
+
+    Returns:
+        Optional[float]: Seconds left, possibly negative, or None if there is no deadline.
+    """
+    deadline = _deadline.get()
+    return deadline - time.monotonic() if deadline is not None else None
+
+def is_exceeded() -> bool:
+    """ This function checks if the deadline of the current run is over.
+
+    Returns:
+        bool: True if there is a deadline and it is over.
+    """
+    left = remaining()
+    return left is not None and left <= 0
+
+def clip(timeout: float) -> float:
+    """ This function bounds the timeout of a call by the time left before the deadline of the current run.
+
+    Args:
+        timeout (float): Timeout of the call in seconds.
+
+    Raises:
+        DeadlineExceeded: If the deadline is already over.
+
+    Returns:
+        float: Timeout of the call, at most the time left.
+    """
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("deadline exceeded")
+    return min(timeout, left)
@@ -0,0 +1,467 @@
+from opp import ftype
+from abc import ABC, abstractmethod
+from bs4 import BeautifulSoup, Tag
+from typing import Optional
+import importlib.util
+import os
+import re
+import threading
+
+# Backends tried in this order when none is chosen, the fastest installed one is used (pip install selectolax or pip install lxml)
+PREFERRED_BACKENDS = ("selectolax", "lxml", "html.parser")
+DEFAULT_BACKEND = os.environ.get("OPP_PARSER")
+
+# A compound selector : optional tag, then classes and attributes, e.g. li.vcard-detail[itemprop="url"]
+_COMPOUND = re.compile(r'^([a-zA-Z][\w-]*|\*)?((?:\.[\w-]+|\[[\w-]+(?:="[^"]*")?\])*)$')
+_PART = re.compile(r'\.([\w-]+)|\[([\w-]+)(?:="([^"]*)")?\]')
+
+
+class Field:
+    """ This class describes a footprint to extract from a page : the first element matching a CSS selector, or all of them.
+
+    Selectors are sequences of compound selectors separated by spaces (descendant combinator), a compound selector being
+    an optional tag name followed by classes `.class` and attributes `[attribute]` or `[attribute="value"]`.
+
+    Attributes:
+        type (str): Type of the footprint.
+        selector (str): CSS selector of the element.
+        attribute (str, optional): Attribute giving the value, the stripped text of the element if None. Defaults to None.
+        all (bool, optional): If True, a footprint is extracted from each matching element. Defaults to False.
+        first_per_ancestor (bool, optional): With `all`, only the first matching element inside each element matched by the outermost compound selector
+            gives a footprint, e.g. the first link of each item for "li a". Defaults to False.
+        transform (callable, optional): Function applied to the value. Defaults to None.
+        required (bool, optional): If True, nothing is extracted from a page where this field is not found. Defaults to False.
+        name (str, optional): Name of the field, for `requires`. Defaults to the type.
+        requires (str, optional): Name of a field which must be found for this one to be extracted. Defaults to None.
+    """
+    def __init__(self, type: str, selector: str, attribute: str = None, all: bool = False, transform=None,
+                 required: bool = False, name: str = None, requires: str = None, first_per_ancestor: bool = False):
+        self.type = type
+        self.selector = selector
+        self.attribute = attribute
+        self.all = all
+        self.first_per_ancestor = first_per_ancestor
+        self.transform = transform
+        self.required = required
+        self.name = name if name is not None else type
+        self.requires = requires
+        self.compounds = compile_selector(selector)
+
+    def __repr__(self):
+        return "Field(%r, %r)" % (self.type, self.selector)
+
+def compile_selector(selector: str) -> list:
+    """ This function compiles a selector into its compound selectors, from the outermost to the element itself.
+
+    Args:
+        selector (str): CSS selector.
+
+    Raises:
+        ValueError: If the selector is not supported.
+
+    Returns:
+        list: Tuples (tag or None, classes, attributes as (name, value or None) pairs).
+    """
+    compounds = []
+    for compound in selector.split():
+        match = _COMPOUND.match(compound)
+        if not match:
+            raise ValueError("unsupported selector : %r" % selector)
+        tag = match.group(1) if match.group(1) not in (None, "*") else None
+        classes, attributes = [], []
+        for part in _PART.finditer(match.group(2)):
+            if part.group(1):
+                classes.append(part.group(1))
+            else:
+                attributes.append((part.group(2), part.group(3)))
+        compounds.append((tag.lower() if tag else None, tuple(classes), tuple(attributes)))
+    if not compounds:
+        raise ValueError("empty selector")
+    return compounds
+
+def match_compound(compound: tuple, tag: str, attrs) -> bool:
+    """ This function checks if an element matches a compound selector.
+
+    Args:
+        compound (tuple): Compiled compound selector.
+        tag (str): Tag name of the element.
+        attrs (Mapping): Attributes of the element.
+
+    Returns:
+        bool: True if the element matches.
+    """
+    name, classes, attributes = compound
+    if name is not None and name != tag:
+        return False
+    if classes:
+        value = attrs.get("class")
+        if not value:
+            return False
+        # html.parser gives the classes as a list, the other backends as a string
+        element_classes = value.split() if isinstance(value, str) else value
+        for class_name in classes:
+            if class_name not in element_classes:
+                return False
+    for attribute, value in attributes:
+        # selectolax gives None as the value of an attribute without value, which is still present
+        if attribute not in attrs or (value is not None and (attrs[attribute] or "") != value):
+            return False
+    return True
+
+
+class Extractor:
+    """ This class extracts the footprints described by fields from pages, in a single walk over each document.
+
+    Fields are compiled once and indexed by the tag name of the element they select, so each element is only compared to the fields
+    which can select it. The walk stops as soon as every field is found, unless a field extracts all of its matching elements.
+    Footprints are returned in the order of the fields, then in the order of the document.
+
+    Attributes:
+        fields (list): Fields to extract.
+        by_tag (dict): Fields indexed by the tag of their element, fields without tag are indexed by None.
+    """
+    def __init__(self, fields: list):
+        self.fields = list(fields)
+        names = {field.name for field in self.fields}
+        for field in self.fields:
+            if field.requires is not None and field.requires not in names:
+                raise ValueError("field %r requires unknown field %r" % (field.name, field.requires))
+        self.by_tag = {}
+        for index, field in enumerate(self.fields):
+            self.by_tag.setdefault(field.compounds[-1][0], []).append((index, field))
+        self.any_tag = self.by_tag.pop(None, [])
+        self.extract_all = any(field.all for field in self.fields)
+
+    def extract(self, content: bytes, method: str, backend: str = None) -> list:
+        """ This method extracts the footprints of a page.
+
+        Args:
+            content (bytes): Content of the page.
+            method (str): Method of the footprints.
+            backend (str, optional): Name of the parser backend. Defaults to the one given by `get_backend()`.
+
+        Returns:
+            list: Found :class:`ftype.Result` footprints.
+        """
+        parser = get_backend(backend)
+        document = parser.parse(content)
+        if document is None:
+            return []
+        values = self.find(parser, document)
+        found = {field.name for field, value in zip(self.fields, values) if value}
+        result = []
+        for field, value in zip(self.fields, values):
+            if field.required and not value:
+                return []
+            if not value or (field.requires is not None and field.requires not in found):
+                continue
+            for item in value:
+                result.append(ftype.Result(field.type, item, method))
+        return result
+
+    def find(self, parser: "ParserBackend", document) -> list:
+        """ This method walks the document once and returns the values found for each field.
+
+        Args:
+            parser (ParserBackend): Backend which parsed the document.
+            document: Parsed document.
+
+        Returns:
+            list: Values found for each field, in the order of the fields.
+        """
+        values = [[] for _ in self.fields]
+        # Walk positions of the outermost elements which already gave a value, for `first_per_ancestor` fields
+        used = [set() for _ in self.fields]
+        pending = sum(1 for field in self.fields if not field.all)
+        ancestors = []
+        ancestor_positions = []
+        for walk_position, (depth, tag, attrs, node) in enumerate(parser.walk(document)):
+            del ancestors[depth:]
+            del ancestor_positions[depth:]
+            candidates = self.by_tag.get(tag)
+            if candidates is None:
+                candidates = self.any_tag
+            elif self.any_tag:
+                candidates = candidates + self.any_tag
+            for index, field in candidates:
+                if values[index] and not field.all:
+                    continue
+                outer = self.locate(field.compounds, tag, attrs, ancestors)
+                if outer is None:
+                    continue
+                if field.first_per_ancestor:
+                    outer = ancestor_positions[outer] if outer < len(ancestors) else walk_position
+                    if outer in used[index]:
+                        continue
+                value = parser.text(node).strip() if field.attribute is None else attrs.get(field.attribute)
+                if value is None:
+                    continue
+                if isinstance(value, list):
+                    value = " ".join(value)
+                if field.transform is not None:
+                    value = field.transform(value)
+                values[index].append(value)
+                if field.first_per_ancestor:
+                    used[index].add(outer)
+                if not field.all:
+                    pending -= 1
+            if pending == 0 and not self.extract_all:
+                break
+            ancestors.append((tag, attrs))
+            ancestor_positions.append(walk_position)
+        return values
+
+    @staticmethod
+    def locate(compounds: list, tag: str, attrs, ancestors: list) -> Optional[int]:
+        """ This method checks if an element matches a compiled selector, its ancestors being matched from the closest one.
+
+        Args:
+            compounds (list): Compiled selector.
+            tag (str): Tag name of the element.
+            attrs (Mapping): Attributes of the element.
+            ancestors (list): Tag names and attributes of the ancestors of the element, from the root.
+
+        Returns:
+            Optional[int]: Index in `ancestors` of the element matched by the outermost compound selector, `len(ancestors)` for the element itself,
+            or None if the element does not match.
+        """
+        if not match_compound(compounds[-1], tag, attrs):
+            return None
+        position = len(ancestors)
+        for compound in reversed(compounds[:-1]):
+            position -= 1
+            while position >= 0 and not match_compound(compound, *ancestors[position]):
+                position -= 1
+            if position < 0:
+                return None
+        return position
+
+
+class ParserBackend(ABC):
+    """ This class is the interface of the HTML parsers used by :class:`Extractor`.
+
+    """
+    name = None
+
+    @abstractmethod
+    def parse(self, content: bytes):
+        """ This method parses a page.
+
+        Args:
+            content (bytes): Content of the page.
+
+        Returns:
+            Parsed document, None if there is nothing to parse.
+        """
+        pass
+
+    @abstractmethod
+    def children(self, node) -> list:
+        """ This method returns the child elements of a node, with text nodes and comments.
+
+        Args:
+            node: Node of a parsed document.
+
+        Returns:
+            list: Child nodes.
+        """
+        pass
+
+    @abstractmethod
+    def element(self, node) -> tuple:
+        """ This method returns the tag name and the attributes of a node.
+
+        Args:
+            node: Node of a parsed document.
+
+        Returns:
+            tuple: Lower-case tag name and attributes, or None if the node is not an element.
+        """
+        pass
+
+    @abstractmethod
+    def text(self, node) -> str:
+        """ This method returns the text of an element and of its descendants.
+
+        Args:
+            node: Element of a parsed document.
+
+        Returns:
+            str: Text of the element.
+        """
+        pass
+
+    def walk(self, document):
+        """ This method yields the elements of a document in document order, without recursion.
+
+        Args:
+            document: Parsed document.
+
+        Yields:
+            tuple: Depth, tag name, attributes and node of each element.
+        """
+        stack = [iter(self.children(document))]
+        while stack:
+            node = next(stack[-1], None)
+            if node is None:
+                stack.pop()
+                continue
+            element = self.element(node)
+            if element is None:
+                continue
+            yield len(stack) - 1, element[0], element[1], node
+            stack.append(iter(self.children(node)))
+
+class HtmlParserBackend(ParserBackend):
+    """ This class parses pages with BeautifulSoup and the parser of the standard library, it is always available but the slowest.
+
+    """
+    name = "html.parser"
+
+    def parse(self, content: bytes):
+        return BeautifulSoup(content, "html.parser")
+
+    def children(self, node) -> list:
+        return node.contents
+
+    def element(self, node) -> tuple:
+        return (node.name, node.attrs) if isinstance(node, Tag) else None
+
+    def text(self, node) -> str:
+        return node.get_text()
+
+class LxmlBackend(ParserBackend):
+    """ This class parses pages with lxml, its elements are iterated in C.
+
+    """
+    name = "lxml"
+
+    def __init__(self):
+        import lxml.etree
+        import lxml.html
+        self.etree = lxml.etree
+        self.html = lxml.html
+
+    def parse(self, content: bytes):
+        try:
+            return self.html.document_fromstring(content)
+        except (self.etree.ParserError, ValueError):
+            # Page without any element
+            return None
+
+    def children(self, node) -> list:
+        return node
+
+    def element(self, node) -> tuple:
+        # Comments and processing instructions have no string tag
+        return (node.tag, node.attrib) if isinstance(node.tag, str) else None
+
+    def text(self, node) -> str:
+        return node.text_content()
+
+    def walk(self, document):
+        depth = -1
+        for event, node in self.etree.iterwalk(document, events=("start", "end")):
+            if event == "end":
+                depth -= 1
+                continue
+            depth += 1
+            if isinstance(node.tag, str):
+                yield depth, node.tag, node.attrib, node
+
+class SelectolaxBackend(ParserBackend):
+    """ This class parses pages with selectolax and its lexbor engine, the fastest backend.
+
+    """
+    name = "selectolax"
+
+    def __init__(self):
+        from selectolax.lexbor import LexborHTMLParser
+        self.parser = LexborHTMLParser
+
+    def parse(self, content: bytes):
+        document = self.parser(content)
+        return document.root
+
+    def children(self, node) -> list:
+        return node.iter(include_text=False)
+
+    def element(self, node) -> tuple:
+        # Comments and doctypes are named "-comment" and "!doctype"
+        tag = node.tag
+        return (tag, node.attributes) if tag[0].isalpha() else None
+
+    def text(self, node) -> str:
+        return node.text(deep=True)
+
+    def walk(self, document):
+        if document is None:
+            return
+        element = self.element(document)
+        if element is not None:
+            yield 0, element[0], element[1], document
+            yield from ((depth + 1, tag, attrs, node) for depth, tag, attrs, node in super().walk(document))
+
+BACKENDS = {
+    "html.parser": (HtmlParserBackend, "bs4"),
+    "lxml": (LxmlBackend, "lxml"),
+    "selectolax": (SelectolaxBackend, "selectolax")
+}
+_backends = {}
+_backends_lock = threading.Lock()
+_default_backend = None
+
+def available_backends() -> list:
+    """ This function returns the names of the backends whose parser is installed, from the fastest one.
+
+    Returns:
+        list: Names of the backends.
+    """
+    return [name for name in PREFERRED_BACKENDS if importlib.util.find_spec(BACKENDS[name][1]) is not None]
+
+def get_default_backend() -> str:
+    """ This function returns the name of the backend used when none is chosen, installed parsers are only looked for on the first call.
+
+    Returns:
+        str: `DEFAULT_BACKEND`, or the name of the fastest installed backend.
+    """
+    global _default_backend
+    if _default_backend is None:
+        _default_backend = DEFAULT_BACKEND or available_backends()[0]
+    return _default_backend
+
+def get_backend(name: str = None) -> ParserBackend:
+    """ This function returns a parser backend, each one is only created once.
+
+    Args:
+        name (str, optional): Name of the backend. Defaults to `DEFAULT_BACKEND`, which can be set with the `OPP_PARSER` environment variable,
+            or to the fastest installed backend.
+
+    Raises:
+        ValueError: If the backend is unknown.
+
+    Returns:
+        ParserBackend: Backend.
+    """
+    if name is None:
+        name = get_default_backend()
+    if name not in BACKENDS:
+        raise ValueError("unknown parser backend %r, expected one of %s" % (name, ", ".join(BACKENDS)))
+    backend = _backends.get(name)
+    if backend is None:
+        with _backends_lock:
+            backend = _backends.get(name)
+            if backend is None:
+                backend = _backends[name] = BACKENDS[name][0]()
+    return backend
+
+def strip_query(url: str) -> str:
+    """ This function removes the query string of an URL, e.g. the size of a profile picture.
+
+    Args:
+        url (str): URL.
+
+    Returns:
+        str: URL without query string.
+    """
+    return url.split("?")[0]
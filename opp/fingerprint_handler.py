@@ -1,22 +1,70 @@
 from urllib.parse import urlparse
 from opp import footprint
+from opp import crawler
+from opp import search
 from typing import Optional
 from collections import OrderedDict
+import queue
+import threading
+import time
+
+class EventStreamClosed(Exception):
+    """ This exception stops the construction of a fingerprint when nobody consumes its events anymore.
+
+    """
+
 
 class FingerprintHandler:
-    def __init__(self, target: str = None, target_type: str = None, search_depth: int = 3, initial_filters: list = []):
+    def __init__(self, target: str = None, target_type: str = None, search_depth: int = 3, initial_filters: list = [], workers: int = 8, context: search.SearchContext = None, previous=None,
+                 strategy: str = None, budget: crawler.Budget = None, timeout: float = None):
         self.target = target
         self.target_type = target_type
         self.search_depth = search_depth
         self.initial_filters = initial_filters
+        self.workers = workers
+        self.context = context if context is not None else search.SearchContext()
+        self.previous = previous
+        self.budget = budget
+        # A budget only makes sense when the best footprints are expanded first
+        self.strategy = strategy or ("best_first" if budget is not None and budget.is_limited() else "depth_first")
+        self.timeout = timeout
+        self.fetched_at = {}
+        self.truncated = set()
+        self.created = []
+        self.seen = set()
+        self.progress = crawler.Progress()
 
-    def get_fingerprint(self) -> footprint.Footprint:
-        """ This method calls :class:`footprint.RecursionHandler` class to build recursively the fingerprint tree.
+    def get_fingerprint(self, on_node=None, on_edge=None) -> footprint.Footprint:
+        """ This method calls :class:`footprint.RecursionHandler` class to create the root footprint, then the crawler of the strategy to build the fingerprint tree :
+        :class:`crawler.Crawler` for "depth_first", :class:`crawler.BestFirstCrawler` with the budget for "best_first".
+        The index of targets used to detect duplicates only lives during the construction of the tree, `progress` can be read meanwhile.
+        If a previous run is given, its fresh results are reused, and `fetched_at` gives the date of the reused results by footprint key.
+        If a timeout is given, the tree built so far is returned once it is over, `truncated` giving the keys of the footprints left unexpanded.
+        `created` gives the footprints in the order they were added to the tree.
+
+        Args:
+            on_node (callable, optional): Function called with each footprint as soon as it is added to the tree. Defaults to None.
+            on_edge (callable, optional): Function called with a footprint and its child when the subtree of the child is complete. Defaults to None.
 
         Returns:
             Footprint: Root footprint of the obtained fingerprint
         """
-        return footprint.RecursionHandler.get_root(fingerprint=self, target=self.target, search_depth=self.search_depth, initial_filters=self.initial_filters)
+        self.seen = set()
+        self.fetched_at = {}
+        self.truncated = set()
+        self.created = []
+        deadline = time.monotonic() + self.timeout if self.timeout is not None else None
+        try:
+            root = footprint.RecursionHandler.get_root(fingerprint=self, target=self.target, search_depth=self.search_depth, initial_filters=self.initial_filters)
+            options = {"budget": self.budget} if self.strategy == "best_first" else {}
+            def add_node(fp):
+                self.created.append(fp)
+                if on_node:
+                    on_node(fp)
+            return crawler.STRATEGIES[self.strategy](self, workers=self.workers, progress=self.progress, on_node=add_node, on_edge=on_edge, previous=self.previous,
+                                                     deadline=deadline, **options).crawl(root)
+        finally:
+            self.seen = set()
 
     def get_ascii_tree(self, fp: footprint.Footprint) -> dict:
         """ This method returns a dictionnary that can be used by asciitree module to display the fingerprint tree in the terminal.
@@ -84,7 +132,63 @@ class FingerprintHandler:
                                 "child": []
                             }
 
+    def get_json_node(self, fp: footprint.Footprint) -> dict:
+        """ This method returns the node of a footprint, as found in `get_json_nodes_edges()`.
+        A footprint left unexpanded because the search was stopped has a "truncated" attribute.
+
+        Args:
+            fp (footprint.Footprint): Footprint to display.
+
+        Returns:
+            dict: JSON compatible dict
+        """
+        node = {
+            "key": fp.key,
+            "attributes": {
+                "label":  self.prettify_link(fp.target.replace('\n', ' ')) if fp.target_type == 'url' else fp.target.replace('\n', ' '),
+                "target": fp.target.replace('\n', ' '),
+                "target_type": fp.target_type,
+                "method": fp.method
+            }
+        }
+        if fp.key in self.truncated:
+            node["attributes"]["truncated"] = True
+        return node
+
+    def get_json_edge(self, key: int, source_fp: footprint.Footprint, target_fp: footprint.Footprint) -> dict:
+        """ This method returns the edge between a footprint and its child, as found in `get_json_nodes_edges()`.
+
+        Args:
+            key (int): Key of the edge : position of the child in the "nodes" list of `get_json_nodes_edges()`, minus one.
+            source_fp (footprint.Footprint): Parent footprint.
+            target_fp (footprint.Footprint): Child footprint.
+
+        Returns:
+            dict: JSON compatible dict
+        """
+        return {
+            "key": key,
+            "source": source_fp.key,
+            "target": target_fp.key,
+            "attributes": {}
+        }
+
     def get_json_nodes_edges(self, fp: footprint.Footprint):
+        """ This method returns the nodes and edges of a fingerprint tree. Nodes are listed in pre-order and edges in post-order,
+        except for a tree built by the "best_first" strategy, whose nodes and edges are listed in the order they were added to the tree.
+        In both cases, this is the order of the events of `get_json_events()`, and the key of an edge is the position of its child in the nodes, minus one.
+
+        Args:
+            fp (footprint.Footprint): Root footprint of the tree.
+
+        Returns:
+            dict: JSON compatible dict with "nodes" and "edges" lists.
+        """
+        if self.strategy == "best_first" and self.created and self.created[0] is fp:
+            return {
+                "nodes": [self.get_json_node(node_fp) for node_fp in self.created],
+                "edges": [self.get_json_edge(key, child_fp.source_footprint, child_fp) for key, child_fp in enumerate(self.created[1:])]
+            }
         result = {
             "nodes": [],
             "edges": []
@@ -93,30 +197,72 @@ class FingerprintHandler:
         def traverse(fp):
             nonlocal edge_key
             edge_key += 1
-            current_key = fp.key
-            fp_data = {
-                "key": current_key,
-                "attributes": {
-                    "label":  self.prettify_link(fp.target.replace('\n', ' ')) if fp.target_type == 'url' else fp.target.replace('\n', ' '),
-                    "target": fp.target.replace('\n', ' '),
-                    "target_type": fp.target_type,
-                    "method": fp.method
-                }
-            }
-            result["nodes"].append(fp_data)
+            result["nodes"].append(self.get_json_node(fp))
             if fp.children_footprints:
                 for child_fp in fp.children_footprints:
-                    edge_data = {
-                        "key": edge_key,
-                        "source": current_key,
-                        "target": traverse(child_fp),
-                        "attributes": {}
-                    }
-                    result["edges"].append(edge_data)
-            return current_key
+                    key = edge_key
+                    traverse(child_fp)
+                    result["edges"].append(self.get_json_edge(key, fp, child_fp))
         traverse(fp)
         return result
 
+    def get_json_events(self, max_pending: int = 1000):
+        """ This generator builds the fingerprint and yields its nodes and edges as soon as they are discovered.
+        Nodes come in the order of the "nodes" list of `get_json_nodes_edges()` and edges in the order of its "edges" list, with the same keys,
+        so both lists can be rebuilt from the events : in pre-order and post-order, or in discovery order with the "best_first" strategy. The tree is built by another thread, which waits when `max_pending` events are not consumed yet,
+        and stops if the generator is closed. Footprints are only known to be truncated once the tree is built, so their keys are given by a "truncated" event before the end.
+
+        Args:
+            max_pending (int, optional): Maximum number of events waiting to be consumed. Defaults to 1000.
+
+        Yields:
+            tuple: Event name ("node", "edge", "truncated", "end" or "error") and its JSON compatible data.
+        """
+        events = queue.Queue(maxsize=max_pending)
+        closed = threading.Event()
+        preorder = {}
+
+        def put(event):
+            while not closed.is_set():
+                try:
+                    events.put(event, timeout=0.5)
+                    return
+                except queue.Full:
+                    pass
+            raise EventStreamClosed()
+
+        def on_node(fp):
+            preorder[fp] = self.progress.nodes - 1
+            put(("node", self.get_json_node(fp)))
+
+        def on_edge(source_fp, target_fp):
+            put(("edge", self.get_json_edge(preorder.pop(target_fp) - 1, source_fp, target_fp)))
+
+        def build():
+            try:
+                self.get_fingerprint(on_node=on_node, on_edge=on_edge)
+                if self.truncated:
+                    put(("truncated", {"keys": sorted(self.truncated)}))
+                event = ("end", self.progress.as_dict())
+            except EventStreamClosed:
+                return
+            except Exception as error:
+                event = ("error", {"error": repr(error)})
+            try:
+                put(event)
+            except EventStreamClosed:
+                pass
+
+        threading.Thread(target=build, name="opp-events", daemon=True).start()
+        try:
+            while True:
+                event = events.get()
+                yield event
+                if event[0] in ("end", "error"):
+                    return
+        finally:
+            closed.set()
+
     def prettify_link(self, url):
         parsed_url = urlparse(url)
         domain = parsed_url.netloc.replace("www.", "")
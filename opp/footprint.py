@@ -1,9 +1,11 @@
 import hashlib
+import sys
 from opp import search
 from opp import scrap
 from opp import ftype
 from abc import ABC, abstractmethod
 from urllib.parse import urlparse
+from typing import Optional
 import re
 
 
@@ -15,34 +17,86 @@ class Footprint(ABC):
         target (str): Value of the footprint
         target_type (str, optional): Type of the  of the footprint. Defaults to None.
         method (str, optional): Method used to obtain footprint. Defaults to None.
+
+    Footprints are slotted and their type and method are interned, because large trees hold many thousands of them.
     """
-    _instances = []
+    __slots__ = ("belongs_to", "target", "target_type", "method", "children_footprints", "source_footprint", "search_depth", "initial_filters", "_key")
+    positive = True
 
     def __init__(self, fingerprint, target: str, target_type: str = None, method: str = None):
-        Footprint._instances.append(self)
         self.belongs_to = fingerprint
         self.target = target
-        self.target_type = target_type
-        self.method = method
-        self.positive = True
-        self.children_footprints = []
+        self.target_type = intern_string(target_type)
+        self.method = intern_string(method)
+        self.children_footprints = ()
+        self.source_footprint = None
+        self._key = None
 
-    def instances() -> list:
-        """ This method returns the list of all instances of :class:`Footprint`
+    @property
+    def key(self) -> str:
+        """ Key of the footprint : SHA-256 digest of the key of its source footprint concatenated with its target.
+        It is only computed when needed, i.e. when the tree is serialized.
 
         Returns:
-            list: list of all instances of :class:`Footprint`
+            str: Hexadecimal key.
         """
-        return Footprint._instances
-    
+        if self._key is None:
+            if self.source_footprint:
+                self._key = hash_string(self.source_footprint.key + self.target)
+            else:
+                self._key = hash_string(self.target)
+        return self._key
+
     @abstractmethod
-    def process(self) -> None:
-        """ 
-        This is an abstract method which is implemented in :class:`SearchableFootprint`, :class:`ScrapableFootprint` and :class:`TerminalFootprint` to manage investigations on all types of footprint. 
-        
+    def get_request(self) -> Optional[tuple]:
+        """
+        This is an abstract method which is implemented in :class:`SearchableFootprint`, :class:`ScrapableFootprint` and :class:`TerminalFootprint` to describe the external call needed to investigate the footprint.
+        Two footprints returning the same request obtain the same results, so the call is only done once.
+
+        Returns:
+            tuple: Hashable description of the external call, None if the footprint is not investigated.
         """
         pass
 
+    @abstractmethod
+    def fetch(self) -> list:
+        """
+        This is an abstract method which is implemented in :class:`SearchableFootprint`, :class:`ScrapableFootprint` and :class:`TerminalFootprint` to manage investigations on all types of footprint.
+        It only does the external call, child footprints are created afterwards with `add_child()`.
+
+        Returns:
+            list: Obtained :class:`ftype.Result` items, as given by :class:`Search <src.search.Search>` and :class:`Scrap <src.scrap.Scrap>`.
+        """
+        pass
+
+    def is_excluded(self, value: str) -> bool:
+        """ This method checks if a value is excluded by the negative initial filters given by the user.
+
+        Args:
+            value (str): Value to check.
+
+        Returns:
+            bool: True if the value matches a negative initial filter.
+        """
+        return value in [negative_filter["value"] for negative_filter in self.initial_filters if not negative_filter["positive"]]
+
+    def add_child(self, item: ftype.Result) -> Optional["Footprint"]:
+        """ This method creates a new footprint from an item obtained by `fetch()` by using :class:`RecursionHandler`, and adds it to the children of the current footprint.
+
+        Args:
+            item (ftype.Result): Item obtained by `fetch()`.
+
+        Returns:
+            Footprint: Created footprint, None if the item is excluded by the initial negative filters.
+        """
+        if self.is_excluded(item.value):
+            return None
+        child = RecursionHandler.get(fingerprint=self.belongs_to, target=item.value, source_footprint=self, method=item.method, target_type=item.type)
+        if not self.children_footprints:
+            self.children_footprints = []
+        self.children_footprints.append(child)
+        return child
+
 class SearchableFootprint(Footprint):
     """ This class is inherited from Footprint, and is used to manage all types of footprint which be used to make queries to a search engine
 
@@ -55,32 +109,36 @@ class SearchableFootprint(Footprint):
         source_footprint (Footprint, optional): Footprint from which current one was obtained. Defaults to None.
         initial_filters (list, optional): Search filters given by the user. Defaults to [].
     """
+    __slots__ = ()
+
     def __init__(self, fingerprint, target: str, target_type: str = None, method: str = None, search_depth: int = 0, source_footprint: Footprint = None, initial_filters: list = []):
         super().__init__(fingerprint, target, target_type, method)
         self.source_footprint = source_footprint
         if self.source_footprint:
-            self.key = hash_string(str(self.source_footprint.key) + self.target)
             self.search_depth = self.source_footprint.search_depth - 1 
         else:
-            self.key = hash_string(self.target)
             self.search_depth = search_depth
         self.initial_filters = initial_filters
         if self.initial_filters == []:
             self.initial_filters = self.get_initial_filters()
-        self.process()
 
+    def get_request(self) -> tuple:
+        """
+        This method describes the search done for the footprint : footprints with the same filters lead to the same query.
 
-    def process(self) -> None:
+        Returns:
+            tuple: Search request.
         """
-        This method instanciate :class:`Search <src.search.Search>` class, the results obtained are used to create new footprints objects by using :class:`RecursionHandler`
+        return ("search",) + tuple((f["value"], f["type"], f["positive"]) for f in self.get_filters())
 
+    def fetch(self) -> list:
         """
-        search_obj = search.Search(filters=self.get_filters(), initial_filters=self.initial_filters)
-        for item in search_obj.result:
-            if item["value"] not in [negative_filter["value"] for negative_filter in self.initial_filters if not negative_filter["positive"]]: # If not in initial negative filters
-                self.children_footprints.append(
-                    RecursionHandler.get(fingerprint=self.belongs_to, target=item["value"], source_footprint=self, method=item["method"], target_type=item["type"])
-                )
+        This method instanciate :class:`Search <src.search.Search>` class and returns the obtained results.
+
+        Returns:
+            list: Obtained items.
+        """
+        return search.Search(filters=self.get_filters(), initial_filters=self.initial_filters, context=self.belongs_to.context).result
     
     def get_filters(self) -> list:
         """ This method generates a list of filters which will be used to create a search query. It relies on the current footprint whose value is added directly to the list.
@@ -136,26 +194,32 @@ class ScrapableFootprint(Footprint):
         method (str, optional): inherited from Footprint. Defaults to None.
         source_footprint (Footprint, optional): Footprint from which current one was obtained. Defaults to None.
     """
+    __slots__ = ()
+
     def __init__(self, fingerprint, target: str, target_type: str = None, method: str = None, source_footprint: Footprint = None):
 
         super().__init__(fingerprint, target, target_type, method)
         self.source_footprint = source_footprint
-        self.key = hash_string(str(self.source_footprint.key) + target)
         self.search_depth = self.source_footprint.search_depth - 1
         self.initial_filters = source_footprint.initial_filters
-        self.process()
-        
-    def process(self) -> None:
+
+    def get_request(self) -> tuple:
         """
-        This method instanciate :class:`Search <src.scrap.Scrap>` class, the results obtained are used to create new footprints objects by using :class:`RecursionHandler`
+        This method describes the scrap done for the footprint : footprints with the same URL lead to the same scrap.
 
+        Returns:
+            tuple: Scrap request.
         """
-        scrap_obj = scrap.Scrap(self.target).scrapper
-        for item in scrap_obj.result:
-            if item["value"] not in [negative_filter["value"] for negative_filter in self.initial_filters if not negative_filter["positive"]]: # If not in initial negative filters
-                self.children_footprints.append(
-                    RecursionHandler.get(fingerprint=self.belongs_to, target=item["value"], source_footprint=self, method=item["method"], target_type=item["type"])
-                )
+        return ("scrap", self.target)
+
+    def fetch(self) -> list:
+        """
+        This method instanciate :class:`Scrap <src.scrap.Scrap>` class and returns the obtained results.
+
+        Returns:
+            list: Obtained items.
+        """
+        return scrap.Scrap(self.target).scrapper.result
 
 
 class TerminalFootprint(Footprint):
@@ -168,18 +232,25 @@ class TerminalFootprint(Footprint):
         method (str, optional): inherited from Footprint. Defaults to None.
         source_footprint (Footprint, optional): Footprint from which current one was obtained. Defaults to None.
     """
+    __slots__ = ()
+
     def __init__(self, fingerprint, target: str, target_type: str = None, method: str = None, source_footprint: Footprint = None):
         super().__init__(fingerprint, target, target_type, method)
         self.source_footprint = source_footprint
-        self.key = hash_string(str(self.source_footprint.key) + target)
-        self.process()
 
-    def process(self) -> None:
+    def get_request(self) -> None:
+        """
+        This method returns None because no further information is obtained from :class:`TerminalFootprint`
+
+        """
+        return None
+
+    def fetch(self) -> list:
         """
         This method does nothing because no further information is obtained from :class:`TerminalFootprint`
 
         """
-        pass
+        return []
 
 
 class RecursionHandler:
@@ -201,9 +272,30 @@ class RecursionHandler:
         Returns:
             Footprint: An object :class:`SearchableFootprint`, :class:`ScrapableFootprint` or :class:`TerminalFootprint` correctly instanciated.
         """
+        if cls.check_target_not_duplicate(fingerprint, target):
+            fp = cls.build(fingerprint=fingerprint, target=target, method=method, source_footprint=source_footprint, target_type=target_type)
+        else:
+            fp = TerminalFootprint(fingerprint=fingerprint, target=target, target_type=target_type or cls.eval_target_type(target), method=method, source_footprint=source_footprint)
+        cls.register(fp)
+        return fp
+
+    @classmethod
+    def build(cls, fingerprint, target: str, method: str, source_footprint: Footprint, target_type: str = None) -> Footprint:
+        """ This method chooses the class of a footprint according to its type and the remaining depth, without checking if it is a duplicate.
+        The returned footprint is not registered in the fingerprint, so it can be used to anticipate the investigations of the tree.
+
+        Args:
+            fingerprint (:class:`FingerprintHandler`): Fingerprint to which the footprint belongs
+            target (str): Value of the footprint
+            method (str): Method used to obtain footprint
+            source_footprint (Footprint): Footprint from which current one was obtained
+            target_type (str, optional): Type of the  of the footprint. Defaults to None.
+        Returns:
+            Footprint: An object :class:`SearchableFootprint`, :class:`ScrapableFootprint` or :class:`TerminalFootprint` correctly instanciated.
+        """
         if target_type == None:
             target_type = cls.eval_target_type(target)
-        if source_footprint.search_depth > 0 and cls.check_target_not_duplicate(fingerprint, target):
+        if source_footprint.search_depth > 0:
             if target_type in ftype.SCRAPABLE_TYPES:
                 return ScrapableFootprint(fingerprint=fingerprint, target=target, target_type=target_type, method=method, source_footprint=source_footprint)
             elif target_type in ftype.SEARCHABLE_TYPES:
@@ -226,7 +318,9 @@ class RecursionHandler:
         for i in range(len(initial_filters)):
             if not initial_filters[i]["type"]:
                 initial_filters[i]["type"] = cls.eval_target_type(initial_filters[i]["value"])
-        return SearchableFootprint(fingerprint=fingerprint, target=target, target_type=cls.eval_target_type(target), method="user_input", search_depth=(search_depth - 1), initial_filters=initial_filters)
+        root = SearchableFootprint(fingerprint=fingerprint, target=target, target_type=cls.eval_target_type(target), method="user_input", search_depth=(search_depth - 1), initial_filters=initial_filters)
+        cls.register(root)
+        return root
         
     @classmethod
     def eval_target_type(cls, target: str) -> str:
@@ -254,6 +348,7 @@ class RecursionHandler:
     @classmethod
     def check_target_not_duplicate(cls, belongs_to, target: str) -> bool:
         """ This method checks if target footprint already exists in the tree, if yes no new recursion will be done on it.
+        The check is a lookup in the index of targets owned by the fingerprint, so it does not depend on the size of the tree.
 
         Args:
             belongs_to (:class:`FingerprintHandler`): Fingerprint tree to which the check must be limited
@@ -262,10 +357,16 @@ class RecursionHandler:
         Returns:
             bool: Existence of the target footprint.
         """
-        for instance in Footprint.instances():
-            if instance.belongs_to == belongs_to and instance.target.lower() == target.lower():
-                return False
-        return True
+        return target.lower() not in belongs_to.seen
+
+    @classmethod
+    def register(cls, fp: Footprint) -> None:
+        """ This method adds the target of a footprint to the index of targets of its fingerprint, used by `check_target_not_duplicate()`.
+
+        Args:
+            fp (Footprint): Footprint created in the tree.
+        """
+        fp.belongs_to.seen.add(fp.target.lower())
 
 
     def is_url(string: str) -> bool:
@@ -302,6 +403,17 @@ class RecursionHandler:
         else:
             return False
         
+def intern_string(string: Optional[str]) -> Optional[str]:
+    """ This function interns a string, so that all footprints with the same type or method share a single copy of it.
+
+    Args:
+        string (str, optional): String to intern.
+
+    Returns:
+        str: Interned string, None if None is given.
+    """
+    return sys.intern(string) if string is not None else None
+
 def hash_string(string: str):
     encoded_string = string.encode('utf-8')
     hash_object = hashlib.sha256(encoded_string)
@@ -1,5 +1,22 @@
+from collections import namedtuple
+import sys
+
 MAIN_FILTERS = ["name", "username"]
 FILTERS = ["email", "location", "phone", "occupation"]
 SCRAPABLE_TYPES = ["url"]
 SEARCHABLE_TYPES = FILTERS + MAIN_FILTERS
 SCRAP_RETURN = ["name", "username","description", "location", "url", "birthdate", "image", "occupation", "company"]
+
+
+class Result(namedtuple("Result", ["type", "value", "method"])):
+    """ This class is the record used to carry footprints found by searches, scraps and OSINT investigations.
+
+    Attributes:
+        type (str): Type of the footprint, None if unknown.
+        value (str): Value of the footprint.
+        method (str): Method used to obtain the footprint.
+    """
+    __slots__ = ()
+
+    def __new__(cls, type: str, value: str, method: str):
+        return super().__new__(cls, sys.intern(type) if type is not None else None, value, sys.intern(method))
@@ -0,0 +1,109 @@
+from opp import rate_limit
+from opp import deadline
+import atexit
+import importlib.util
+import threading
+import httpx
+
+USER_AGENT = "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:109.0) Gecko/20100101 Firefox/110.0"
+DEFAULT_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+DEFAULT_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0)
+# HTTP/2 is used when the optional h2 package is installed (pip install httpx[http2])
+HTTP2 = importlib.util.find_spec("h2") is not None
+
+class HttpClient:
+    """ This singleton class is the HTTP layer used by the search, scrap and osint modules.
+
+    It keeps a pool of keep-alive connections for the lifetime of the process, so TLS handshakes are not paid on every request,
+    and applies the same User-Agent, timeouts and redirection policy to every request.
+    Every request, including the ones of asynchronous clients, goes through :class:`rate_limit.RateLimiter`, which bounds the rate
+    and the concurrency of the requests sent to each host.
+
+    Attributes:
+        client (httpx.Client): Pooled client shared by all threads.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                instance = super().__new__(cls)
+                options = cls.get_client_options()
+                transport = httpx.HTTPTransport(http2=options.pop("http2"), limits=options.pop("limits"))
+                instance.client = httpx.Client(transport=rate_limit.RateLimitedTransport(transport), **options)
+                atexit.register(instance.client.close)
+                cls._instance = instance
+        return cls._instance
+
+    @classmethod
+    def get_client_options(cls) -> dict:
+        """ This method returns the options shared by the synchronous and asynchronous clients.
+
+        Returns:
+            dict: Keyword arguments for `httpx.Client` and `httpx.AsyncClient`.
+        """
+        return {
+            "http2": HTTP2,
+            "limits": DEFAULT_LIMITS,
+            "timeout": DEFAULT_TIMEOUT,
+            "headers": {"User-Agent": USER_AGENT},
+            "follow_redirects": True
+        }
+
+    def get_timeout(self, timeout: float = None) -> httpx.Timeout:
+        """ This method returns the timeout of a request, bounded by the deadline of the current run.
+
+        Args:
+            timeout (float, optional): Timeout in seconds, instead of `DEFAULT_TIMEOUT`. Defaults to None.
+
+        Raises:
+            deadline.DeadlineExceeded: If the deadline is already over.
+
+        Returns:
+            httpx.Timeout: Timeout of the request.
+        """
+        timeout = httpx.Timeout(timeout) if timeout is not None else DEFAULT_TIMEOUT
+        if deadline.get() is None:
+            return timeout
+        return httpx.Timeout(deadline.clip(timeout.read), connect=deadline.clip(timeout.connect))
+
+    def get(self, url: str, headers: dict = None, timeout: float = None) -> httpx.Response:
+        """ This method sends a GET request with the shared client.
+
+        Args:
+            url (str): URL to get.
+            headers (dict, optional): Headers added to the default ones. Defaults to None.
+            timeout (float, optional): Timeout in seconds, instead of `DEFAULT_TIMEOUT`, bounded by the deadline of the current run. Defaults to None.
+
+        Returns:
+            httpx.Response: Obtained response.
+        """
+        return self.client.get(url, headers=headers, timeout=self.get_timeout(timeout))
+
+    def post(self, url: str, json: dict = None, timeout: float = None, follow_redirects: bool = True) -> httpx.Response:
+        """ This method sends a POST request with a JSON body with the shared client.
+
+        Args:
+            url (str): URL to post to.
+            json (dict, optional): Body of the request. Defaults to None.
+            timeout (float, optional): Timeout in seconds, instead of `DEFAULT_TIMEOUT`, bounded by the deadline of the current run. Defaults to None.
+            follow_redirects (bool, optional): If False, a redirection is returned instead of being followed. Defaults to True.
+
+        Returns:
+            httpx.Response: Obtained response.
+        """
+        return self.client.post(url, json=json, timeout=self.get_timeout(timeout), follow_redirects=follow_redirects)
+
+    def async_client(self) -> httpx.AsyncClient:
+        """ This method returns an asynchronous client with the same options as the shared one.
+        Connections of an asynchronous client are bound to the event loop which uses them, so the caller is responsible for closing it.
+        Redirections are not followed, because Holehe and Ignorant modules inspect them.
+
+        Returns:
+            httpx.AsyncClient: Asynchronous client.
+        """
+        options = self.get_client_options()
+        options["follow_redirects"] = False
+        transport = httpx.AsyncHTTPTransport(http2=options.pop("http2"), limits=options.pop("limits"))
+        return httpx.AsyncClient(transport=rate_limit.AsyncRateLimitedTransport(transport), **options)
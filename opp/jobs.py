@@ -0,0 +1,249 @@
+from opp import http_client
+from opp import deadline
+from opp import parse_pool
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from urllib.parse import urlparse
+import collections
+import ipaddress
+import socket
+import threading
+import time
+import uuid
+import httpx
+
+# Defaults of the options which are not set with the OPP_JOB_WORKERS, OPP_JOB_RESULT_TTL and OPP_JOB_MAX_QUEUED environment variables
+DEFAULT_WORKERS = 2
+DEFAULT_RESULT_TTL = 3600
+DEFAULT_MAX_QUEUED = 100
+CALLBACK_SCHEMES = ("http", "https")
+
+def is_public_url(url: str) -> bool:
+    """ This function checks that a callback URL given by a client is an HTTP(S) URL whose host only resolves to public addresses,
+    so the server cannot be used to post to itself or to its private network.
+
+    Args:
+        url (str): URL to check.
+
+    Returns:
+        bool: True if the URL can be posted to.
+    """
+    try:
+        parsed_url = urlparse(url)
+        port = parsed_url.port
+    except ValueError:
+        return False
+    if parsed_url.scheme not in CALLBACK_SCHEMES or not parsed_url.hostname:
+        return False
+    try:
+        addresses = socket.getaddrinfo(parsed_url.hostname, port or 80, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError):
+        return False
+    return all(ipaddress.ip_address(address[4][0].split("%")[0]).is_global for address in addresses)
+
+class QueueFullError(RuntimeError):
+    """ This exception is raised when a job is submitted while the queue already holds `max_queued` jobs.
+
+    """
+
+
+class Job:
+    """ This class is a long-running task executed by :class:`JobManager`.
+
+    Attributes:
+        function (callable): Function called with the job as only argument, its return value is the result of the job.
+        callback_url (str, optional): URL to which the status of the job is posted when it is finished. Defaults to None.
+        id (str): Identifier of the job.
+        status (str): queued, running, done or failed.
+        progress: Object with an `as_dict()` method giving the progress counters of the job, set by `function`.
+        result: Return value of `function`.
+        error (str): Error raised by `function`.
+        callback_error (str): Error of the post to `callback_url`.
+    """
+    def __init__(self, function, callback_url: str = None):
+        self.function = function
+        self.callback_url = callback_url
+        self.id = uuid.uuid4().hex
+        self.status = "queued"
+        self.progress = None
+        self.result = None
+        self.error = None
+        self.callback_error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def is_finished(self) -> bool:
+        """ This method checks if the job is done or failed.
+
+        Returns:
+            bool: True if the job is finished.
+        """
+        return self.status in ("done", "failed")
+
+
+class JobManager:
+    """ This singleton class executes jobs with a bounded pool of workers and keeps their results during `result_ttl` seconds after their end.
+
+    Attributes:
+        workers (int, optional): Number of jobs executed at the same time. Defaults to the `OPP_JOB_WORKERS` environment variable, or `DEFAULT_WORKERS`.
+        result_ttl (int, optional): Lifetime in seconds of a finished job. Defaults to the `OPP_JOB_RESULT_TTL` environment variable, or `DEFAULT_RESULT_TTL`.
+        max_queued (int, optional): Maximum number of jobs waiting for a worker. Defaults to the `OPP_JOB_MAX_QUEUED` environment variable,
+            or `DEFAULT_MAX_QUEUED`.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls, workers: int = None, result_ttl: int = None, max_queued: int = None):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls.create(workers, result_ttl, max_queued)
+        return cls._instance
+
+    @classmethod
+    def create(cls, workers: int = None, result_ttl: int = None, max_queued: int = None) -> "JobManager":
+        """ This method creates a manager and its pool of workers, options which are not given are read from the environment.
+
+        Raises:
+            ValueError: If an environment variable is not an integer.
+
+        Returns:
+            JobManager: Created manager.
+        """
+        if workers is None:
+            workers = parse_pool.get_env_int("OPP_JOB_WORKERS", DEFAULT_WORKERS)
+        if result_ttl is None:
+            result_ttl = parse_pool.get_env_int("OPP_JOB_RESULT_TTL", DEFAULT_RESULT_TTL)
+        if max_queued is None:
+            max_queued = parse_pool.get_env_int("OPP_JOB_MAX_QUEUED", DEFAULT_MAX_QUEUED)
+        instance = super().__new__(cls)
+        instance.workers = max(1, workers)
+        instance.result_ttl = result_ttl
+        instance.max_queued = max_queued
+        instance.executor = ThreadPoolExecutor(max_workers=instance.workers, thread_name_prefix="opp-job")
+        instance.jobs = {}
+        instance.queue = collections.deque()
+        instance.lock = threading.Lock()
+        return instance
+
+    def submit(self, function, callback_url: str = None) -> Job:
+        """ This method queues a new job.
+
+        Args:
+            function (callable): Function called with the job as only argument.
+            callback_url (str, optional): URL to which the status of the job is posted when it is finished. Defaults to None.
+
+        Raises:
+            QueueFullError: If `max_queued` jobs are already waiting.
+
+        Returns:
+            Job: Queued job.
+        """
+        self.purge()
+        job = Job(function, callback_url)
+        with self.lock:
+            if len(self.queue) >= self.max_queued:
+                raise QueueFullError("%d jobs are already queued" % len(self.queue))
+            self.jobs[job.id] = job
+            self.queue.append(job.id)
+        self.executor.submit(self.run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """ This method returns a job, unless it is unknown or expired.
+
+        Args:
+            job_id (str): Identifier of the job.
+
+        Returns:
+            Optional[Job]: Job, or None.
+        """
+        self.purge()
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def get_position(self, job: Job) -> Optional[int]:
+        """ This method returns the position of a job in the queue, 1 being the next job to start.
+
+        Args:
+            job (Job): Queued job.
+
+        Returns:
+            Optional[int]: Position of the job, or None if it is not queued anymore.
+        """
+        with self.lock:
+            try:
+                return self.queue.index(job.id) + 1
+            except ValueError:
+                return None
+
+    def get_status(self, job: Job) -> dict:
+        """ This method returns the status of a job as a JSON compatible dict.
+
+        Args:
+            job (Job): Job to describe.
+
+        Returns:
+            dict: Status of the job.
+        """
+        return {
+            "id": job.id,
+            "status": job.status,
+            "position": self.get_position(job),
+            "progress": job.progress.as_dict() if job.progress is not None else None,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+            "expires_at": job.finished_at + self.result_ttl if job.finished_at else None,
+            "error": job.error,
+            "callback_error": job.callback_error
+        }
+
+    def run(self, job: Job) -> None:
+        """ This method is run by workers : it executes a job, then posts its status to its callback URL.
+
+        Args:
+            job (Job): Job to execute.
+        """
+        with self.lock:
+            self.queue.remove(job.id)
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = job.function(job)
+            status = "done"
+        except Exception as error:
+            job.error = repr(error)
+            status = "failed"
+        # The end date must be known once the job is seen as finished
+        job.finished_at = time.time()
+        job.status = status
+        if job.callback_url:
+            self.notify(job)
+
+    def notify(self, job: Job) -> None:
+        """ This method posts the status of a finished job to its callback URL. The URL is given by the client, so it must be public
+        and redirections are not followed. Errors of the callback are recorded in the job, without changing its status.
+
+        Args:
+            job (Job): Finished job.
+        """
+        if not is_public_url(job.callback_url):
+            job.callback_error = "Callback URL is not a public HTTP(S) URL"
+            return
+        try:
+            response = http_client.HttpClient().post(job.callback_url, json=self.get_status(job), follow_redirects=False)
+        except (httpx.HTTPError, httpx.InvalidURL, deadline.DeadlineExceeded) as error:
+            job.callback_error = repr(error)
+            return
+        if response.status_code >= 300:
+            job.callback_error = "Callback returned HTTP %d" % response.status_code
+
+    def purge(self) -> None:
+        """ This method forgets the jobs finished for more than `result_ttl` seconds.
+
+        """
+        now = time.time()
+        with self.lock:
+            for job_id in [job_id for job_id, job in self.jobs.items() if job.is_finished() and job.finished_at + self.result_ttl < now]:
+                del self.jobs[job_id]
@@ -20,21 +20,30 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 EXCLUDE
 """
 
-import httpx
+import atexit
+import math
+import threading
+import time
 import trio
 from opp import osint_imports
+from opp import ftype
+from opp import http_client
+from opp import cache
+from opp import deadline
 from holehe.localuseragent import ua
 from ignorant.localuseragent import ua
 
+MODULE_TIMEOUT = 10
+MAX_CONCURRENT_MODULES = 64
+QUARANTINE_AFTER = 5
+QUARANTINE_PERIOD = 24 * 3600
+
 async def launch_holehe(module, email, client, out):
     """
     This async function simply launches the given Holehe module with given arguments.
 
     """
-    try:
-        await module(email, client, out)
-    except Exception:
-        pass
+    await module(email, client, out)
 
 async def launch_ignorant(module, phone, client, out):
     """
@@ -56,59 +65,369 @@ async def launch_ignorant(module, phone, client, out):
         else:
             prefix = ""
             number = "".join(tmp_split[:])
-    try:
-        await module(number, prefix, client, out)
-    except Exception:
-        pass
+    await module(number, prefix, client, out)
+
+LAUNCHERS = {
+    "email": (launch_holehe, osint_imports.WEBSITES_holehe),
+    "phone": (launch_ignorant, osint_imports.WEBSITES_ignorant)
+}
 
-async def megadose_toolkit(launch_method, websites: list, target: str) -> list:
-    """ This function instanciates a http client, calls given website functions and returns results in footprint format.
+def module_name(module) -> str:
+    """ This function returns the name of a Holehe or Ignorant module, as imported in `osint_imports`.
 
     Args:
-        launch_method: Function to select Holehe or Ignorant launcher.
-        websites (list): Website functions to call.
-        target (str): Target email or phone number to investigate.
+        module: Website function.
 
     Returns:
-        list: Obtained footprints
+        str: Name of the module, e.g. "holehe_instagram".
     """
-    # Def the async client
-    client = httpx.AsyncClient(timeout=10)
-    # Launching the modules
-    out = []
-    async with trio.open_nursery() as nursery:
-        for website in websites:
-            nursery.start_soon(launch_method, website, target, client, out)
-    # Close the client
-    await client.aclose()
-    # Return the result
-    return [
-        {
-            "value" : asset["domain"],
-            "type" : "has_account",
-            "method" : "osint_megadose",
-            "positive" : True
+    return module.__module__.split(".")[0] + "_" + module.__name__
+
+def match_modules(module, names: list) -> bool:
+    """ This function checks if a module is in a list of module names, given with or without their "holehe_" / "ignorant_" prefix.
+
+    Args:
+        module: Website function.
+        names (list): Module names.
+
+    Returns:
+        bool: True if the module is in the list.
+    """
+    return module_name(module) in names or module.__name__ in names
+
+
+class ModuleStats:
+    """ This singleton class keeps, for each Holehe and Ignorant module, its number of runs, hits, failures and its cumulated latency.
+    Statistics are stored in the SQLite cache file, so they are kept between runs.
+
+    They are used to schedule modules : modules which are fast and often find accounts are started first,
+    and a module which failed (error, timeout or rate limit) `QUARANTINE_AFTER` times in a row is not launched any more
+    during `QUARANTINE_PERIOD`, after which it is launched again once to probe it.
+
+    Attributes:
+        db_file (str, optional): SQLite file of the statistics. Defaults to `cache.DEFAULT_DB_FILE`.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls, db_file: str = None):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls.create(db_file or cache.DEFAULT_DB_FILE)
+        return cls._instance
+
+    @classmethod
+    def configure(cls, db_file: str = cache.DEFAULT_DB_FILE) -> "ModuleStats":
+        """ This method replaces the statistics by the ones stored in the given file.
+
+        Returns:
+            ModuleStats: Configured statistics.
+        """
+        with cls._lock:
+            cls._instance = cls.create(db_file)
+        return cls._instance
+
+    @classmethod
+    def create(cls, db_file: str) -> "ModuleStats":
+        """ This method loads the statistics stored in the given file.
+
+        Returns:
+            ModuleStats: Loaded statistics.
+        """
+        instance = super().__new__(cls)
+        instance.lock = threading.Lock()
+        instance.db_conn = cache.open_database(db_file)
+        instance.db_conn.execute("CREATE TABLE IF NOT EXISTS osint_module_stats (name TEXT PRIMARY KEY, runs INTEGER, hits INTEGER, failures INTEGER, latency REAL, consecutive_failures INTEGER, quarantined_until REAL)")
+        instance.modules = {
+            row[0]: {"runs": row[1], "hits": row[2], "failures": row[3], "latency": row[4], "consecutive_failures": row[5], "quarantined_until": row[6]}
+            for row in instance.db_conn.execute("SELECT name, runs, hits, failures, latency, consecutive_failures, quarantined_until FROM osint_module_stats")
         }
-        for asset in out if asset["exists"] == True ]
+        instance.updated = set()
+        return instance
+
+    def get(self, name: str) -> dict:
+        """ This method returns the statistics of a module. The lock must be held by the caller.
+
+        """
+        if name not in self.modules:
+            self.modules[name] = {"runs": 0, "hits": 0, "failures": 0, "latency": 0.0, "consecutive_failures": 0, "quarantined_until": 0.0}
+        return self.modules[name]
+
+    def record(self, name: str, latency: float, hit: bool = False, failed: bool = False) -> None:
+        """ This method records a run of a module, and quarantines it if it failed too many times in a row.
+
+        Args:
+            name (str): Name of the module.
+            latency (float): Duration of the run in seconds.
+            hit (bool, optional): True if the module found an account. Defaults to False.
+            failed (bool, optional): True if the module raised an error, exceeded its deadline or was rate limited. Defaults to False.
+        """
+        with self.lock:
+            stats = self.get(name)
+            stats["runs"] += 1
+            stats["latency"] += latency
+            stats["hits"] += 1 if hit else 0
+            if failed:
+                stats["failures"] += 1
+                stats["consecutive_failures"] += 1
+                if stats["consecutive_failures"] >= QUARANTINE_AFTER:
+                    stats["quarantined_until"] = time.time() + QUARANTINE_PERIOD
+            else:
+                stats["consecutive_failures"] = 0
+                stats["quarantined_until"] = 0.0
+            self.updated.add(name)
+
+    def is_quarantined(self, name: str) -> bool:
+        """ This method checks if a module is in quarantine.
+
+        Args:
+            name (str): Name of the module.
+
+        Returns:
+            bool: True if the module must not be launched.
+        """
+        with self.lock:
+            return self.get(name)["quarantined_until"] > time.time()
+
+    def score(self, name: str) -> float:
+        """ This method gives the priority of a module : its hit rate divided by its mean latency.
+        Both are smoothed, so that modules never launched get a fair chance.
+
+        Args:
+            name (str): Name of the module.
+
+        Returns:
+            float: Priority of the module, the highest first.
+        """
+        with self.lock:
+            stats = self.get(name)
+            hit_rate = (stats["hits"] + 1) / (stats["runs"] + 2)
+            mean_latency = (stats["latency"] + 1.0) / (stats["runs"] + 1)
+            return hit_rate / mean_latency
+
+    def schedule(self, modules: list) -> tuple:
+        """ This method orders modules by priority and removes the ones in quarantine.
+
+        Args:
+            modules (list): Website functions.
+
+        Returns:
+            tuple: Scheduled website functions, and names of the modules in quarantine.
+        """
+        quarantined = [module_name(module) for module in modules if self.is_quarantined(module_name(module))]
+        scheduled = [module for module in modules if module_name(module) not in quarantined]
+        return sorted(scheduled, key=lambda module: self.score(module_name(module)), reverse=True), quarantined
+
+    def flush(self) -> None:
+        """ This method writes the updated statistics to the SQLite file.
+
+        """
+        with self.lock:
+            rows = [(name, stats["runs"], stats["hits"], stats["failures"], stats["latency"], stats["consecutive_failures"], stats["quarantined_until"])
+                    for name, stats in self.modules.items() if name in self.updated]
+            self.updated = set()
+            if rows:
+                self.db_conn.execute("BEGIN")
+                self.db_conn.executemany("INSERT OR REPLACE INTO osint_module_stats (name, runs, hits, failures, latency, consecutive_failures, quarantined_until) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                self.db_conn.execute("COMMIT")
+
+
+class OsintReport:
+    """ This class gathers what the modules launched on a target found, and which modules did not complete.
+
+    Attributes:
+        target_type (str): Type of the target, "email" or "phone".
+        target (str): Email or phone number investigated.
+        results (list): Obtained footprints.
+        completed (list): Names of the modules which completed.
+        timed_out (list): Names of the modules which exceeded their deadline.
+        errors (dict): Errors of the modules which failed, by module name.
+        quarantined (list): Names of the modules not launched because of their repeated failures.
+    """
+    def __init__(self, target_type: str, target: str):
+        self.target_type = target_type
+        self.target = target
+        self.results = []
+        self.completed = []
+        self.timed_out = []
+        self.errors = {}
+        self.quarantined = []
+
+
+class OsintRuntime:
+    """ This singleton class runs Holehe and Ignorant modules in a trio event loop which lives as long as the process, in a background thread.
+
+    All investigations share the same asynchronous HTTP client. Each module has its own deadline, so a slow module does not delay the others,
+    and results are reported as soon as their module completes. At most `MAX_CONCURRENT_MODULES` modules run at the same time,
+    they are started in the order given by :class:`ModuleStats`, workers taking them from a single queue.
+
+    Attributes:
+        client (httpx.AsyncClient): Client shared by all modules.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                instance = super().__new__(cls)
+                instance.start()
+                cls._instance = instance
+        return cls._instance
+
+    def start(self) -> None:
+        """ This method starts the event loop thread and waits for it to be ready.
+
+        """
+        started = threading.Event()
+        self.trio_token = None
+        self.thread = threading.Thread(target=trio.run, args=(self.main, started), name="opp-osint", daemon=True)
+        self.thread.start()
+        started.wait()
+        if self.trio_token is None:
+            raise RuntimeError("OSINT runtime could not start")
+        atexit.register(self.close)
+
+    async def main(self, started: threading.Event) -> None:
+        """ This async function is the main task of the event loop, it keeps the loop alive until `close()` is called.
+
+        """
+        try:
+            self.client = http_client.HttpClient().async_client()
+            self.limiter = trio.CapacityLimiter(MAX_CONCURRENT_MODULES)
+            self.cancel_scope = trio.CancelScope()
+            self.trio_token = trio.lowlevel.current_trio_token()
+        finally:
+            started.set()
+        with self.cancel_scope:
+            await trio.sleep_forever()
+        await self.client.aclose()
+
+    def close(self) -> None:
+        """ This method stops the event loop and closes the shared client.
+
+        """
+        try:
+            trio.from_thread.run_sync(self.cancel_scope.cancel, trio_token=self.trio_token)
+        except trio.RunFinishedError:
+            return
+        self.thread.join()
+
+    def investigate(self, targets: list, on_result=None, module_timeout: float = MODULE_TIMEOUT, allow: list = None, deny: list = None) -> list:
+        """ This method launches in parallel all the modules on all the given targets, and waits for them to complete or to exceed their deadline.
+        It can be called from any thread but the one of the event loop.
+
+        Args:
+            targets (list): Tuples (type, value) of the targets, type being "email" or "phone".
+            on_result (callable, optional): Function called with the report and the new results each time a module finds something.
+                It is called from the thread of the event loop, so it must return quickly. Defaults to None.
+            module_timeout (float, optional): Deadline of the modules in seconds, waiting for a slot included. Defaults to `MODULE_TIMEOUT`.
+            allow (list, optional): If given, only these modules are launched. Defaults to None.
+            deny (list, optional): Modules which must not be launched. Defaults to None.
+
+        Returns:
+            list: One :class:`OsintReport` per target.
+        """
+        return trio.from_thread.run(self.investigate_async, targets, on_result, module_timeout, allow, deny, trio_token=self.trio_token)
+
+    async def investigate_async(self, targets: list, on_result, module_timeout: float, allow: list = None, deny: list = None) -> list:
+        reports = [OsintReport(target_type, target) for target_type, target in targets]
+        # Trio does not start tasks in the order they are spawned, so modules are queued in the order of their priority
+        # and workers take the next one each time they get a slot
+        send_channel, receive_channel = trio.open_memory_channel(math.inf)
+        scheduled = 0
+        for report in reports:
+            launch_method, websites = LAUNCHERS[report.target_type]
+            websites = [website for website in websites if (not allow or match_modules(website, allow)) and not (deny and match_modules(website, deny))]
+            websites, report.quarantined = ModuleStats().schedule(websites)
+            for website in websites:
+                send_channel.send_nowait((launch_method, website, report))
+            scheduled += len(websites)
+        send_channel.close()
+        # Waiting for a slot counts in the deadline of a module
+        deadline_at = trio.current_time() + module_timeout
+        async with trio.open_nursery() as nursery:
+            for _ in range(min(scheduled, MAX_CONCURRENT_MODULES)):
+                nursery.start_soon(self.run_modules, receive_channel, on_result, deadline_at)
+        # Modules which did not get a slot before their deadline were not launched, they are not counted as failures
+        while True:
+            try:
+                _, module, report = receive_channel.receive_nowait()
+            except trio.EndOfChannel:
+                break
+            report.timed_out.append(module_name(module))
+        await trio.to_thread.run_sync(ModuleStats().flush)
+        return reports
+
+    async def run_modules(self, modules: trio.MemoryReceiveChannel, on_result, deadline_at: float) -> None:
+        """ This async function is a worker of an investigation : each time it gets a slot of the limiter, it runs the next module of the queue,
+        until the queue is empty or the deadline of the modules is over.
+
+        """
+        while True:
+            with trio.move_on_at(deadline_at) as scope:
+                await self.limiter.acquire()
+            # A cancelled acquisition does not hold a slot
+            if scope.cancelled_caught:
+                return
+            try:
+                try:
+                    launch_method, module, report = modules.receive_nowait()
+                except trio.EndOfChannel:
+                    return
+                await self.run_module(launch_method, module, report, on_result, deadline_at)
+            finally:
+                self.limiter.release()
+
+    async def run_module(self, launch_method, module, report: OsintReport, on_result, deadline_at: float) -> None:
+        """ This async function launches a module with its deadline, and records its results, its timeout or its error in the report.
+
+        """
+        name = module_name(module)
+        out = []
+        start = trio.current_time()
+        with trio.move_on_at(deadline_at) as scope:
+            try:
+                await launch_method(module, report.target, self.client, out)
+            except Exception as error:
+                report.errors[name] = repr(error)
+                ModuleStats().record(name, trio.current_time() - start, failed=True)
+                return
+        latency = trio.current_time() - start
+        results = [ftype.Result("has_account", asset["domain"], "osint_megadose") for asset in out if asset.get("exists") == True]
+        rate_limited = any(asset.get("rateLimit") for asset in out)
+        ModuleStats().record(name, latency, hit=bool(results), failed=scope.cancelled_caught or rate_limited)
+        if scope.cancelled_caught:
+            report.timed_out.append(name)
+        else:
+            report.completed.append(name)
+        if results:
+            report.results += results
+            if on_result:
+                on_result(report, results)
 
-def email(target_email: str) -> list:
-    """ This function launches in parallel all Holehe modules with given email using `trio` library and `megadose_toolkit()`.
+def email(target_email: str, allow: list = None, deny: list = None) -> list:
+    """ This function launches in parallel all Holehe modules with given email using :class:`OsintRuntime`, within the deadline of the current run.
 
     Args:
         target_email (str): Email to investigate.
+        allow (list, optional): If given, only these modules are launched. Defaults to None.
+        deny (list, optional): Modules which must not be launched. Defaults to None.
 
     Returns:
         list: Obtained footprints
     """
-    return trio.run(megadose_toolkit, launch_holehe, osint_imports.WEBSITES_holehe, target_email)
+    return OsintRuntime().investigate([("email", target_email)], module_timeout=deadline.clip(MODULE_TIMEOUT), allow=allow, deny=deny)[0].results
 
-def phone(target_phone: str) -> list:
-    """ This function launches in parallel all Ignorant modules with given phone number using `trio` library and `megadose_toolkit()`.
+def phone(target_phone: str, allow: list = None, deny: list = None) -> list:
+    """ This function launches in parallel all Ignorant modules with given phone number using :class:`OsintRuntime`, within the deadline of the current run.
 
     Args:
         target_phone (str): Phone number to investigate.
+        allow (list, optional): If given, only these modules are launched. Defaults to None.
+        deny (list, optional): Modules which must not be launched. Defaults to None.
 
     Returns:
         list: Obtained footprints
     """
-    return trio.run(megadose_toolkit, launch_ignorant, osint_imports.WEBSITES_ignorant, target_phone)
+    return OsintRuntime().investigate([("phone", target_phone)], module_timeout=deadline.clip(MODULE_TIMEOUT), allow=allow, deny=deny)[0].results
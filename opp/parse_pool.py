@@ -0,0 +1,201 @@
+from opp import deadline
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import concurrent.futures
+import multiprocessing
+import os
+import threading
+
+# Parsing is done in the calling thread unless workers are given, OPP_PARSE_WORKERS overrides it
+DEFAULT_WORKERS = 0
+# 0 for twice the number of workers, OPP_PARSE_MAX_IN_FLIGHT overrides it
+DEFAULT_MAX_IN_FLIGHT = 0
+
+def get_env_int(name: str, default: int) -> int:
+    """ This function reads an integer option from the environment. It is read when the pool is created, not when the module is imported,
+    so a malformed value does not prevent the scrappers and the API from being imported.
+
+    Args:
+        name (str): Name of the environment variable.
+        default (int): Value if the variable is not set.
+
+    Raises:
+        ValueError: If the variable is not an integer.
+
+    Returns:
+        int: Value of the option.
+    """
+    value = os.environ.get(name, "").strip()
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError("%s must be an integer, not %r" % (name, value)) from None
+
+def extract_records(scrapper: type, content: bytes) -> list:
+    """ This function extracts the footprints of a page with the `EXTRACTOR` of a scrapper, it is run by the workers of :class:`ParsePool`.
+
+    Args:
+        scrapper (type): Subclass of :class:`scrap.AbstractScrapper`, pickled by reference so it is imported by the worker.
+        content (bytes): Content of the page.
+
+    Returns:
+        list: Found footprints, as dictionaries with "type", "value" and "method" keys.
+    """
+    return [result._asdict() for result in scrapper.EXTRACTOR.extract(content, scrapper.METHOD_NAME)]
+
+
+class ParsePool:
+    """ This singleton class parses pages in a pool of processes, so parsing, which holds the GIL, runs on several cores
+    and does not slow down the other threads of the process, such as the ones of the API.
+
+    Workers are spawned rather than forked, as the process already runs threads, and only receive the content of the pages and
+    return plain records. At most `max_in_flight` pages are sent to the workers at the same time, callers wait for a slot,
+    within the deadline of their run, so the pages waiting to be parsed are not all kept in memory.
+
+    Attributes:
+        workers (int, optional): Number of processes, 0 to parse in the calling thread. Defaults to the OPP_PARSE_WORKERS environment variable, or `DEFAULT_WORKERS`.
+        max_in_flight (int, optional): Maximum number of pages sent to the workers at the same time. Defaults to the OPP_PARSE_MAX_IN_FLIGHT environment variable,
+            or `DEFAULT_MAX_IN_FLIGHT`.
+        parsed (int): Number of pages parsed by the workers.
+        waiting (int): Number of pages waiting for a slot.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls, workers: int = None, max_in_flight: int = None):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls.create(workers, max_in_flight)
+        return cls._instance
+
+    @classmethod
+    def configure(cls, workers: int = None, max_in_flight: int = None) -> "ParsePool":
+        """ This method replaces the pool by a new one with the given options, pages sent to the previous pool are still parsed.
+
+        Returns:
+            ParsePool: Configured pool.
+        """
+        with cls._lock:
+            previous = cls._instance
+            cls._instance = cls.create(workers, max_in_flight)
+        if previous is not None and previous.executor is not None:
+            previous.executor.shutdown(wait=False)
+        return cls._instance
+
+    @classmethod
+    def create(cls, workers: int = None, max_in_flight: int = None) -> "ParsePool":
+        """ This method creates a pool, its processes are only started when the first pages are sent.
+
+        Raises:
+            ValueError: If an option which is not given is not an integer in the environment.
+
+        Returns:
+            ParsePool: Created pool.
+        """
+        if workers is None:
+            workers = get_env_int("OPP_PARSE_WORKERS", DEFAULT_WORKERS)
+        if max_in_flight is None:
+            max_in_flight = get_env_int("OPP_PARSE_MAX_IN_FLIGHT", DEFAULT_MAX_IN_FLIGHT)
+        instance = super().__new__(cls)
+        instance.workers = max(0, workers)
+        instance.max_in_flight = max_in_flight if max_in_flight > 0 else 2 * instance.workers
+        instance.slots = threading.BoundedSemaphore(max(1, instance.max_in_flight))
+        instance.executor = cls.create_executor(instance.workers) if instance.workers else None
+        instance.lock = threading.Lock()
+        instance.parsed = 0
+        instance.waiting = 0
+        instance.in_flight = 0
+        instance.restarts = 0
+        return instance
+
+    @staticmethod
+    def create_executor(workers: int) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def extract(self, scrapper: type, content: bytes) -> list:
+        """ This method extracts the footprints of a page with the `EXTRACTOR` of a scrapper, in a worker if the pool has workers.
+        If a worker dies, the pool is restarted and the page is parsed in the calling thread.
+
+        Args:
+            scrapper (type): Subclass of :class:`scrap.AbstractScrapper` with an `EXTRACTOR`.
+            content (bytes): Content of the page.
+
+        Raises:
+            deadline.DeadlineExceeded: If the page is not parsed before the deadline of the current run.
+
+        Returns:
+            list: Found footprints, as dictionaries with "type", "value" and "method" keys.
+        """
+        if not self.workers:
+            return extract_records(scrapper, content)
+        self.acquire()
+        executor = self.executor
+        try:
+            future = executor.submit(extract_records, scrapper, content)
+        except BrokenProcessPool:
+            self.release(None)
+            self.restart(executor)
+            return extract_records(scrapper, content)
+        except BaseException:
+            self.release(None)
+            raise
+        future.add_done_callback(self.release)
+        try:
+            records = future.result(timeout=deadline.remaining())
+        except BrokenProcessPool:
+            self.restart(executor)
+            return extract_records(scrapper, content)
+        except concurrent.futures.TimeoutError:
+            # Only an alias of TimeoutError since Python 3.11
+            raise deadline.DeadlineExceeded("the page was not parsed before the deadline")
+        with self.lock:
+            self.parsed += 1
+        return records
+
+    def acquire(self) -> None:
+        """ This method waits for a slot to send a page to the workers.
+
+        Raises:
+            deadline.DeadlineExceeded: If no slot is free before the deadline of the current run.
+        """
+        left = deadline.remaining()
+        if left is not None and left <= 0:
+            raise deadline.DeadlineExceeded("deadline exceeded")
+        with self.lock:
+            self.waiting += 1
+        acquired = self.slots.acquire(timeout=left)
+        with self.lock:
+            self.waiting -= 1
+            if acquired:
+                self.in_flight += 1
+        if not acquired:
+            raise deadline.DeadlineExceeded("no parse worker was free before the deadline")
+
+    def release(self, future) -> None:
+        # Called when a page is parsed, or could not be sent
+        with self.lock:
+            self.in_flight -= 1
+        self.slots.release()
+
+    def restart(self, executor: ProcessPoolExecutor) -> None:
+        """ This method replaces a broken pool of processes, unless it was already replaced by another thread.
+
+        Args:
+            executor (ProcessPoolExecutor): Broken pool.
+        """
+        with self.lock:
+            if self.executor is executor:
+                self.executor = self.create_executor(self.workers)
+                self.restarts += 1
+
+    def stats(self) -> dict:
+        """ This method returns the options and the counters of the pool.
+
+        Returns:
+            dict: Number of workers, maximum and current number of pages sent to the workers, pages waiting for a slot, pages parsed and restarts of the pool.
+        """
+        with self.lock:
+            return {"workers": self.workers, "max_in_flight": self.max_in_flight if self.workers else 0, "in_flight": self.in_flight,
+                    "waiting": self.waiting, "parsed": self.parsed, "restarts": self.restarts}
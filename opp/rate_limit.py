@@ -0,0 +1,355 @@
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from opp import deadline
+from typing import Optional
+from urllib.parse import urlparse
+import threading
+import time
+import anyio
+import httpx
+
+# Requests per second, burst and maximum concurrency, by domain
+HOST_POLICIES = {
+    "google.com": (0.5, 2, 2),
+    "googleapis.com": (10.0, 10, 8),
+    "nitter.net": (1.0, 3, 2),
+    "picnob.com": (1.0, 3, 2),
+    "tiktok.com": (1.0, 3, 2),
+    "linkedin.com": (0.5, 2, 2),
+    "github.com": (5.0, 10, 6)
+}
+DEFAULT_POLICY = (10.0, 20, 6)
+THROTTLE_STATUSES = (429, 503)
+# Delay when a host throttles without Retry-After, doubled at each new throttling
+INITIAL_BACKOFF = 1.0
+MAX_BACKOFF = 300.0
+# A response this many times slower than the fastest one of its host means the host is overloaded
+LATENCY_FACTOR = 3.0
+MIN_SLOW_LATENCY = 1.0
+MAX_RETRIES = 2
+POLL_INTERVAL = 0.05
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """ This function parses a Retry-After header, given as seconds or as an HTTP date.
+
+    Args:
+        value (Optional[str]): Value of the header.
+
+    Returns:
+        Optional[float]: Delay in seconds, at most `MAX_BACKOFF`, or None if the header is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(delay, 0.0), MAX_BACKOFF)
+
+
+class HostLimiter:
+    """ This class limits the requests sent to a host.
+
+    Requests are limited by a token bucket, refilled at `rate` tokens per second up to `burst` tokens, and by a concurrency limit
+    adjusted with AIMD : it grows by one request per window of successful responses, and is reduced when the host answers 429 or 503,
+    fails, or answers much slower than usual. After a 429 or 503 response, no request is sent to the host until the delay given by
+    Retry-After, or an exponential backoff, has elapsed.
+
+    Attributes:
+        host (str): Host name.
+        rate (float): Requests per second.
+        burst (int): Maximum number of tokens.
+        max_concurrency (int): Maximum number of concurrent requests.
+    """
+    def __init__(self, host: str, rate: float, burst: int, max_concurrency: int):
+        self.host = host
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.lock = threading.Lock()
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.limit = float(max(1, max_concurrency // 2))
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.backoff = INITIAL_BACKOFF
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self.latency = None
+        self.min_latency = None
+
+    def reserve(self) -> float:
+        """ This method takes a token and a concurrency slot if both are available.
+
+        Returns:
+            float: 0 if the request can be sent, otherwise the delay to wait before trying again.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            if self.in_flight >= int(self.limit):
+                return POLL_INTERVAL
+            if self.tokens < 1:
+                return (1 - self.tokens) / self.rate
+            self.tokens -= 1
+            self.in_flight += 1
+            self.requests += 1
+            return 0.0
+
+    def acquire(self) -> None:
+        """ This method waits until a request can be sent to the host.
+
+        Raises:
+            deadline.DeadlineExceeded: If the host does not accept requests before the deadline of the current run.
+        """
+        while True:
+            delay = self.reserve()
+            if delay <= 0:
+                return
+            left = deadline.remaining()
+            if left is not None and delay > left:
+                raise deadline.DeadlineExceeded("%s does not accept requests before the deadline" % self.host)
+            time.sleep(delay)
+
+    async def acquire_async(self) -> None:
+        """ This method waits until a request can be sent to the host, without blocking the event loop.
+
+        """
+        while True:
+            delay = self.reserve()
+            if delay <= 0:
+                return
+            await anyio.sleep(delay)
+
+    def release(self, latency: float, status: int = None, retry_after: float = None, error: bool = False, cancelled: bool = False) -> None:
+        """ This method gives back a concurrency slot and adjusts the limits of the host according to the response.
+
+        Args:
+            latency (float): Duration of the request in seconds.
+            status (int, optional): HTTP status of the response. Defaults to None.
+            retry_after (float, optional): Delay given by the Retry-After header. Defaults to None.
+            error (bool, optional): True if the request failed without response. Defaults to False.
+            cancelled (bool, optional): True if the request was cancelled by its caller, which says nothing about the host, so the limits are kept. Defaults to False.
+        """
+        with self.lock:
+            self.in_flight -= 1
+            if cancelled:
+                return
+            if status in THROTTLE_STATUSES:
+                self.throttled += 1
+                self.limit = max(1.0, self.limit / 2)
+                self.blocked_until = max(self.blocked_until, time.monotonic() + (retry_after if retry_after is not None else self.backoff))
+                self.backoff = min(MAX_BACKOFF, self.backoff * 2)
+                return
+            if error:
+                self.errors += 1
+                self.limit = max(1.0, self.limit * 0.75)
+                return
+            self.backoff = INITIAL_BACKOFF
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+            self.min_latency = latency if self.min_latency is None else min(self.min_latency, latency)
+            if latency > MIN_SLOW_LATENCY and latency > LATENCY_FACTOR * self.min_latency:
+                self.limit = max(1.0, self.limit * 0.9)
+            else:
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+
+    def stats(self) -> dict:
+        """ This method returns the state of the limiter.
+
+        Returns:
+            dict: JSON compatible state.
+        """
+        with self.lock:
+            return {
+                "rate": self.rate,
+                "tokens": round(min(self.burst, self.tokens + (time.monotonic() - self.updated) * self.rate), 2),
+                "limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "blocked_for": round(max(0.0, self.blocked_until - time.monotonic()), 2),
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "errors": self.errors,
+                "latency": round(self.latency, 3) if self.latency is not None else None
+            }
+
+
+class Slot:
+    """ This class is given to the caller of :meth:`RateLimiter.slot`, to report the response of its request.
+
+    Attributes:
+        status (int): HTTP status of the response, if known.
+        retry_after (float): Delay given by the Retry-After header, if any.
+    """
+    def __init__(self):
+        self.status = None
+        self.retry_after = None
+
+
+class RateLimiter:
+    """ This singleton class is the central limiter through which all outbound calls go, with one :class:`HostLimiter` per host.
+    Policies are given by domain in `HOST_POLICIES`, a host uses the policy of its domain or of the closest parent domain.
+
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls, policies: dict = None, default_policy: tuple = None):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls.create(policies if policies is not None else HOST_POLICIES, default_policy or DEFAULT_POLICY)
+        return cls._instance
+
+    @classmethod
+    def configure(cls, policies: dict = HOST_POLICIES, default_policy: tuple = DEFAULT_POLICY) -> "RateLimiter":
+        """ This method replaces the limiter by a new one with the given policies.
+
+        Returns:
+            RateLimiter: Configured limiter.
+        """
+        with cls._lock:
+            cls._instance = cls.create(policies, default_policy)
+        return cls._instance
+
+    @classmethod
+    def create(cls, policies: dict, default_policy: tuple) -> "RateLimiter":
+        instance = super().__new__(cls)
+        instance.policies = policies
+        instance.default_policy = default_policy
+        instance.hosts = {}
+        instance.lock = threading.Lock()
+        return instance
+
+    def get_policy(self, host: str) -> tuple:
+        """ This method returns the policy of a host.
+
+        Args:
+            host (str): Host name.
+
+        Returns:
+            tuple: Requests per second, burst and maximum concurrency.
+        """
+        labels = host.split(".")
+        for i in range(len(labels)):
+            domain = ".".join(labels[i:])
+            if domain in self.policies:
+                return self.policies[domain]
+        return self.default_policy
+
+    def get(self, url: str) -> HostLimiter:
+        """ This method returns the limiter of the host of an URL.
+
+        Args:
+            url (str): Requested URL.
+
+        Returns:
+            HostLimiter: Limiter of the host.
+        """
+        host = (urlparse(url).hostname or "").lower()
+        with self.lock:
+            if host not in self.hosts:
+                self.hosts[host] = HostLimiter(host, *self.get_policy(host))
+            return self.hosts[host]
+
+    @contextmanager
+    def slot(self, url: str):
+        """ This context manager waits until a request can be sent to the host of an URL, and adjusts its limits at the end of the block
+        according to the status reported in the yielded :class:`Slot`. An exception raised in the block counts as a failed request,
+        unless a status was reported before it was raised.
+
+        Args:
+            url (str): Requested URL.
+
+        Yields:
+            Slot: Slot in which the response is reported.
+        """
+        limiter = self.get(url)
+        limiter.acquire()
+        slot = Slot()
+        start = time.monotonic()
+        try:
+            yield slot
+        except BaseException:
+            limiter.release(time.monotonic() - start, status=slot.status, retry_after=slot.retry_after, error=slot.status is None)
+            raise
+        limiter.release(time.monotonic() - start, status=slot.status, retry_after=slot.retry_after)
+
+    def stats(self) -> dict:
+        """ This method returns the state of the limiters of all hosts.
+
+        Returns:
+            dict: State by host.
+        """
+        with self.lock:
+            hosts = dict(self.hosts)
+        return {host: limiter.stats() for host, limiter in sorted(hosts.items())}
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """ This transport sends requests through the :class:`RateLimiter`. A GET request answered by 429 or 503 is sent again,
+    up to `MAX_RETRIES` times, once the host accepts requests again.
+
+    Attributes:
+        transport (httpx.BaseTransport): Transport actually sending requests.
+    """
+    def __init__(self, transport: httpx.BaseTransport):
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        limiter = RateLimiter().get(str(request.url))
+        for attempt in range(MAX_RETRIES + 1):
+            limiter.acquire()
+            start = time.monotonic()
+            try:
+                response = self.transport.handle_request(request)
+            except Exception:
+                limiter.release(time.monotonic() - start, error=True)
+                raise
+            except BaseException:
+                limiter.release(time.monotonic() - start, cancelled=True)
+                raise
+            limiter.release(time.monotonic() - start, status=response.status_code, retry_after=parse_retry_after(response.headers.get("Retry-After")))
+            if response.status_code not in THROTTLE_STATUSES or request.method != "GET" or attempt == MAX_RETRIES:
+                return response
+            response.close()
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    """ This transport is the asynchronous version of :class:`RateLimitedTransport`, it works with asyncio and trio.
+
+    Attributes:
+        transport (httpx.AsyncBaseTransport): Transport actually sending requests.
+    """
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        limiter = RateLimiter().get(str(request.url))
+        for attempt in range(MAX_RETRIES + 1):
+            await limiter.acquire_async()
+            start = time.monotonic()
+            try:
+                response = await self.transport.handle_async_request(request)
+            except Exception:
+                limiter.release(time.monotonic() - start, error=True)
+                raise
+            except BaseException:
+                # Cancelled by a deadline of the caller, such as the one of an OSINT module
+                limiter.release(time.monotonic() - start, cancelled=True)
+                raise
+            limiter.release(time.monotonic() - start, status=response.status_code, retry_after=parse_retry_after(response.headers.get("Retry-After")))
+            if response.status_code not in THROTTLE_STATUSES or request.method != "GET" or attempt == MAX_RETRIES:
+                return response
+            await response.aclose()
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
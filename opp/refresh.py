@@ -0,0 +1,145 @@
+from opp import footprint
+from opp import ftype
+from opp import storage
+from opp import search
+from typing import Optional
+import time
+
+# Lifetime in seconds of stored results, by type of footprint or by kind of request ("search" or "scrap")
+DEFAULT_TTL = {
+    "search": 86400,
+    "scrap": 7 * 86400
+}
+
+def parse_ttl(value: str) -> dict:
+    """ This function parses lifetimes given as "name=seconds" pairs separated by commas, for instance "search=86400,scrap=604800,email=3600".
+
+    Args:
+        value (str): Lifetimes to parse.
+
+    Raises:
+        ValueError: If a pair is not "name=seconds".
+
+    Returns:
+        dict: Lifetimes in seconds, by type of footprint or kind of request, added to `DEFAULT_TTL`.
+    """
+    ttl = dict(DEFAULT_TTL)
+    for pair in value.split(","):
+        if pair.strip():
+            name, seconds = pair.split("=")
+            ttl[name.strip()] = int(seconds)
+    return ttl
+
+def canonical_filters(filters: list) -> list:
+    """ This function returns initial filters in a form which does not depend on their order, case and spaces, as in the queries.
+    Filters without type get the type evaluated at the start of a run.
+
+    Args:
+        filters (list): Initial filters.
+
+    Returns:
+        list: Sorted tuples (type, canonical value, positive).
+    """
+    return sorted({(f["type"] or footprint.RecursionHandler.eval_target_type(f["value"]), search.canonical_value(f["value"]), bool(f["positive"])) for f in filters})
+
+
+class PreviousFingerprint:
+    """ This class gives access to a fingerprint stored by :class:`storage.Storage`, so a new run of the same target only refreshes stale footprints.
+
+    A footprint is found in the previous run by its key, which depends on its whole path in the tree. If the results of its request are younger than
+    its lifetime, the children it had in the previous run are reused as results instead of searching or scrapping again.
+    The key does not depend on the settings of the run, so only a run with the same initial filters and search settings is reused :
+    the queries contain the initial filters, and the search settings decide which OSINT results exist.
+    The lifetime of a footprint is the one of its type if given, otherwise the one of the kind of its request.
+
+    Attributes:
+        run (dict): Previous run, as returned by :class:`storage.Storage`.
+        footprints (list): Footprints of the previous run, in pre-order.
+        ttl (dict, optional): Lifetimes in seconds. Defaults to `DEFAULT_TTL`.
+    """
+    def __init__(self, run: dict, footprints: list, ttl: dict = None):
+        self.run = run
+        self.ttl = ttl if ttl is not None else DEFAULT_TTL
+        self.by_key = {}
+        self.children = {}
+        self.values = {}
+        for fp in footprints:
+            self.by_key[fp["key"]] = fp
+            self.children.setdefault(fp["parent_id"], []).append(fp)
+            self.values.setdefault((fp["type"], fp["normalized_value"]), fp)
+
+    @classmethod
+    def load(cls, db: storage.Storage, target: str, ttl: dict = None, initial_filters: list = [], search_context: dict = None) -> Optional["PreviousFingerprint"]:
+        """ This method loads the last run of a target made with the same initial filters and search settings.
+
+        Args:
+            db (storage.Storage): Storage of the fingerprints.
+            target (str): Target of the run.
+            ttl (dict, optional): Lifetimes in seconds. Defaults to `DEFAULT_TTL`.
+            initial_filters (list, optional): Initial filters of the new run. Defaults to [].
+            search_context (dict, optional): Settings of the new run, as given by :meth:`search.SearchContext.get_settings`. Defaults to None.
+
+        Returns:
+            Optional[PreviousFingerprint]: Previous fingerprint, or None if the target was never stored with these settings.
+        """
+        filters = canonical_filters(initial_filters)
+        for run in db.get_runs(target):
+            if run["search_context"] == search_context and canonical_filters(run["initial_filters"]) == filters:
+                return cls(run, db.get_footprints(run["id"]), ttl)
+        return None
+
+    def get_ttl(self, fp: footprint.Footprint) -> Optional[int]:
+        """ This method returns the lifetime of the results of a footprint.
+
+        Args:
+            fp (footprint.Footprint): Footprint.
+
+        Returns:
+            Optional[int]: Lifetime in seconds, or None if the footprint has no request.
+        """
+        request = fp.get_request()
+        if request is None:
+            return None
+        return self.ttl.get(fp.target_type, self.ttl.get(request[0], 0))
+
+    def get_fresh_results(self, fp: footprint.Footprint, now: float = None) -> Optional[tuple]:
+        """ This method returns the results a footprint had in the previous run, if they are still fresh.
+
+        Args:
+            fp (footprint.Footprint): Footprint to investigate.
+            now (float, optional): Current timestamp. Defaults to now.
+
+        Returns:
+            Optional[tuple]: Results as :class:`ftype.Result` items and the date they were obtained, or None if the footprint must be investigated.
+        """
+        previous = self.by_key.get(fp.key)
+        # Footprints which were not investigated have no fetch date
+        if previous is None or previous["fetched_at"] is None:
+            return None
+        ttl = self.get_ttl(fp)
+        if ttl is None or (now or time.time()) - previous["fetched_at"] > ttl:
+            return None
+        results = [ftype.Result(child["type"], child["value"], child["method"]) for child in self.children.get(previous["id"], [])]
+        return results, previous["fetched_at"]
+
+    def diff(self, fp: footprint.Footprint) -> dict:
+        """ This method compares a new fingerprint with the previous one. Footprints are compared by type and normalized value,
+        so a value found again through another path is not a change.
+
+        Args:
+            fp (footprint.Footprint): Root of the new fingerprint.
+
+        Returns:
+            dict: ID of the previous run, added and removed footprints.
+        """
+        current = {}
+        stack = [fp]
+        while stack:
+            current_fp = stack.pop()
+            current.setdefault((current_fp.target_type, storage.normalize_value(current_fp.target)), current_fp)
+            stack.extend(reversed(current_fp.children_footprints))
+        return {
+            "previous_run": self.run["id"],
+            "added": [{"type": new_fp.target_type, "value": new_fp.target, "method": new_fp.method} for value, new_fp in current.items() if value not in self.values],
+            "removed": [{"type": old_fp["type"], "value": old_fp["value"], "method": old_fp["method"]} for value, old_fp in self.values.items() if value not in current]
+        }
@@ -1,9 +1,15 @@
 from opp import fingerprint_handler
 from opp import search
 from opp import ftype
-from flask import Flask, request
+from opp import jobs
+from opp import rate_limit
+from opp import crawler
+from opp import parse_pool
+from flask import Flask, Response, request, stream_with_context
 from flask_cors import CORS
-from marshmallow import Schema, fields, validate
+from marshmallow import Schema, ValidationError, fields, validate
+from functools import partial
+import json
 
 class FilterSchema(Schema):
     value = fields.String(required=True, validate=validate.Length(min=1, max=1000))
@@ -21,52 +27,178 @@ class OPPSearchSchema(Schema):
     depth = fields.Integer(required=False, validate=validate.Range(min=1, max=10))
     active_search = fields.Integer(required=False, validate=validate.OneOf([0, 1]))
     initial_filters = fields.String(required=False)
+    osint_allow = fields.String(required=False, validate=validate.Regexp(r"^[a-z0-9_,]{1,2000}$"))
+    osint_deny = fields.String(required=False, validate=validate.Regexp(r"^[a-z0-9_,]{1,2000}$"))
+    strategy = fields.String(required=False, validate=validate.OneOf(list(crawler.STRATEGIES)))
+    max_requests = fields.Integer(required=False, validate=validate.Range(min=1, max=10000))
+    max_fanout = fields.Integer(required=False, validate=validate.Range(min=1, max=10000))
+    max_time = fields.Float(required=False, validate=validate.Range(min=1, max=3600))
+    timeout = fields.Float(required=False, validate=validate.Range(min=1, max=3600))
+
+def validate_callback_url(url: str) -> None:
+    """ This function checks that the callback URL of a job can be posted to, see `jobs.is_public_url()`.
+
+    Args:
+        url (str): Callback URL given by the client.
+
+    Raises:
+        ValidationError: If the URL is not a public HTTP(S) URL.
+    """
+    if not jobs.is_public_url(url):
+        raise ValidationError("Not a public HTTP(S) URL.")
+
+class OPPJobSchema(OPPSearchSchema):
+    callback_url = fields.URL(required=False, schemes=set(jobs.CALLBACK_SCHEMES), validate=validate_callback_url)
+
+class OPPStreamSchema(OPPSearchSchema):
+    format = fields.String(required=False, validate=validate.OneOf(["ndjson", "sse"]))
 
 opp_search_schema = OPPSearchSchema()
+opp_job_schema = OPPJobSchema()
+opp_stream_schema = OPPStreamSchema()
 filter_list_schema = FilterListSchema()
 
 app = Flask(__name__)
 cors = CORS(app)
 
-@app.route('/api/', methods=['POST', 'GET'])
-def opp_api():
+def get_search_params(schema: Schema):
+    """ This function validates the arguments of the current request and returns the parameters of the search.
+
+    Args:
+        schema (Schema): Schema of the arguments.
+
+    Returns:
+        tuple: Parameters of the search and None, or None and the errors response.
+    """
     # Validation of request arguments
     args = request.args.to_dict()
-    errors = opp_search_schema.validate(args)
+    errors = schema.validate(args)
     if errors:
-        return {'errors': errors}, 400
-
-    # Getting arguments if no error
-    target = request.args.get('target', None)
-    api_key = request.args.get('api_key', None)
-    cse_id = request.args.get('cse_id', None)
-    depth = int(request.args.get('depth', 3))
-    active_search = True if int(request.args.get('active_search', 0)) else False
+        return None, ({'errors': errors}, 400)
 
     # Evaluation and validation of initial filters
     try:
         initial_filters = list(eval(request.args.get('initial_filters', '[]')))
     except SyntaxError:
-        return {'errors': {"initial_filters":["SyntaxError"]}}, 400
+        return None, ({'errors': {"initial_filters":["SyntaxError"]}}, 400)
     except NameError:
-        return {'errors': {"initial_filters":["NameError"]}}, 400
+        return None, ({'errors': {"initial_filters":["NameError"]}}, 400)
 
     errors_filters = filter_list_schema.validate({"filters": initial_filters})
     if errors_filters:
-        return {'errors': errors_filters}, 400
+        return None, ({'errors': errors_filters}, 400)
 
-    # Request is valid : process it
-    search.SearchOptions()
-    search.SearchOptions().set_api_key(api_key=api_key)
-    search.SearchOptions().set_cse_id(cse_id=cse_id)
-    search.SearchOptions().set_active_search(active_search=active_search)
-    research_instance = fingerprint_handler.FingerprintHandler(target=target, search_depth=depth, initial_filters = initial_filters)
+    # Getting arguments if no error
+    return {
+        "target": request.args.get('target', None),
+        "api_key": request.args.get('api_key', None),
+        "cse_id": request.args.get('cse_id', None),
+        "depth": int(request.args.get('depth', 3)),
+        "active_search": True if int(request.args.get('active_search', 0)) else False,
+        "osint_allow": [name for name in request.args.get('osint_allow', '').split(",") if name],
+        "osint_deny": [name for name in request.args.get('osint_deny', '').split(",") if name],
+        "initial_filters": initial_filters,
+        "strategy": request.args.get('strategy', None),
+        "max_requests": int(request.args['max_requests']) if 'max_requests' in request.args else None,
+        "max_fanout": int(request.args['max_fanout']) if 'max_fanout' in request.args else None,
+        "max_time": float(request.args['max_time']) if 'max_time' in request.args else None,
+        "timeout": float(request.args['timeout']) if 'timeout' in request.args else None
+    }, None
+
+def get_research_instance(params: dict) -> fingerprint_handler.FingerprintHandler:
+    """ This function returns the fingerprint handler of a search, with its own search options.
+
+    Args:
+        params (dict): Parameters of the search, as returned by `get_search_params()`.
+
+    Returns:
+        fingerprint_handler.FingerprintHandler: Handler of the fingerprint, not built yet.
+    """
+    context = search.SearchContext(api_key=params["api_key"], cse_id=params["cse_id"], active_search=params["active_search"], osint_allow=params["osint_allow"], osint_deny=params["osint_deny"])
+    budget = crawler.Budget(max_requests=params["max_requests"], max_fanout=params["max_fanout"], max_time=params["max_time"])
+    return fingerprint_handler.FingerprintHandler(target=params["target"], search_depth=params["depth"], initial_filters = params["initial_filters"], context=context,
+                                                  strategy=params["strategy"], budget=budget, timeout=params["timeout"])
+
+def run_search(params: dict, job: jobs.Job = None) -> dict:
+    """ This function builds the fingerprint of a target and returns it as nodes and edges.
+
+    Args:
+        params (dict): Parameters of the search, as returned by `get_search_params()`.
+        job (jobs.Job, optional): Job running the search, its progress is the one of the fingerprint. Defaults to None.
+
+    Returns:
+        dict: Nodes and edges of the fingerprint.
+    """
+    research_instance = get_research_instance(params)
+    if job is not None:
+        job.progress = research_instance.progress
     fingerprint = research_instance.get_fingerprint()
     return research_instance.get_json_nodes_edges(fingerprint)
 
+@app.route('/api/', methods=['POST', 'GET'])
+def opp_api():
+    params, error_response = get_search_params(opp_search_schema)
+    if error_response:
+        return error_response
+
+    # Request is valid : process it
+    return run_search(params)
+
+@app.route('/api/stream', methods=['POST', 'GET'])
+def opp_api_stream():
+    params, error_response = get_search_params(opp_stream_schema)
+    if error_response:
+        return error_response
+
+    # Request is valid : stream its nodes and edges, as NDJSON or as Server-Sent Events
+    sse = request.args.get('format', 'sse' if request.accept_mimetypes.best == 'text/event-stream' else 'ndjson') == 'sse'
+    research_instance = get_research_instance(params)
+    def generate():
+        for event, data in research_instance.get_json_events():
+            if sse:
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+            else:
+                yield json.dumps({"event": event, "data": data}) + "\n"
+    return Response(stream_with_context(generate()), mimetype='text/event-stream' if sse else 'application/x-ndjson', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/jobs', methods=['POST'])
+def opp_api_jobs():
+    params, error_response = get_search_params(opp_job_schema)
+    if error_response:
+        return error_response
+
+    # Request is valid : queue it
+    try:
+        job = jobs.JobManager().submit(partial(run_search, params), callback_url=request.args.get('callback_url', None))
+    except jobs.QueueFullError as error:
+        return {'errors': {"job": [str(error)]}}, 503, {'Retry-After': '30'}
+    return jobs.JobManager().get_status(job), 202, {'Location': f"/api/jobs/{job.id}"}
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def opp_api_job_status(job_id):
+    job = jobs.JobManager().get(job_id)
+    if job is None:
+        return {'errors': {"job": ["Unknown or expired job"]}}, 404
+    return jobs.JobManager().get_status(job)
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def opp_api_job_result(job_id):
+    job = jobs.JobManager().get(job_id)
+    if job is None:
+        return {'errors': {"job": ["Unknown or expired job"]}}, 404
+    if job.status == "failed":
+        return {'errors': {"job": [job.error]}}, 500
+    if job.status != "done":
+        return jobs.JobManager().get_status(job), 409
+    return job.result
+
 @app.route('/api/status', methods=['GET'])
 def opp_api_status():
     return "OK", 200
 
+@app.route('/api/stats', methods=['GET'])
+def opp_api_stats():
+    return {"search": search.QueryCoalescer().stats(), "hosts": rate_limit.RateLimiter().stats(), "parse": parse_pool.ParsePool().stats()}
+
 if __name__ == '__main__':
     app.run()
@@ -1,464 +1,342 @@
-from abc import ABC, abstractmethod
+from opp import ftype
+from opp import cache
+from opp import browser_pool
+from opp import rate_limit
+from opp import deadline
+from opp import extract
+from opp import parse_pool
+from opp.extract import Field
+from abc import ABC
+from importlib.metadata import entry_points
 from urllib.parse import urlparse
-import requests
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
 import chromedriver_binary
 from selenium.webdriver.common.by import By
-from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+import threading
 
+# Third-party scrappers are declared as entry points named after the host pattern they handle, e.g. "*.example.com = package.module:ExampleScrapper"
+ENTRY_POINT_GROUP = "opp.scrappers"
 
-USER_AGENT = "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:109.0) Gecko/20100101 Firefox/110.0"
 
 class Scrap():
-    """ This class instanciates a specific abstract scrapper according to the given URL.
+    """ This class instanciates a specific abstract scrapper according to the given URL, as found by :class:`ScrapperRegistry`.
 
     Attributes:
         scrapper (AbstractScrapper): Scrapper that will be used to obtain footprints from URL.
     """
-    def __init__(self, url: str = None):
-        if isurl_twitter(url):
-            self.scrapper = TwitterScrapper(url)
-        elif isurl_tiktok(url):
-            self.scrapper = TiktokScrapper(url)
-        elif isurl_github(url):
-            self.scrapper = GithubScrapper(url)
-        elif isurl_linkedin(url):
-            self.scrapper = LinkedinScrapper(url)
-        elif isurl_instagram(url):
-            self.scrapper = InstagramScrapper(url)
-        else:
-            self.scrapper = GenericScrapper(url)
+    def __init__(self, url: str = None, content: bytes = None):
+        self.scrapper = ScrapperRegistry().get(url)(url, content)
             
 
 class AbstractScrapper(ABC):
     """ This class is responsible of defining the common behavior for the scrappers.
 
+    Scrapping is done in two stages, each one run at most once : `fetch()` downloads the page, then `parse()` extracts footprints from it without any network access.
+    If the content of the page is given, only `parse()` is run, so pages can be fetched in batch, cached or saved to test the scrappers offline.
+
+    The hosts handled by a scrapper are given by `HOSTS` : exact host names, or patterns "*.domain" matching all subdomains of a domain.
+    The footprints of a page are described by `EXTRACTOR`, a declarative :class:`extract.Extractor` compiled once per scrapper,
+    and are extracted by the workers of :class:`parse_pool.ParsePool` if it has any.
+
     Attributes:
         url (str): URL to scrap
+        content (bytes, optional): Content of the page, fetched if not given. Defaults to None.
         result (list): Found footprints.
     """
-    def __init__(self, url: str):
+    HOSTS = ()
+    EXTRACTOR = None
+
+    def __init__(self, url: str, content: bytes = None):
         self.url = url
-        self.result = self.scrap_data(url)
+        if content is None:
+            content = self.fetch(url)
+        # An empty page, e.g. an authwall or a page which is not a profile, has nothing to parse
+        self.result = self.parse(content) if content else []
+
+    def fetch(self, url: str) -> bytes:
+        """ This method downloads the page to scrap.
+
+        Args:
+            url (str): URL to scrap.
 
-    @abstractmethod
-    def scrap_data(self, url) -> list:
-        return []
+        Returns:
+            bytes: Content of the page.
+        """
+        return cache.ResponseCache().fetch(url)
+
+    def parse(self, content: bytes) -> list:
+        """ This method extracts footprints from the content of a page with the `EXTRACTOR` of the scrapper.
+
+        Args:
+            content (bytes): Content of the page.
+
+        Returns:
+            list: Found :class:`ftype.Result` footprints.
+        """
+        if self.EXTRACTOR is None:
+            return []
+        pool = parse_pool.ParsePool()
+        if pool.workers:
+            return [ftype.Result(**record) for record in pool.extract(type(self), content)]
+        return self.EXTRACTOR.extract(content, self.METHOD_NAME)
 
 class TwitterScrapper(AbstractScrapper):
     """
     Class responsible of scrapping twitter
     """
     METHOD_NAME = "twitter_scrapper"
-
-    def __init__(self, url: str):
-        super().__init__(url)
-        self.result = self.scrap_data(url)
-
-    def scrap_data(self, url) -> list:
+    HOSTS = ("twitter.com", "mobile.twitter.com")
+
+    EXTRACTOR = extract.Extractor([
+        Field("name", "a.profile-card-fullname"),
+        Field("username", "a.profile-card-username"),
+        Field("description", "div.profile-bio"),
+        Field("location", "a.profile-location"),
+        Field("url", "a.profile-website"),
+        Field("birthdate", "a.profile-birthdate"),
+        Field("image", "a.profile-card-avatar")
+    ])
+
+    def fetch(self, url: str) -> bytes:
         """
-        Retrieve data from twitter
+        Retrieve the profile from nitter
         """
-        result = []
-
-        # Send a GET request to the URL
-        response = requests.get(url.replace("mobile.", "").replace("twitter.com", "nitter.net"))
-
-        # Parse the HTML content using BeautifulSoup
-        soup = BeautifulSoup(response.content, "html.parser")
-
-        # Find the user's name
-        if soup.find("a", {"class": "profile-card-fullname"}):
-            result.append(
-                {
-                    "type" : "name",
-                    "value" : soup.find("a", {"class": "profile-card-fullname"}).text.strip(),
-                    "method" : self.METHOD_NAME
-                }
-            )
-
-        # Find the user's username
-        if soup.find("a", {"class": "profile-card-username"}):
-            result.append(
-                {
-                    "type" : "username",
-                    "value" : soup.find("a", {"class": "profile-card-username"}).text.strip(),
-                    "method" : self.METHOD_NAME
-                }
-            )
-
-        # Find the user's bio
-        if soup.find("div", {"class": "profile-bio"}):
-            result.append(
-                {
-                    "type" : "description",
-                    "value" : soup.find("div", {"class": "profile-bio"}).text.strip(),
-                    "method" : self.METHOD_NAME
-                }
-            )
-
-        # Find the user's location
-        if soup.find("a", {"class": "profile-location"}):
-            result.append(
-                {
-                    "type" : "location",
-                    "value" : soup.find("a", {"class": "profile-location"}).text.strip(),
-                    "method" : self.METHOD_NAME
-                }
-            )
-
-        # Find the user's website
-        if soup.find("a", {"class": "profile-website"}):
-            result.append(
-                {
-                    "type" : "url",
-                    "value" : soup.find("a", {"class": "profile-website"}).text.strip(),
-                    "method" : self.METHOD_NAME
-                }
-            )
-
-
-        # Find the user's birthdate
-        if soup.find("a", {"class": "profile-birthdate"}):
-            result.append(
-                {
-                    "type" : "birthdate",
-                    "value" : soup.find("a", {"class": "profile-birthdate"}).text.strip(),
-                    "method" : self.METHOD_NAME
-                }
-            )
-
-        # Find the user's profile pic URL
-        if soup.find("a", {"class": "profile-card-avatar"}):
-            result.append(
-                {
-                    "type" : "image",
-                    "value" : soup.find("a", {"class": "profile-card-avatar"}).text.strip(),
-                    "method" : self.METHOD_NAME
-                }
-            )
-        
-        return result
+        return cache.ResponseCache().fetch(url.replace("mobile.", "").replace("twitter.com", "nitter.net"))
 
 class TiktokScrapper(AbstractScrapper):
 
     METHOD_NAME = "tiktok_scrapper"
+    HOSTS = ("tiktok.com", "www.tiktok.com")
 
-    def __init__(self, url: str):
-        super().__init__(url)
-        if urlparse(url).path.startswith("/@"): # if it is a tiktok profile page
-            self.result = self.scrap_data(url)
-        else:
-            self.result = []
-
-    def scrap_data(self, url) -> list:
-        result = []
-
-        # Send a GET request to the URL
-        headers = {"User-Agent": USER_AGENT}
-        response = requests.get(url, headers=headers)
-
-        # Parse the HTML content using BeautifulSoup
-        soup = BeautifulSoup(response.content, "html.parser")
-
-        # Find the user's name
-        if soup.find("h1", {"data-e2e": "user-subtitle"}):
-            result.append(
-                {
-                    "type" : "name",
-                    "value" : soup.find("h1", {"data-e2e": "user-subtitle"}).text.strip(),
-                    "method" : self.METHOD_NAME
-                }
-            )
-
-        # Find the user's username
-        if soup.find("h2", {"data-e2e": "user-title"}):
-            result.append(
-                {
-                    "type" : "username",
-                    "value" : soup.find("h2", {"data-e2e": "user-title"}).text.strip(),
-                    "method" : self.METHOD_NAME
-                }
-            )
-
-        # Find the user's bio
-        if soup.find("h2", {"data-e2e": "user-bio"}):
-            result.append(
-                {
-                    "type" : "description",
-                    "value" : soup.find("h2", {"data-e2e": "user-bio"}).text.strip(),
-                    "method" : self.METHOD_NAME
-                }
-            )
-
-        # Find the user's website
-        if soup.find("a", {"data-e2e": "user-link"}):
-            result.append(
-                {
-                    "type" : "url",
-                    "value" : soup.find("a", {"data-e2e": "user-link"}).text.strip(),
-                    "method" : self.METHOD_NAME
-                }
-            )
-
-        # Find the user's profile pic URL
-        if soup.find("div", {"data-e2e": "user-avatar"}):
-            result.append(
-                {
-                    "type" : "image",
-                    "value" : soup.find("div", {"data-e2e": "user-avatar"}).span.img["src"],
-                    "method" : self.METHOD_NAME
-                }
-            )
-        
-        return result
+    EXTRACTOR = extract.Extractor([
+        Field("name", 'h1[data-e2e="user-subtitle"]'),
+        Field("username", 'h2[data-e2e="user-title"]'),
+        Field("description", 'h2[data-e2e="user-bio"]'),
+        Field("url", 'a[data-e2e="user-link"]'),
+        Field("image", 'div[data-e2e="user-avatar"] span img', attribute="src")
+    ])
+
+    def fetch(self, url: str) -> bytes:
+        """
+        Retrieve the page only if it is a tiktok profile page
+        """
+        if urlparse(url).path.startswith("/@"):
+            return super().fetch(url)
+        return b""
 
 class GithubScrapper(AbstractScrapper):
 
     METHOD_NAME = "github_scrapper"
-
-    def __init__(self, url: str):
-        super().__init__(url)
-        self.result = self.scrap_data(url)
-
-    def scrap_data(self, url) -> list:
-        result = []
-
-        # Send a GET request to the URL
-        headers = {"User-Agent": USER_AGENT}
-        response = requests.get(url, headers=headers)
-
-        # Parse the HTML content using BeautifulSoup
-        soup = BeautifulSoup(response.content, "html.parser")
-
-        # Find the user's name
-        if soup.find("span", {"class": "vcard-fullname"}):
-            result.append(
-                {
-                    "type" : "name",
-                    "value" : soup.find("span", {"class": "vcard-fullname"}).text.strip(),
-                    "method" : self.METHOD_NAME
-                }
-            )
-
-        # Find the user's username
-        if soup.find("span", {"class": "vcard-username"}):
-            result.append(
-                {
-                    "type" : "username",
-                    "value" : soup.find("span", {"class": "vcard-username"}).text.strip(),
-                    "method" : self.METHOD_NAME
-                }
-            )
-
-        # Find the user's bio
-        if soup.find("div", {"class": "user-profile-bio"}):
-            result.append(
-                {
-                    "type" : "description",
-                    "value" : soup.find("div", {"class": "user-profile-bio"})["data-bio-text"],
-                    "method" : self.METHOD_NAME
-                }
-            )
-
-        # Find the user's location
-        if soup.find("li", {"class": "vcard-detail", "itemprop": "homeLocation"}):
-            result.append(
-                {
-                    "type" : "location",
-                    "value" : soup.find("li", {"class": "vcard-detail", "itemprop": "homeLocation"}).text.strip(),
-                    "method" : self.METHOD_NAME
-                }
-            )
-
-        # Find the user's website
-        if soup.find("li", {"class": "vcard-detail", "itemprop": "url"}):
-            result.append(
-                {
-                    "type" : "url",
-                    "value" : soup.find("li", {"class": "vcard-detail", "itemprop": "url"}).text.strip(),
-                    "method" : self.METHOD_NAME
-                }
-            )
-
-        # Find the user's profile pic URL
-        if soup.find("img", {"class": "avatar-user"}):
-            result.append(
-                {
-                    "type" : "image",
-                    "value" : soup.find("img", {"class": "avatar-user"})["src"].split("?")[0],
-                    "method" : self.METHOD_NAME
-                }
-            )
-
-        # Find the user's social medias
-        for s in (soup.find_all("li", {"class": "vcard-detail", "itemprop": "social"})) if soup.find_all("li", {"class": "vcard-detail", "itemprop": "url"}) else "":
-            result.append(
-                {
-                    "type" : "url",
-                    "value" : s.a["href"],
-                    "method" : self.METHOD_NAME
-                }
-            )
-
-        return result
+    HOSTS = ("github.com", "gist.github.com")
+
+    EXTRACTOR = extract.Extractor([
+        Field("name", "span.vcard-fullname"),
+        Field("username", "span.vcard-username"),
+        Field("description", "div.user-profile-bio", attribute="data-bio-text"),
+        Field("location", 'li.vcard-detail[itemprop="homeLocation"]'),
+        Field("url", 'li.vcard-detail[itemprop="url"]', name="website"),
+        Field("image", "img.avatar-user", attribute="src", transform=extract.strip_query),
+        # Social medias are only read when a website is displayed
+        Field("url", 'li.vcard-detail[itemprop="social"] a', attribute="href", all=True, requires="website", first_per_ancestor=True)
+    ])
 
 class LinkedinScrapper(AbstractScrapper):
 
     METHOD_NAME = "linkedin_scrapper"
+    # Main site and country sites
+    HOSTS = ("www.linkedin.com",) + tuple(code + ".linkedin.com" for code in (
+        "ad ar au bb bd bm bt ca cc cg ci cn co cp cv de dm es ew fr ge gm gs gu gw hr id im in io iq is it ja jp la lb mc md me ml mm ms mx my "
+        "nl nt oa pg pi pm pr pt qa ra rs ru sa sc sm ss st sv tv tw uk us vc ws").split())
+    WAIT_TIMEOUT = 10
+    PAGE_LOAD_TIMEOUT = 30
+
+    EXTRACTOR = extract.Extractor([
+        # If no name, the authwall was displayed
+        Field("name", ".top-card-layout__title", required=True),
+        Field("occupation", ".top-card-layout__headline"),
+        Field("company", ".top-card__position-info"),
+        Field("description", ".summary p")
+    ])
+
+    def fetch(self, url: str) -> bytes:
+        """
+        Render the profile with a browser of the pool, the page is empty if the authwall is displayed or if the page is too slow.
+        The page load and the wait are bounded by the deadline of the current run, after which DeadlineExceeded is raised.
+        """
+        with browser_pool.BrowserPool().browser() as driver:
+            try:
+                driver.set_page_load_timeout(deadline.clip(self.PAGE_LOAD_TIMEOUT))
+                # The browser does not use the HTTP client, so the page load is rate limited here
+                with rate_limit.RateLimiter().slot(url):
+                    #To be sure we have access to the linkedIn link, we are adding a referer header
+                    driver.get(url+"?original_referer=https%3A%2F%2Fwww.google.com%2F")
+                # Wait for the profile or the authwall, whichever comes first
+                WebDriverWait(driver, deadline.clip(self.WAIT_TIMEOUT)).until(EC.any_of(
+                    EC.presence_of_element_located((By.CLASS_NAME, "top-card-layout__title")),
+                    EC.url_contains("authwall")
+                ))
+            except TimeoutException:
+                if deadline.is_exceeded():
+                    raise deadline.DeadlineExceeded("the page was not loaded before the deadline")
+                return b""
+            if not driver.find_elements(By.CLASS_NAME, "top-card-layout__title"):
+                # If no name, the authwall was displayed
+                return b""
+            return driver.page_source.encode()
 
-    def __init__(self, url: str):
-        super().__init__(url)
-        self.result = self.scrap_data(url)
+class InstagramScrapper(AbstractScrapper):
 
-    def scrap_data(self, url) -> list:
-        result = []
+    METHOD_NAME = "instagram_scrapper"
+    HOSTS = ("instagram.com", "www.instagram.com")
 
-        options = Options()
-        options.add_argument("--headless")
+    EXTRACTOR = extract.Extractor([
+        Field("name", "h1.fullname"),
+        Field("username", "div.username"),
+        Field("description", "div.sum")
+    ])
 
-        driver = webdriver.Chrome(options=options)
+    def fetch(self, url: str) -> bytes:
+        """
+        Retrieve the profile from picnob
+        """
+        return super().fetch(url.replace("instagram.com","picnob.com/profile"))
 
-        driver.delete_all_cookies()
-        #To be sure we have access to the linkedIn link, we are adding a referer header
-        driver.get(url+"?original_referer=https%3A%2F%2Fwww.google.com%2F")
-        driver.implicitly_wait(10)
+class GenericScrapper(AbstractScrapper):
 
-        try:
-            result.append(
-                {
-                    "type" : "name",
-                    "value" : driver.find_element(By.CLASS_NAME, "top-card-layout__title").text,
-                    "method" : self.METHOD_NAME
-                }
-            )
-        except NoSuchElementException:
-            # If no name, the authwall was displayed -> quit
-            driver.quit()
-            return []
+    METHOD_NAME = "generic_scrapper"
 
-        try:
-            result.append(
-                {
-                    "type" : "occupation",
-                    "value" : driver.find_element(By.CLASS_NAME, "top-card-layout__headline").text,
-                    "method" : self.METHOD_NAME
-                }
-            )
-        except NoSuchElementException:
-            pass
+    def fetch(self, url: str) -> bytes:
+        return b""
 
-        try:
-            result.append(
-                {
-                    "type" : "company",
-                    "value" : driver.find_element(By.CLASS_NAME, "top-card__position-info").text,
-                    "method" : self.METHOD_NAME
-                }
-            )
-        except NoSuchElementException:
-            pass
+class ScrapperRegistry:
+    """ This singleton class finds the scrapper of an URL from the host patterns declared by the scrappers.
 
-        try:
-            result.append(
-                {
-                    "type" : "description",
-                    "value" : driver.find_element(By.CLASS_NAME, "summary").find_element(By.TAG_NAME, "p").text,
-                    "method" : self.METHOD_NAME
-                }
-            )
-        except NoSuchElementException:
-            pass
-
-        driver.quit()
-        return result
-    
-class InstagramScrapper(AbstractScrapper):
+    Exact host names are found with a single dictionary lookup, and patterns "*.domain" by looking up the parent domains of the host,
+    so the URL is parsed once whatever the number of scrappers. Built-in scrappers take precedence over third-party ones,
+    which are declared in the `ENTRY_POINT_GROUP` entry point group, one entry point per host pattern. A third-party scrapper is only imported
+    the first time an URL matches one of its patterns.
 
-    METHOD_NAME = "instagram_scrapper"
+    """
+    _instance = None
+    _lock = threading.Lock()
 
-    def __init__(self, url: str):
-        super().__init__(url)
-        self.result = self.scrap_data(url)
-
-    def scrap_data(self, url) -> list:
-        result = []
-
-        # Send a GET request to the URL
-        headers = {"User-Agent": USER_AGENT}
-        response = requests.get(url.replace("instagram.com","picnob.com/profile"), headers=headers)
-
-        # Parse the HTML content using BeautifulSoup
-        soup = BeautifulSoup(response.content, "html.parser")
-
-        # Find the user's name
-        if soup.find("h1", {"class": "fullname"}):
-            result.append(
-                {
-                    "type" : "name",
-                    "value" : soup.find("h1", {"class": "fullname"}).text.strip(),
-                    "method" : self.METHOD_NAME
-                }
-            )
-
-        # Find the user's username
-        if soup.find("div", {"class": "username"}):
-            result.append(
-                {
-                    "type" : "username",
-                    "value" : soup.find("div", {"class": "username"}).text.strip(),
-                    "method" : self.METHOD_NAME
-                }
-            )
-
-        # Find the user's bio
-        if soup.find("div", {"class": "sum"}):
-            result.append(
-                {
-                    "type" : "description",
-                    "value" : soup.find("div", {"class": "sum"}).text.strip(),
-                    "method" : self.METHOD_NAME
-                }
-            )
-            
-        return result
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = cls.create()
+        return cls._instance
 
-class GenericScrapper(AbstractScrapper):
+    @classmethod
+    def configure(cls) -> "ScrapperRegistry":
+        """ This method replaces the registry by a new one, so entry points installed meanwhile are found.
 
-    METHOD_NAME = "generic_scrapper"
+        Returns:
+            ScrapperRegistry: Configured registry.
+        """
+        with cls._lock:
+            cls._instance = cls.create()
+        return cls._instance
 
-    def __init__(self, url: str):
-        super().__init__(url)
-        self.result = self.scrap_data(url)
+    @classmethod
+    def create(cls) -> "ScrapperRegistry":
+        """ This method creates a registry with the built-in scrappers and the declared entry points.
 
-    def scrap_data(self, url) -> list:
-        return []
+        Returns:
+            ScrapperRegistry: Created registry.
+        """
+        instance = super().__new__(cls)
+        instance.hosts = {}
+        instance.domains = {}
+        instance.lock = threading.Lock()
+        for scrapper in (TwitterScrapper, TiktokScrapper, GithubScrapper, LinkedinScrapper, InstagramScrapper):
+            instance.register(scrapper)
+        for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+            instance.add_pattern(entry_point.name, entry_point)
+        return instance
+
+    def register(self, scrapper: type, hosts: tuple = None) -> None:
+        """ This method registers a scrapper for the given host patterns, hosts already registered keep their scrapper.
+
+        Args:
+            scrapper (type): Subclass of :class:`AbstractScrapper`.
+            hosts (tuple, optional): Host patterns. Defaults to the `HOSTS` of the scrapper.
+        """
+        for pattern in (hosts if hosts is not None else scrapper.HOSTS):
+            self.add_pattern(pattern, scrapper)
 
-def isurl_social(string: str, matching_urls: list[str]) -> bool:
-    try:
-        result = urlparse(string)
-        if result.netloc in matching_urls:
-            return True
+    def add_pattern(self, pattern: str, scrapper) -> None:
+        pattern = pattern.strip().lower()
+        if pattern.startswith("*."):
+            self.domains.setdefault(pattern[2:], scrapper)
         else:
-            return False
-    except ValueError:
-        return False
+            self.hosts.setdefault(pattern, scrapper)
 
+    def match(self, url: str):
+        """ This method returns what is registered for the host of an URL, without importing third-party scrappers.
+
+        Args:
+            url (str): URL to scrap.
+
+        Returns:
+            Scrapper class, entry point of a third-party scrapper not imported yet, or None if no scrapper handles the URL.
+        """
+        try:
+            host = (urlparse(url).hostname or "")
+        except ValueError:
+            return None
+        scrapper = self.hosts.get(host)
+        if scrapper is not None:
+            return scrapper
+        labels = host.split(".")
+        for i in range(1, len(labels)):
+            scrapper = self.domains.get(".".join(labels[i:]))
+            if scrapper is not None:
+                return scrapper
+        return None
+
+    def get(self, url: str) -> type:
+        """ This method returns the scrapper of an URL, importing it if it is a third-party scrapper used for the first time.
+
+        Args:
+            url (str): URL to scrap.
+
+        Returns:
+            type: Subclass of :class:`AbstractScrapper`, :class:`GenericScrapper` if no scrapper handles the URL.
+        """
+        scrapper = self.match(url)
+        if scrapper is None:
+            return GenericScrapper
+        if isinstance(scrapper, type):
+            return scrapper
+        with self.lock:
+            # Another thread may have imported it meanwhile
+            scrapper = self.match(url)
+            if isinstance(scrapper, type):
+                return scrapper
+            loaded = scrapper.load()
+            # All patterns of the entry point now give the imported class
+            for table in (self.hosts, self.domains):
+                for pattern, value in table.items():
+                    if not isinstance(value, type) and value.value == scrapper.value:
+                        table[pattern] = loaded
+        return loaded
+
+def isurl_profile(string):
+    return ScrapperRegistry().match(string) is not None
 
 def isurl_twitter(string):
-    return isurl_social(string, ["twitter.com", "mobile.twitter.com"])
+    return ScrapperRegistry().match(string) is TwitterScrapper
 
 def isurl_instagram(string):
-    return isurl_social(string, ["instagram.com", "www.instagram.com"])
+    return ScrapperRegistry().match(string) is InstagramScrapper
 
 def isurl_tiktok(string):
-    return isurl_social(string, ["tiktok.com", "www.tiktok.com"])
+    return ScrapperRegistry().match(string) is TiktokScrapper
 
 def isurl_github(string):
-    return isurl_social(string, ["github.com", "gist.github.com"])
+    return ScrapperRegistry().match(string) is GithubScrapper
 
 def isurl_linkedin(string):
-    return isurl_social(string, ["www.linkedin.com", "ad.linkedin.com", "ar.linkedin.com", "au.linkedin.com", "bb.linkedin.com", "bd.linkedin.com", "bm.linkedin.com", "bt.linkedin.com", "ca.linkedin.com", "cc.linkedin.com", "cg.linkedin.com", "ci.linkedin.com", "cn.linkedin.com", "co.linkedin.com", "cp.linkedin.com", "cv.linkedin.com", "de.linkedin.com", "dm.linkedin.com", "es.linkedin.com", "ew.linkedin.com", "fr.linkedin.com", "ge.linkedin.com", "gm.linkedin.com", "gs.linkedin.com", "gu.linkedin.com", "gw.linkedin.com", "hr.linkedin.com", "id.linkedin.com", "im.linkedin.com", "in.linkedin.com", "io.linkedin.com", "iq.linkedin.com", "is.linkedin.com", "it.linkedin.com", "ja.linkedin.com", "jp.linkedin.com", "la.linkedin.com", "lb.linkedin.com", "mc.linkedin.com", "md.linkedin.com", "me.linkedin.com", "ml.linkedin.com", "mm.linkedin.com", "ms.linkedin.com", "mx.linkedin.com", "my.linkedin.com", "nl.linkedin.com", "nt.linkedin.com", "oa.linkedin.com", "pg.linkedin.com", "pi.linkedin.com", "pm.linkedin.com", "pr.linkedin.com", "pt.linkedin.com", "qa.linkedin.com", "ra.linkedin.com", "rs.linkedin.com", "ru.linkedin.com", "sa.linkedin.com", "sc.linkedin.com", "sm.linkedin.com", "ss.linkedin.com", "st.linkedin.com", "sv.linkedin.com", "tv.linkedin.com", "tw.linkedin.com", "uk.linkedin.com", "us.linkedin.com", "vc.linkedin.com", "ws.linkedin.com"])
+    return ScrapperRegistry().match(string) is LinkedinScrapper
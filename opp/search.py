@@ -1,11 +1,110 @@
 from typing import Optional
 from opp import osint
 from opp import ftype
+from opp import cache
+from opp import http_client
+from opp import rate_limit
+from opp import deadline
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from jinja2 import Template
-import requests
+from concurrent.futures import Future, ThreadPoolExecutor
+import contextvars
+import threading
+import httplib2
 from bs4 import BeautifulSoup
 
+PAGE_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="opp-cse")
+_cse_services = {}
+_cse_services_lock = threading.Lock()
+_cse_http = threading.local()
+CSE_URL = "https://www.googleapis.com/customsearch/v1"
+CSE_TIMEOUT = 10
+
+# Compiled once, filters are given as lists of canonical values
+QUERY_TEMPLATE = Template(
+    "( {{ '\"' + p_0 | join('\" OR \"') + '\"' }} ){% if pos_filters | length > 0 %} AND ( {{ '\"' + pos_filters | join('\" OR \"') + '\"' }} ) {% endif %}{% if neg_filters | length > 0 %} {{ '-\"' + neg_filters | join('\" -\"') + '\"' }}{% endif %}"
+)
+
+def canonical_value(value: str) -> str:
+    """ This function returns the canonical form of a filter value in a query : search engines ignore case and repeated spaces.
+
+    Args:
+        value (str): Value of a filter.
+
+    Returns:
+        str: Canonical value.
+    """
+    return " ".join(value.split()).lower()
+
+def canonical_values(filters: list) -> list:
+    """ This function returns the canonical values of filters, without duplicates and sorted, so the order of filters does not change the query.
+
+    Args:
+        filters (list): Filters.
+
+    Returns:
+        list: Canonical values.
+    """
+    return sorted({canonical_value(f["value"]) for f in filters})
+
+def get_cse_service(api_key: str):
+    """ This function returns the Google Custom Search service of an API key, it is only built once per key.
+
+    Args:
+        api_key (str): Google API key.
+
+    Returns:
+        googleapiclient.discovery.Resource: Custom Search service.
+    """
+    with _cse_services_lock:
+        if api_key not in _cse_services:
+            _cse_services[api_key] = build("customsearch", "v1", developerKey=api_key, cache_discovery=False)
+        return _cse_services[api_key]
+
+def set_http_timeout(http: httplib2.Http, timeout: float) -> None:
+    """ This function sets the timeout of the next requests of an HTTP client, on the connections it already opened and on the ones it will open.
+
+    Args:
+        http (httplib2.Http): HTTP client.
+        timeout (float): Timeout in seconds.
+    """
+    http.timeout = timeout
+    for connection in http.connections.values():
+        connection.timeout = timeout
+        if connection.sock is not None:
+            connection.sock.settimeout(timeout)
+
+def get_cse_page(api_key: str, cse_id: str, query: str, start: int) -> dict:
+    """ This function requests a page of results to Google Custom Search API, only the links of the results are requested.
+    The service is shared, but its HTTP connection is not thread-safe, so each thread uses its own one, whose timeout is bounded by the deadline of the current run.
+    The request goes through :class:`rate_limit.RateLimiter`, like the ones of :class:`http_client.HttpClient`.
+
+    Args:
+        api_key (str): Google API key.
+        cse_id (str): Google CSE ID.
+        query (str): Query to search.
+        start (int): Index of the first result of the page.
+
+    Returns:
+        dict: Response of the API.
+    """
+    if not hasattr(_cse_http, "http"):
+        _cse_http.http = httplib2.Http(timeout=CSE_TIMEOUT)
+    http = _cse_http.http
+    # The connection is kept, only its timeout is bounded by the deadline of the current run
+    set_http_timeout(http, deadline.clip(CSE_TIMEOUT))
+    request = get_cse_service(api_key).cse().list(q=query, cx=cse_id, start=start, fields="items(link)")
+    with rate_limit.RateLimiter().slot(CSE_URL) as slot:
+        try:
+            result = request.execute(http=http)
+        except HttpError as error:
+            slot.status = error.resp.status
+            slot.retry_after = rate_limit.parse_retry_after(error.resp.get("retry-after"))
+            raise
+        slot.status = 200
+    return result
+
 
 class Search:
     """ This class is instanciated with filters from the tree and initial filters given by the user. 
@@ -13,6 +112,7 @@ class Search:
     Attributes:
         filters (list, optional): Filters from the tree. Defaults to [].
         initial_filters (list, optional): Initial filters given by the user. Defaults to [].
+        context (SearchContext, optional): Options of the search. Defaults to the default options.
         query (str): Query prepared according the filters.
         result (list): List of obtained footprints.
     
@@ -33,36 +133,64 @@ class Search:
         ... ]
 
     """
-    def __init__(self, filters: list = [], initial_filters: list = []):
+    def __init__(self, filters: list = [], initial_filters: list = [], context: "SearchContext" = None):
         self.filters = filters
         self.initial_filters = initial_filters
+        self.context = context if context is not None else SearchContext()
         self.query = ""
         self.result = []
         self.gen_results()
 
     def gen_results(self):
         """ This method calls `prepare_query()` to obtain query,
-        then according the options in :class:`SearchOptions` it calls a search engine method
-        (`mod_google()` or `mod_google_no_api`),
+        then according the options in its :class:`SearchContext` it calls a search engine method
+        (`mod_google()` or `mod_google_no_api`), unless the results of the query are in :class:`cache.SearchCache`,
         finally according the type of the first filter and if OSINT investigations are activated
-        in :class:`SearchOptions`, it calls the right function in osint module.
+        in its :class:`SearchContext`, it calls the right function in osint module.
 
         All obtained footprints are added to `result` attribute of the current :class:`Search` object.
         """
         self.prepare_query()
-        if SearchOptions().get_api_key() and SearchOptions().get_cse_id():
-            self.mod_google()
+        if self.context.api_key and self.context.cse_id:
+            backend = "google:" + self.context.cse_id
         else:
-            self.mod_google_no_api()
+            backend = "google_no_api"
+
+        # Results of the same query are reused until they expire, and a query already in flight is not sent again
+        cached_result = cache.SearchCache().get(backend, self.query)
+        if cached_result is not None:
+            self.result = cached_result
+        else:
+            self.result = list(QueryCoalescer().run((backend, self.query), lambda: self.fetch_results(backend)))
 
         # In addition, if OSINTABLE filter, call OSINT methods.
-        if len(self.filters) != 0 and SearchOptions().get_active_search() == True:
+        if len(self.filters) != 0 and self.context.active_search == True:
             print("osint")
             if self.filters[0]["type"] == "email":
-                self.result += osint.email(self.filters[0]["value"])
+                self.result += osint.email(self.filters[0]["value"], allow=self.context.osint_allow, deny=self.context.osint_deny)
             elif self.filters[0]["type"] == "phone":
-                self.result += osint.phone(self.filters[0]["value"])
+                self.result += osint.phone(self.filters[0]["value"], allow=self.context.osint_allow, deny=self.context.osint_deny)
+
+
+    def fetch_results(self, backend: str) -> tuple:
+        """ This method sends the query to the search engine and caches its results.
+        It is only called by the first of concurrent identical queries, the cache is checked again as it may have been filled since.
 
+        Args:
+            backend (str): Search engine to use.
+
+        Returns:
+            tuple: Obtained :class:`ftype.Result` items.
+        """
+        cached_result = cache.SearchCache().get(backend, self.query)
+        if cached_result is not None:
+            return tuple(cached_result)
+        if backend == "google_no_api":
+            self.mod_google_no_api()
+        else:
+            self.mod_google()
+        cache.SearchCache().set(backend, self.query, self.result)
+        return tuple(self.result)
 
     def prepare_query(self) -> str:
         """ This method prepares a query according the filters instanciated in the current :class:`Search` object.
@@ -73,12 +201,12 @@ class Search:
             all other elements of the list if exist are considered as positive filters.
 
             `initial_filters` are simply concatenated to positive and negative filters according the value their attribute "positive". 
+
+            The query is canonical : values are lower-cased, with single spaces, and positive and negative filters are sorted without duplicates,
+            so paths of the tree with the same filters in another order or case give the same query.
         Returns:
-            str: _description_
+            str: Prepared query.
         """
-        QUERY_TEMPLATE = Template(
-            "( {{ '\"' + p_0 | join('\" OR \"') + '\"' }} ){% if pos_filters | length > 0 %} AND ( {{ '\"' + pos_filters | join('\" OR \"', attribute='value') + '\"' }} ) {% endif %}{% if neg_filters | length > 0 %} {{ '-\"' + neg_filters | join('\" -\"', attribute='value') + '\"' }}{% endif %}"
-        )
 
         p_i = []
         p_0 = []
@@ -96,93 +224,134 @@ class Search:
             p_0 = [self.filters[-1]["value"]]
             p_i += [filter for filter in self.filters[:-1] if filter["type"] in ftype.SEARCHABLE_TYPES]
         # Generating query
-        self.query = QUERY_TEMPLATE.render(p_0=p_0, pos_filters=p_i, neg_filters=n_i)
+        self.query = QUERY_TEMPLATE.render(p_0=[canonical_value(value) for value in p_0], pos_filters=canonical_values(p_i), neg_filters=canonical_values(n_i))
+        return self.query
     
     def mod_google(self):
-        api_key = SearchOptions().get_api_key()
-        search_engine_id = SearchOptions().get_cse_id()
+        """ This method gets the results of the query with Google Custom Search API.
+        Pages of results are requested in parallel, and only the links of the results are requested.
+
+        """
+        api_key = self.context.api_key
+        search_engine_id = self.context.cse_id
 
         number_of_page = 2
-        start = 1
-        result = {}
         #Result per page is apparently set to 10 by default
-
-        while start < number_of_page*10:
-            service = build("customsearch", "v1", developerKey=api_key)
-            result = service.cse().list(q=self.query, cx=search_engine_id, start=start).execute()
+        # Pages are requested with the deadline of the current run
+        pages = [PAGE_EXECUTOR.submit(contextvars.copy_context().run, get_cse_page, api_key, search_engine_id, self.query, start) for start in range(1, number_of_page*10, 10)]
+        for page in pages:
+            result = page.result()
             if "items" in result:
                 for item in result["items"]:
-                    self.result.append(
-                        {
-                            "type" : "url",
-                            "value" : item["link"],
-                            "method" : "google"
-                        }
-                    )
-            start += 10
+                    self.result.append(ftype.Result("url", item["link"], "google"))
                    
     def mod_google_no_api(self):
         url = 'https://www.google.com/search?nfpr=1&q='+ self.query.replace(" ", "+")
-        headers = {'User-Agent': 'Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:109.0) Gecko/20100101 Firefox/110.0'}
-        response = requests.get(url, headers=headers)
+        response = http_client.HttpClient().get(url)
         soup = BeautifulSoup(response.text, 'html.parser')
         results = soup.find_all('div', class_='g')
         for result in results:
             try:
-                self.result.append(
-                    {
-                        "type" : "url",
-                        "value" : result.find('a')['href'],
-                        "method" : "google"
-                    }
-                )
+                self.result.append(ftype.Result("url", result.find('a')['href'], "google"))
             except KeyError:
                 pass
 
-class SearchOptions:
-    """ This singleton class allows to store search options : Google API key, Google CSE ID and Active search.
+class QueryCoalescer:
+    """ This singleton class makes identical queries sent at the same time, by concurrent branches of a tree or concurrent searches, wait for a single call to the search engine.
 
     Attributes:
-        api_key (str, optional): Google API key. Defaults to None.
-        cse_id (str, optional): Google CSE ID. Defaults to None.
-        active_search (bool, optional): This option activates OSINT investigations. Defaults to False.
+        upstream (int): Number of calls to search engines.
+        coalesced (int): Number of queries which waited for an identical query in flight instead of calling the search engine.
     """
     _instance = None
-    _api_key = None
-    _cse_id = '566c87e9879ac4d59' # Default CSE ID of OnlinePrivacyPilot Team
-    _active_search = False
+    _lock = threading.Lock()
 
-    def __new__(cls, api_key: str = None, cse_id: str = None, active_search : bool = False):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                instance = super().__new__(cls)
+                instance.inflight = {}
+                instance.lock = threading.Lock()
+                instance.upstream = 0
+                instance.coalesced = 0
+                cls._instance = instance
         return cls._instance
 
-    @classmethod
-    def set_api_key(cls, api_key: str = None):
-        if api_key == 39*"0": # If api_key == 39*"0" do not use Google API
-            cls._api_key = None
-        else:
-            cls._api_key = api_key
+    def run(self, key: tuple, function) -> tuple:
+        """ This method calls a function, unless it is already running for the same key, in which case its result is awaited.
 
-    @classmethod
-    def set_cse_id(cls, cse_id: str = None):
-        if cse_id == None:
-            cls._cse_id = '566c87e9879ac4d59' # Default CSE ID of OnlinePrivacyPilot Team
-        else:
-            cls._cse_id = cse_id
+        Args:
+            key (tuple): Search engine and query.
+            function (callable): Function calling the search engine, its result must not be modified.
 
-    @classmethod
-    def set_active_search(cls, active_search : bool = False):
-        cls._active_search = active_search
+        Raises:
+            TimeoutError: If the result is awaited and not obtained before the deadline of the current run.
 
-    @classmethod
-    def get_api_key(cls):
-        return cls._api_key
+        Returns:
+            tuple: Result of the function.
+        """
+        with self.lock:
+            future = self.inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self.inflight[key] = Future()
+                self.upstream += 1
+            else:
+                self.coalesced += 1
+        if not owner:
+            return future.result(timeout=deadline.remaining())
+        try:
+            result = function()
+            future.set_result(result)
+            return result
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        finally:
+            with self.lock:
+                del self.inflight[key]
+
+    def stats(self) -> dict:
+        """ This method returns the counters of the queries, with the ones of :class:`cache.SearchCache`.
 
-    @classmethod
-    def get_cse_id(cls):
-        return cls._cse_id
+        Returns:
+            dict: Number of calls to search engines, of queries coalesced and of cache hits and misses.
+        """
+        with self.lock:
+            stats = {"upstream": self.upstream, "coalesced": self.coalesced}
+        stats["cache"] = cache.SearchCache().stats()
+        return stats
 
-    @classmethod
-    def get_active_search(cls):
-        return cls._active_search
+class SearchContext:
+    """ This class carries the options of a search : Google API key, Google CSE ID, Active search and the OSINT modules to use.
+    Each fingerprint has its own context, so searches with different options can run at the same time in the same process.
+
+    Attributes:
+        api_key (str, optional): Google API key, 39*"0" disables Google API. Defaults to None.
+        cse_id (str, optional): Google CSE ID. Defaults to the CSE ID of OnlinePrivacyPilot Team.
+        active_search (bool, optional): This option activates OSINT investigations. Defaults to False.
+        osint_allow (list, optional): If given, only these OSINT modules are launched. Defaults to None.
+        osint_deny (list, optional): OSINT modules which must not be launched. Defaults to None.
+    """
+    DEFAULT_CSE_ID = '566c87e9879ac4d59' # Default CSE ID of OnlinePrivacyPilot Team
+
+    def __init__(self, api_key: str = None, cse_id: str = None, active_search: bool = False, osint_allow: list = None, osint_deny: list = None):
+        # If api_key == 39*"0" do not use Google API
+        self.api_key = None if api_key == 39*"0" else (api_key or None)
+        self.cse_id = cse_id if cse_id is not None else self.DEFAULT_CSE_ID
+        self.active_search = active_search
+        self.osint_allow = osint_allow or None
+        self.osint_deny = osint_deny or None
+
+    def get_settings(self) -> dict:
+        """ This method returns the options which change the results of a search, so they can be stored with a fingerprint.
+        The API key is a secret and is not returned.
+
+        Returns:
+            dict: Active search and OSINT modules allowed and denied, sorted.
+        """
+        return {
+            "active_search": bool(self.active_search),
+            "osint_allow": sorted(self.osint_allow) if self.osint_allow else None,
+            "osint_deny": sorted(self.osint_deny) if self.osint_deny else None
+        }
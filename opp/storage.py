@@ -1,87 +1,236 @@
 from opp import footprint
-from simple_graph_sqlite import database as db
-from simple_graph_sqlite.visualizers import graphviz_visualize
+from opp import cache
+from graphviz import Digraph
 from typing import Optional
-from sqlite3 import IntegrityError
+import json
+import os
+import threading
+import time
 import unicodedata
-import string
+
+DEFAULT_DB_FILE = os.environ.get("OPP_DB_FILE", "opp.db")
+ANALYZE_EVERY = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id                INTEGER PRIMARY KEY,
+    target            TEXT NOT NULL,
+    normalized_target TEXT NOT NULL,
+    target_type       TEXT,
+    search_depth      INTEGER,
+    initial_filters   TEXT,
+    started_at        REAL,
+    finished_at       REAL,
+    search_context    TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_target_idx ON runs(normalized_target);
+
+CREATE TABLE IF NOT EXISTS footprints (
+    run_id           INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    id               INTEGER NOT NULL,
+    parent_id        INTEGER,
+    key              TEXT NOT NULL,
+    type             TEXT,
+    method           TEXT,
+    value            TEXT NOT NULL,
+    normalized_value TEXT NOT NULL,
+    level            INTEGER NOT NULL,
+    fetched_at       REAL,
+    PRIMARY KEY (run_id, id)
+);
+CREATE INDEX IF NOT EXISTS footprints_run_type_idx ON footprints(run_id, type);
+CREATE INDEX IF NOT EXISTS footprints_type_idx ON footprints(type, normalized_value);
+CREATE INDEX IF NOT EXISTS footprints_method_idx ON footprints(method);
+CREATE INDEX IF NOT EXISTS footprints_value_idx ON footprints(normalized_value);
+"""
+
+FOOTPRINT_COLUMNS = ["run_id", "id", "parent_id", "key", "type", "method", "value", "normalized_value", "level", "fetched_at"]
+RUN_COLUMNS = ["id", "target", "target_type", "search_depth", "initial_filters", "started_at", "finished_at", "search_context"]
+
+def normalize_value(value: str) -> str:
+    """ This function returns the form of a value used to compare and index footprints : Unicode compatibility normalization, case folding and trimmed spaces.
+
+    Args:
+        value (str): Value of a footprint or a target.
+
+    Returns:
+        str: Normalized value.
+    """
+    return unicodedata.normalize("NFKC", value).casefold().strip()
+
 
 class Storage:
-    def __new__(cls, target: str = None):
-        if not hasattr(cls, 'instance'):
-            cls.instance = super(Storage, cls).__new__(cls)
-            cls.footprint_id = 0
-            cls.db_file = cls.get_filename(target)
-            cls.db_conn = db.initialize(cls.db_file)
-        return cls.instance
-
-    def get_filename(target: str) -> str:
-        """
-        This method uses target value to generate a name for the DB file
+    """ This class stores fingerprints in a SQLite database. Each stored fingerprint is a run, identified by its run id,
+    so a database holds the fingerprints of many targets and many runs of the same target.
+
+    Footprints are stored in a single table with their run, their parent and their position in the tree,
+    indexed by type, method and normalized value, so footprints of a type or sharing a value are found without traversing fingerprints.
+
+    Attributes:
+        db_file (str, optional): SQLite file of the database. Defaults to `DEFAULT_DB_FILE`, which can be set with the `OPP_DB_FILE` environment variable.
+    """
+    def __init__(self, db_file: str = DEFAULT_DB_FILE):
+        self.db_file = db_file
+        self.lock = threading.Lock()
+        self.db_conn = cache.open_database(db_file)
+        self.db_conn.execute("PRAGMA foreign_keys = ON")
+        self.db_conn.executescript(SCHEMA)
+        # Databases created before the search context was stored
+        if "search_context" not in [row[1] for row in self.db_conn.execute("PRAGMA table_info(runs)")]:
+            self.db_conn.execute("ALTER TABLE runs ADD COLUMN search_context TEXT")
+
+    def store_graph(self, fp: footprint.Footprint, started_at: float = None, initial_filters: list = [], fetched_at: dict = {}, search_context: dict = None) -> int:
+        """ This method stores whole given fingerprint as a new run, in a single transaction.
+        Footprints get consecutive IDs in pre-order inside their run, the root being 1.
+        The fetch date of a footprint is the date of the results of its request, it is empty for terminal footprints.
 
         Args:
-            target (str): Input target
+            fp (footprint.Footprint): Root of the fingerprint to store.
+            started_at (float, optional): Timestamp of the start of the search. Defaults to now.
+            initial_filters (list, optional): Initial filters of the search. Defaults to [].
+            fetched_at (dict, optional): Fetch dates by footprint key, for results older than the run. Defaults to {}.
+            search_context (dict, optional): Settings of the search, as given by :meth:`search.SearchContext.get_settings`. Defaults to None.
 
         Returns:
-            str: Name for DB file
+            int: ID of the run.
         """
-        filename = unicodedata.normalize('NFKD', target).encode('ASCII', 'ignore').decode()
-        return ''.join(char for char in filename if char in "-_ ().%s%s" % (string.digits, string.ascii_letters))
-    
-    def store_graph(self, fp: footprint.Footprint = None, source_footprint_id: int = None) -> None:
-        """ This method stores recursively whole given fingerprint by calling `store_node()` and `store_edge`
+        finished_at = time.time()
+        rows = []
+        stack = [(fp, None, 0)]
+        while stack:
+            current_fp, parent_id, level = stack.pop()
+            footprint_id = len(rows) + 1
+            fp_fetched_at = None if isinstance(current_fp, footprint.TerminalFootprint) else fetched_at.get(current_fp.key, finished_at)
+            rows.append([footprint_id, parent_id, current_fp.key, current_fp.target_type, current_fp.method, current_fp.target, normalize_value(current_fp.target), level, fp_fetched_at])
+            # Reversed, so that children are popped in their order
+            stack.extend((child_fp, footprint_id, level + 1) for child_fp in reversed(current_fp.children_footprints))
+        with self.lock:
+            self.db_conn.execute("BEGIN")
+            try:
+                run_id = self.db_conn.execute("INSERT INTO runs (target, normalized_target, target_type, search_depth, initial_filters, started_at, finished_at, search_context) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                              (fp.target, normalize_value(fp.target), fp.target_type, fp.search_depth, json.dumps(initial_filters), started_at or finished_at, finished_at,
+                                               json.dumps(search_context) if search_context is not None else None)).lastrowid
+                self.db_conn.executemany("INSERT INTO footprints (%s) VALUES (%s)" % (", ".join(FOOTPRINT_COLUMNS), ", ".join("?" * len(FOOTPRINT_COLUMNS))),
+                                         ([run_id] + row for row in rows))
+                self.db_conn.execute("COMMIT")
+            except BaseException:
+                self.db_conn.execute("ROLLBACK")
+                raise
+            # Without statistics, SQLite may prefer the type index to the target one, statistics are sampled so this stays cheap
+            if run_id % ANALYZE_EVERY == 1:
+                self.db_conn.execute("PRAGMA analysis_limit=1000")
+                self.db_conn.execute("ANALYZE")
+        return run_id
+
+    def get_runs(self, target: str = None) -> list:
+        """ This method returns the stored runs, the most recent first.
 
         Args:
-            fp (footprint, optional): _description_. Defaults to None.
-            source_footprint_id (int, optional): _description_. Defaults to None.
-        """
-        if isinstance(fp, footprint.Footprint):
-            footprint_id = self.store_node(fp.method, fp.target_type, fp.target)
-            if source_footprint_id:
-                self.store_edge(source_footprint_id, footprint_id)
-            if fp.children_footprints:
-                for child_footprint in fp.children_footprints:
-                    self.store_graph(child_footprint, footprint_id)
-
-    def store_node(self, method: str, type: str, value: str) -> int:
+            target (str, optional): If given, only the runs of this target. Defaults to None.
+
+        Returns:
+            list: Runs as dicts.
         """
-        This method stores a footprint in the graph.
+        query = "SELECT %s FROM runs" % ", ".join(RUN_COLUMNS)
+        params = ()
+        if target is not None:
+            query += " WHERE normalized_target = ?"
+            params = (normalize_value(target),)
+        with self.lock:
+            rows = self.db_conn.execute(query + " ORDER BY finished_at DESC, id DESC", params).fetchall()
+        return [dict(zip(RUN_COLUMNS, row), initial_filters=json.loads(row[4] or "[]"), search_context=json.loads(row[7]) if row[7] else None) for row in rows]
+
+    def get_last_run(self, target: str) -> Optional[dict]:
+        """ This method returns the most recent run of a target.
 
         Args:
-            method (str): Method used to retieve footprint
-            type (str): Type of footprint
-            value (str): Value of footprint
+            target (str): Target of the run.
 
         Returns:
-            int: ID corresponding to stored node
+            Optional[dict]: Run, or None if the target was never stored.
         """
-        self.footprint_id += 1
-        try:
-            db.atomic(self.db_file, db.add_node({'method': method, 'type': type, 'value': value}, self.footprint_id))
-        except IntegrityError:
-            db.atomic(self.db_file, db.remove_nodes(db.traverse(self.db_file, 1, neighbors_fn=db.find_neighbors)))
-            db.atomic(self.db_file, db.add_node({'method': method, 'type': type, 'value': value}, self.footprint_id))
-        return self.footprint_id
-
-    def store_edge(self, parent_id: int, child_id: int) -> None:
+        runs = self.get_runs(target)
+        return runs[0] if runs else None
+
+    def get_footprints(self, run_id: int) -> list:
+        """ This method returns the footprints of a run in pre-order.
+
+        Args:
+            run_id (int): ID of the run.
+
+        Returns:
+            list: Footprints as dicts.
         """
-        This method stores an edge in the graph.
+        with self.lock:
+            rows = self.db_conn.execute("SELECT %s FROM footprints WHERE run_id = ? ORDER BY id" % ", ".join(FOOTPRINT_COLUMNS), (run_id,)).fetchall()
+        return [dict(zip(FOOTPRINT_COLUMNS, row)) for row in rows]
+
+    def find_footprints(self, target: str = None, type: str = None, method: str = None, value: str = None, run_id: int = None) -> list:
+        """ This method finds footprints by any combination of criteria, with the target of their run.
+        For instance, all emails found for a target, or all runs in which a username was found.
 
         Args:
-            parent_id (int): Parent node ID
-            child_id (int): Child node ID
+            target (str, optional): Target of the run. Defaults to None.
+            type (str, optional): Type of the footprints. Defaults to None.
+            method (str, optional): Method which found the footprints. Defaults to None.
+            value (str, optional): Value of the footprints, compared once normalized. Defaults to None.
+            run_id (int, optional): ID of the run. Defaults to None.
+
+        Returns:
+            list: Footprints as dicts, with a "target" item.
         """
-        db.atomic(self.db_file, db.connect_nodes(parent_id, child_id, {}))
-    
-    def delete_node(self, id: int) -> None:
+        clauses = []
+        params = []
+        for clause, param in [("runs.normalized_target = ?", normalize_value(target) if target is not None else None),
+                              ("footprints.type = ?", type),
+                              ("footprints.method = ?", method),
+                              ("footprints.normalized_value = ?", normalize_value(value) if value is not None else None),
+                              ("footprints.run_id = ?", run_id)]:
+            if param is not None:
+                clauses.append(clause)
+                params.append(param)
+        query = "SELECT %s, runs.target FROM footprints JOIN runs ON runs.id = footprints.run_id" % ", ".join("footprints." + column for column in FOOTPRINT_COLUMNS)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        with self.lock:
+            rows = self.db_conn.execute(query + " ORDER BY footprints.run_id, footprints.id", params).fetchall()
+        return [dict(zip(FOOTPRINT_COLUMNS + ["target"], row)) for row in rows]
+
+    def find_targets(self, value: str, type: str = None) -> list:
+        """ This method returns the targets in the fingerprint of which a value was found, for instance the targets sharing a username.
+
+        Args:
+            value (str): Value to look for, compared once normalized.
+            type (str, optional): If given, only footprints of this type. Defaults to None.
+
+        Returns:
+            list: Distinct targets, in alphabetical order.
         """
-        This method deletes a node according to its ID, all child nodes will be also deleted.
+        return sorted({fp["target"] for fp in self.find_footprints(type=type, value=value)})
+
+    def delete_run(self, run_id: int) -> None:
+        """ This method deletes a run and its footprints.
 
         Args:
-            id (int): ID of the node to delete
+            run_id (int): ID of the run to delete.
         """
-        db.atomic(self.db_file, db.remove_nodes(db.traverse(self.db_file, id, neighbors_fn=db.find_outbound_neighbors)))
- 
+        with self.lock:
+            self.db_conn.execute("DELETE FROM runs WHERE id = ?", (run_id,))
+
+    def gen_graphviz(self, run_id: int, dot_file: str = None, format: str = "png") -> str:
+        """ This method renders the fingerprint of a run with Graphviz.
 
-    def gen_graphviz(self):
-        graphviz_visualize(self.db_file, self.db_file+'.dot', db.traverse(self.db_file, 1, neighbors_fn=db.find_neighbors))
+        Args:
+            run_id (int): ID of the run.
+            dot_file (str, optional): DOT file to write, the rendered image is written next to it. Defaults to `<db_file>.<run_id>.dot`.
+            format (str, optional): Format of the image. Defaults to "png".
+
+        Returns:
+            str: Path of the rendered image.
+        """
+        dot = Digraph()
+        for fp in self.get_footprints(run_id):
+            dot.node(str(fp["id"]), label="method %s\\ntype %s\\nvalue %s" % (fp["method"], fp["type"], fp["value"]))
+            if fp["parent_id"]:
+                dot.edge(str(fp["parent_id"]), str(fp["id"]))
+        return dot.render(dot_file or "%s.%d.dot" % (self.db_file, run_id), format=format)
@@ -0,0 +1,41 @@
+"""
+This script measures the cost of adding footprints to a tree, duplicate check included.
+No search is done : children are created from the root footprint with a type which is not investigated.
+
+Usage: python scripts/benchmark_duplicate_index.py [number_of_nodes] [block_size]
+"""
+import sys
+import time
+from opp import fingerprint_handler
+from opp import footprint
+
+def benchmark(nodes: int = 20000, block: int = 1000) -> list:
+    """ This function adds `nodes` footprints to a tree and measures the mean cost per node for each block of `block` footprints.
+
+    Args:
+        nodes (int, optional): Number of footprints to create. Defaults to 20000.
+        block (int, optional): Number of footprints per measure. Defaults to 1000.
+
+    Returns:
+        list: Tuples (number of nodes in the tree, mean cost per node in microseconds).
+    """
+    fingerprint = fingerprint_handler.FingerprintHandler(target="Paul Martin", search_depth=2)
+    root = footprint.RecursionHandler.get_root(fingerprint=fingerprint, target=fingerprint.target, search_depth=fingerprint.search_depth)
+    measures = []
+    start = time.perf_counter()
+    for i in range(1, nodes + 1):
+        # Half of the targets are duplicates differing only by case
+        value = "Footprint %d" % (i // 2) if i % 2 else "FOOTPRINT %d" % (i // 2)
+        root.add_child({"type": "description", "value": value, "method": "benchmark"})
+        if i % block == 0:
+            end = time.perf_counter()
+            measures.append((i, (end - start) / block * 1e6))
+            start = end
+    return measures
+
+if __name__ == '__main__':
+    nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    block = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    print("nodes\tus/node")
+    for count, cost in benchmark(nodes, block):
+        print("%d\t%.2f" % (count, cost))
@@ -0,0 +1,110 @@
+"""
+This script measures the parse throughput of the scrappers, for each installed parser backend.
+Pages are read from a directory with a subdirectory per host, e.g. pages/github.com/paulmartin.html, or generated if no directory is given.
+The baseline is BeautifulSoup with html.parser and one search of the document per field, as the scrappers did before extraction specs.
+
+Usage: python scripts/benchmark_parsers.py [pages_directory] [repeat]
+"""
+import os
+import sys
+import time
+from bs4 import BeautifulSoup
+from opp import extract
+from opp import scrap
+
+# Generated pages : fields of the scrapper hidden in a page of the usual size of a profile
+SAMPLE_FIELDS = {
+    "twitter.com": '<div class="profile-card"><a class="profile-card-fullname">Paul Martin</a><a class="profile-card-username">@paulmartin</a>'
+                   '<div class="profile-bio"><p>Developer in Paris</p></div><a class="profile-location">Paris</a><a class="profile-website">https://paulmartin.fr</a></div>',
+    "www.tiktok.com": '<h1 data-e2e="user-subtitle">Paul Martin</h1><h2 data-e2e="user-title">paulmartin</h2><h2 data-e2e="user-bio">Developer</h2>'
+                      '<div data-e2e="user-avatar"><span><img src="https://p16.tiktokcdn.com/paulmartin.jpeg"></span></div>',
+    "github.com": '<img class="avatar avatar-user" src="https://avatars.githubusercontent.com/u/1?v=4"><span class="p-name vcard-fullname">Paul Martin</span>'
+                  '<span class="p-nickname vcard-username">paulmartin</span><div class="user-profile-bio" data-bio-text="Developer"></div>'
+                  '<ul><li class="vcard-detail" itemprop="homeLocation">Paris</li><li class="vcard-detail" itemprop="url">https://paulmartin.fr</li>'
+                  '<li class="vcard-detail" itemprop="social"><a href="https://twitter.com/paulmartin">@paulmartin</a></li></ul>',
+    "fr.linkedin.com": '<h1 class="top-card-layout__title">Paul Martin</h1><h2 class="top-card-layout__headline">Developer</h2>'
+                       '<div class="top-card__position-info">OPP</div><section class="summary"><p>Developer in Paris</p></section>',
+    "www.instagram.com": '<h1 class="fullname">Paul Martin</h1><div class="username">@paulmartin</div><div class="sum">Developer</div>'
+}
+
+def sample_page(fields: str, blocks: int = 300) -> bytes:
+    """ This function generates a page with the given fields between blocks of unrelated content.
+
+    Args:
+        fields (str): HTML of the fields.
+        blocks (int, optional): Number of unrelated blocks. Defaults to 300.
+
+    Returns:
+        bytes: Content of the page.
+    """
+    block = '<div class="post"><a href="/post/%d" class="link">Post %d</a><p>Lorem <b>ipsum</b> dolor sit amet, <i>consectetur</i> adipiscing elit.</p></div>'
+    filler = "".join(block % (i, i) for i in range(blocks))
+    return ("<html><head><title>Profile</title></head><body><nav>%s</nav><main>%s</main><footer>%s</footer></body></html>"
+            % (filler[:len(filler) // 3], fields, filler)).encode()
+
+def load_pages(directory: str = None) -> dict:
+    """ This function loads the pages to parse, grouped by host.
+
+    Args:
+        directory (str, optional): Directory with a subdirectory per host. Defaults to None, for generated pages.
+
+    Returns:
+        dict: Contents of the pages by host.
+    """
+    if directory is None:
+        return {host: [sample_page(fields)] for host, fields in SAMPLE_FIELDS.items()}
+    pages = {}
+    for host in sorted(os.listdir(directory)):
+        path = os.path.join(directory, host)
+        if os.path.isdir(path):
+            pages[host] = [open(os.path.join(path, name), "rb").read() for name in sorted(os.listdir(path))]
+    return pages
+
+def baseline(extractor: extract.Extractor, content: bytes) -> list:
+    """ This function parses a page with html.parser and searches the document once per field.
+
+    Args:
+        extractor (extract.Extractor): Fields to find.
+        content (bytes): Content of the page.
+
+    Returns:
+        list: Values found.
+    """
+    soup = BeautifulSoup(content, "html.parser")
+    return [soup.select(field.selector) if field.all else soup.select_one(field.selector) for field in extractor.fields]
+
+def benchmark(pages: dict, repeat: int = 20) -> list:
+    """ This function parses the pages of each host `repeat` times with the baseline and with each installed backend.
+
+    Args:
+        pages (dict): Contents of the pages by host.
+        repeat (int, optional): Number of times each page is parsed. Defaults to 20.
+
+    Returns:
+        list: Tuples (scrapper, backend, pages per second, speedup over the baseline).
+    """
+    measures = []
+    for host, contents in pages.items():
+        scrapper = scrap.ScrapperRegistry().get("https://%s/" % host)
+        if scrapper.EXTRACTOR is None:
+            continue
+        parsers = [("baseline", lambda content: baseline(scrapper.EXTRACTOR, content))]
+        parsers += [(name, lambda content, name=name: scrapper.EXTRACTOR.extract(content, scrapper.METHOD_NAME, backend=name))
+                    for name in extract.available_backends()]
+        reference = None
+        for name, parse in parsers:
+            start = time.perf_counter()
+            for _ in range(repeat):
+                for content in contents:
+                    parse(content)
+            rate = repeat * len(contents) / (time.perf_counter() - start)
+            reference = reference or rate
+            measures.append((scrapper.__name__, name, rate, rate / reference))
+    return measures
+
+if __name__ == '__main__':
+    directory = sys.argv[1] if len(sys.argv) > 1 else None
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    print("scrapper\tbackend\tpages/s\tspeedup")
+    for name, backend, rate, speedup in benchmark(load_pages(directory), repeat):
+        print("%s\t%s\t%.1f\t%.2f" % (name, backend, rate, speedup))
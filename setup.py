@@ -10,11 +10,11 @@ setup(
     install_requires=[
         "beautifulsoup4",
         "google-api-python-client",
-        "simple_graph_sqlite",
+        "graphviz",
         "sphinx",
         "selenium",
         "chromedriver_binary",
-        "httpx",
+        "httpx[http2]",
         "holehe",
         "ignorant",
         "jinja2",
@@ -24,6 +24,10 @@ setup(
         "asciitree",
         "pyinstaller"
     ],
+    extras_require={
+        "lxml": ["lxml"],
+        "selectolax": ["selectolax"]
+    },
     entry_points={
         'console_scripts': [
             'oppcli=opp.cli_client:run',
@@ -555,6 +555,134 @@ class TestActiveSearch(unittest.TestCase):
         response = requests.get(self.url + 'target=' + self.target + '&active_search=2/4')
         self.assertEqual(response.status_code, 400)
 
+
+class TestJobs(unittest.TestCase):
+    def __init__(self, methodName: str = "runTest") -> None:
+        super().__init__(methodName=methodName)
+        self.url = 'http://127.0.0.1:5000/api/jobs'
+        self.target = "test"
+
+    """
+    OK
+    submitted job can be polled
+    """
+    def test_jobs_1(self):
+        response = requests.post(self.url + '?target=' + self.target + '&depth=1')
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()["id"]
+        response = requests.get(self.url + '/' + job_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(response.json()["status"], ["queued", "running", "done", "failed"])
+
+    """
+    KO
+    unknown job
+    """
+    def test_jobs_2(self):
+        response = requests.get(self.url + '/unknown')
+        self.assertEqual(response.status_code, 404)
+
+    """
+    KO
+    callback_url is not an URL
+    """
+    def test_jobs_3(self):
+        response = requests.post(self.url + '?target=' + self.target + '&callback_url=callback')
+        self.assertEqual(response.status_code, 400)
+
+
+class TestStream(unittest.TestCase):
+    def __init__(self, methodName: str = "runTest") -> None:
+        super().__init__(methodName=methodName)
+        self.url = 'http://127.0.0.1:5000/api/stream?'
+        self.target = "test"
+
+    """
+    OK
+    every line is a JSON event, the last one is end
+    """
+    def test_stream_1(self):
+        response = requests.get(self.url + 'target=' + self.target + '&depth=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['content-type'], 'application/x-ndjson')
+        lines = response.text.splitlines()
+        self.assertIs(all(validateJSON(line) for line in lines), True)
+        self.assertEqual(json.loads(lines[-1])["event"], "end")
+
+    """
+    KO
+    unknown format
+    """
+    def test_stream_2(self):
+        response = requests.get(self.url + 'target=' + self.target + '&format=xml')
+        self.assertEqual(response.status_code, 400)
+
+class TestBudget(unittest.TestCase):
+    def __init__(self, methodName: str = "runTest") -> None:
+        super().__init__(methodName=methodName)
+        self.url = 'http://127.0.0.1:5000/api/?'
+        self.target = "test"
+
+    """
+    OK
+    best-first search limited in requests and time
+    """
+    def test_budget_1(self):
+        response = requests.get('http://127.0.0.1:5000/api/stream?target=' + self.target + '&depth=5&max_requests=5&max_fanout=3&max_time=60&format=ndjson')
+        self.assertEqual(response.status_code, 200)
+        lines = response.text.splitlines()
+        self.assertIs(all(validateJSON(line) for line in lines), True)
+        end = json.loads(lines[-1])
+        self.assertEqual(end["event"], "end")
+        self.assertLessEqual(end["data"]["requests"], 5)
+        self.assertGreater(end["data"]["skipped"], 0)
+
+    """
+    KO
+    unknown strategy
+    """
+    def test_budget_2(self):
+        response = requests.get(self.url + 'target=' + self.target + '&strategy=random')
+        self.assertEqual(response.status_code, 400)
+
+    """
+    KO
+    no request allowed
+    0
+    """
+    def test_budget_3(self):
+        response = requests.get(self.url + 'target=' + self.target + '&max_requests=0')
+        self.assertEqual(response.status_code, 400)
+
+class TestTimeout(unittest.TestCase):
+    def __init__(self, methodName: str = "runTest") -> None:
+        super().__init__(methodName=methodName)
+        self.url = 'http://127.0.0.1:5000/api/?'
+        self.target = "test"
+
+    """
+    OK
+    deep search stopped after its timeout, unfinished nodes are truncated
+    """
+    def test_timeout_1(self):
+        start = time.time()
+        response = requests.get(self.url + 'target=' + self.target + '&depth=10&timeout=5')
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(time.time() - start, 30)
+        truncated = [node["attributes"].get("truncated") for node in response.json()["nodes"]]
+        # Truncated nodes are marked, the other ones have no "truncated" attribute
+        self.assertIn(True, truncated)
+        self.assertLessEqual(set(truncated), {True, None})
+
+    """
+    KO
+    timeout below 1 second
+    0.1
+    """
+    def test_timeout_2(self):
+        response = requests.get(self.url + 'target=' + self.target + '&timeout=0.1')
+        self.assertEqual(response.status_code, 400)
+
  
 
 def validateJSON(jsonData):
@@ -577,6 +705,10 @@ if __name__ == '__main__':
     suite.addTests(loader.loadTestsFromTestCase(TestCSEId))
     suite.addTests(loader.loadTestsFromTestCase(TestDepth))
     suite.addTests(loader.loadTestsFromTestCase(TestActiveSearch))
+    suite.addTests(loader.loadTestsFromTestCase(TestJobs))
+    suite.addTests(loader.loadTestsFromTestCase(TestStream))
+    suite.addTests(loader.loadTestsFromTestCase(TestBudget))
+    suite.addTests(loader.loadTestsFromTestCase(TestTimeout))
 
     runner = unittest.TextTestRunner(verbosity=6)
     runner.run(suite)
@@ -0,0 +1,58 @@
+import unittest
+import io
+import json
+from opp import batch
+
+class TestCheckTarget(unittest.TestCase):
+    """
+    Options of the targets of a batch are checked before any search
+    """
+
+    """
+    OK
+    valid options
+    """
+    def test_valid(self):
+        self.assertIsNone(batch.check_target({"target": "Paul Martin", "depth": 2, "active_search": True, "osint_allow": ["holehe_github"], "timeout": 30}))
+        self.assertIsNone(batch.check_target({"target": "Paul Martin", "initial_filters": [{"value": "Paris", "type": "location", "positive": True},
+                                                                                            {"value": "Lyon", "type": None, "positive": False}]}))
+
+    """
+    KO
+    options of the wrong type or out of bounds
+    """
+    def test_invalid(self):
+        for spec in [{"depth": True}, {"depth": 0}, {"depth": 11}, {"depth": "2"}, {"timeout": True}, {"active_search": 1},
+                     {"active_search": "yes"}, {"osint_allow": "github"}, {"osint_deny": [1]},
+                     {"initial_filters": [{"value": 75, "type": None, "positive": True}]}, {"initial_filters": [{"value": "", "type": None, "positive": True}]},
+                     {"initial_filters": [{"value": "Paris", "type": 1, "positive": True}]}, {"initial_filters": [{"value": "Paris", "type": "city", "positive": True}]},
+                     {"initial_filters": [{"value": "Paris", "type": None, "positive": "yes"}]}]:
+            spec["target"] = "Paul Martin"
+            self.assertIsNotNone(batch.check_target(spec), spec)
+
+class FailingStorage:
+    """
+    Storage whose runs cannot be read, so a refresh fails before the search
+    """
+    def get_runs(self, target: str):
+        raise RuntimeError("database is locked")
+
+class TestRunBatch(unittest.TestCase):
+    """
+    One record is written per target, and failed targets are counted
+    """
+
+    """
+    KO
+    a target failing before its search gives a failed record
+    """
+    def test_failed_before_search(self):
+        output = io.StringIO()
+        failed = batch.run_batch(["Paul Martin"], output, storage=FailingStorage(), refresh_ttl={})
+        self.assertEqual(failed, 1)
+        record = json.loads(output.getvalue())
+        self.assertEqual((record["target"], record["status"]), ("Paul Martin", "failed"))
+        self.assertIn("database is locked", record["error"])
+
+if __name__ == '__main__':
+    unittest.main()
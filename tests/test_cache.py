@@ -0,0 +1,87 @@
+import unittest
+import os
+import sqlite3
+import tempfile
+from opp import cache
+from opp import ftype
+
+class TestResponseCacheStore(unittest.TestCase):
+    """
+    Responses are stored in a SQLite file which may be shared with other processes
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.directory.name, "cache.db")
+        self.cache = cache.ResponseCache.configure(db_file=self.db_file)
+        # Do not wait for the lock held by the other connection
+        self.cache.db_conn.execute("PRAGMA busy_timeout = 0")
+
+    def tearDown(self):
+        self.cache.db_conn.close()
+        cache.ResponseCache._instance = None
+        self.directory.cleanup()
+
+    """
+    OK
+    a store failing on a locked database does not leave its transaction open
+    """
+    def test_locked(self):
+        other = sqlite3.connect(self.db_file, isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+        with self.assertRaises(sqlite3.OperationalError):
+            self.cache.store("https://github.com/paulmartin", b"<html>Paul Martin</html>")
+        other.execute("ROLLBACK")
+        other.close()
+        self.assertFalse(self.cache.db_conn.in_transaction)
+        self.cache.store("https://github.com/paulmartin", b"<html>Paul Martin</html>")
+        row = self.cache.db_conn.execute("SELECT COUNT(*) FROM http_responses").fetchone()
+        self.assertEqual(row[0], 1)
+
+class TestSearchCacheLocked(unittest.TestCase):
+    """
+    A search cache whose SQLite file is locked by another process does not fail the search
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_file = os.path.join(self.directory.name, "cache.db")
+        self.cache = cache.SearchCache.configure(db_file=self.db_file)
+        # Do not wait for the lock held by the other connection
+        self.cache.db_conn.execute("PRAGMA busy_timeout = 0")
+        self.other = sqlite3.connect(self.db_file, isolation_level=None)
+
+    def tearDown(self):
+        self.other.close()
+        self.cache.db_conn.close()
+        cache.SearchCache._instance = None
+        self.directory.cleanup()
+
+    """
+    OK
+    a failed write is skipped, the results are still kept in memory
+    """
+    def test_set(self):
+        results = [ftype.Result("url", "https://github.com/paulmartin", "google")]
+        self.other.execute("BEGIN IMMEDIATE")
+        self.cache.set("google", "Paul Martin", results)
+        self.other.execute("ROLLBACK")
+        self.assertFalse(self.cache.db_conn.in_transaction)
+        self.assertEqual(self.cache.get("google", "Paul Martin"), results)
+        self.assertEqual(self.cache.db_conn.execute("SELECT COUNT(*) FROM search_cache").fetchone()[0], 0)
+
+    """
+    OK
+    a failed read is a miss
+    """
+    def test_get(self):
+        self.cache.set("google", "Paul Martin", [ftype.Result("url", "https://github.com/paulmartin", "google")])
+        self.cache.entries.clear()
+        self.other.execute("BEGIN EXCLUSIVE")
+        self.assertIsNone(self.cache.get("google", "Paul Martin"))
+        self.other.execute("ROLLBACK")
+        self.assertEqual(self.cache.stats()["misses"], 1)
+        self.assertIsNotNone(self.cache.get("google", "Paul Martin"))
+
+if __name__ == '__main__':
+    unittest.main()
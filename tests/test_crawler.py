@@ -0,0 +1,92 @@
+import unittest
+from opp import crawler
+from opp import fingerprint_handler
+from opp import footprint
+from opp import ftype
+
+class StubResults:
+    """
+    Previous run giving fixed results by target, so the crawl does not search nor scrap
+    """
+    def __init__(self, results: dict):
+        self.results = results
+        self.calls = []
+
+    def get_fresh_results(self, fp: footprint.Footprint):
+        self.calls.append(fp.target)
+        return self.results.get(fp.target, []), 0.0
+
+RESULTS = {
+    "Paul Martin": [ftype.Result("url", "https://example.com/paul", "google"), ftype.Result("email", "paul@martin.fr", "google"),
+                    ftype.Result("url", "https://github.com/paulmartin", "google")],
+    "https://github.com/paulmartin": [ftype.Result("username", "paulm", "github_scrapper"), ftype.Result("location", "Paris", "github_scrapper")],
+    "paul@martin.fr": [ftype.Result("url", "https://twitter.com/paulm", "google")]
+}
+
+def get_handler(budget: crawler.Budget = None) -> fingerprint_handler.FingerprintHandler:
+    return fingerprint_handler.FingerprintHandler(target="Paul Martin", search_depth=3, workers=1, previous=StubResults(RESULTS), strategy="best_first", budget=budget)
+
+class TestScoreFootprint(unittest.TestCase):
+    """
+    Profiles and the exact name of the target come first, generic pages last, and scores decrease with the level
+    """
+
+    """
+    OK
+    """
+    def test_scores(self):
+        handler = get_handler()
+        root = footprint.RecursionHandler.get_root(fingerprint=handler, target=handler.target, search_depth=3)
+        profile, page, email = [footprint.RecursionHandler.build(fingerprint=handler, target=item.value, source_footprint=root, method=item.method, target_type=item.type)
+                                for item in (RESULTS["Paul Martin"][2], RESULTS["Paul Martin"][0], RESULTS["Paul Martin"][1])]
+        self.assertEqual(crawler.score_footprint(root, 0), crawler.EXACT_NAME_SCORE)
+        self.assertEqual(crawler.score_footprint(profile, 1), crawler.PROFILE_URL_SCORE * crawler.LEVEL_DECAY)
+        self.assertGreater(crawler.score_footprint(email, 1), crawler.score_footprint(page, 1))
+        self.assertGreater(crawler.score_footprint(email, 1), crawler.score_footprint(email, 2))
+
+class TestBestFirstCrawler(unittest.TestCase):
+    """
+    The best footprints are expanded first, within the budget
+    """
+
+    """
+    OK
+    without budget, the whole tree is built, best footprints first
+    """
+    def test_order(self):
+        handler = get_handler()
+        root = handler.get_fingerprint()
+        self.assertEqual(handler.previous.calls[:3], ["Paul Martin", "https://github.com/paulmartin", "paul@martin.fr"])
+        self.assertEqual(handler.previous.calls[-1], "https://example.com/paul")
+        self.assertEqual(handler.progress.nodes, 7)
+        self.assertEqual(handler.progress.skipped, 0)
+        self.assertEqual(len(handler.get_json_nodes_edges(root)["edges"]), 6)
+
+    """
+    OK
+    once the budget is spent, the remaining footprints are skipped and truncated
+    """
+    def test_budget(self):
+        handler = get_handler(crawler.Budget(max_requests=2))
+        root = handler.get_fingerprint()
+        self.assertEqual(handler.previous.calls, ["Paul Martin", "https://github.com/paulmartin"])
+        self.assertEqual(handler.progress.requests, 2)
+        self.assertGreater(handler.progress.skipped, 0)
+        nodes = handler.get_json_nodes_edges(root)["nodes"]
+        self.assertIn(True, [node["attributes"].get("truncated") for node in nodes])
+
+    """
+    OK
+    streamed nodes and edges have the order and the keys of the whole tree
+    """
+    def test_events(self):
+        handler = get_handler()
+        streamed = {"nodes": [], "edges": []}
+        for event, data in handler.get_json_events():
+            if event in ("node", "edge"):
+                streamed[event + "s"].append(data)
+        self.assertEqual(event, "end")
+        self.assertEqual(streamed, handler.get_json_nodes_edges(handler.created[0]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+from unittest import mock
+import os
+import httpx
+from opp import deadline
+from opp import http_client
+from opp import jobs
+
+class TestIsPublicUrl(unittest.TestCase):
+    """
+    Callback URLs are given by clients, they must be HTTP(S) URLs of public hosts
+    """
+
+    """
+    OK
+    """
+    def test_public(self):
+        self.assertTrue(jobs.is_public_url("https://8.8.8.8/callback"))
+        self.assertTrue(jobs.is_public_url("http://8.8.8.8:8080/callback?job=1"))
+
+    """
+    KO
+    other schemes, loopback, private and link-local hosts, malformed URLs
+    """
+    def test_private(self):
+        for url in ["ftp://8.8.8.8/", "file:///etc/passwd", "http:///callback", "http://127.0.0.1:5000/api/jobs", "http://[::1]/",
+                    "http://10.0.0.1/", "http://192.168.1.1/", "http://169.254.169.254/latest/meta-data/", "http://0.0.0.0/",
+                    "http://8.8.8.8:99999/"]:
+            self.assertFalse(jobs.is_public_url(url), url)
+
+class TestJobManager(unittest.TestCase):
+    """
+    Jobs are executed by a pool of workers configured by the environment, their status is posted to their callback URL
+    """
+
+    def tearDown(self):
+        jobs.JobManager._instance = None
+
+    """
+    OK
+    options are read from the environment when the manager is created
+    """
+    def test_environment(self):
+        with mock.patch.dict(os.environ, {"OPP_JOB_WORKERS": "3", "OPP_JOB_MAX_QUEUED": " 7 "}):
+            manager = jobs.JobManager()
+        self.assertEqual((manager.workers, manager.result_ttl, manager.max_queued), (3, jobs.DEFAULT_RESULT_TTL, 7))
+        manager.executor.shutdown()
+
+    """
+    KO
+    """
+    def test_invalid_environment(self):
+        with mock.patch.dict(os.environ, {"OPP_JOB_RESULT_TTL": "1h"}):
+            with self.assertRaises(ValueError):
+                jobs.JobManager()
+
+    def run_job(self, callback_url: str, post) -> jobs.Job:
+        manager = jobs.JobManager.create(workers=1)
+        with mock.patch.object(http_client.HttpClient, "post", post):
+            job = manager.submit(lambda job: {"nodes": []}, callback_url=callback_url)
+            manager.executor.shutdown(wait=True)
+        self.assertEqual(job.status, "done")
+        return job
+
+    """
+    OK
+    the status is posted without following redirections
+    """
+    def test_notify(self):
+        post = mock.Mock(return_value=httpx.Response(204))
+        job = self.run_job("https://8.8.8.8/callback", post)
+        self.assertEqual(post.call_args.args, ("https://8.8.8.8/callback",))
+        self.assertEqual(post.call_args.kwargs["json"]["status"], "done")
+        self.assertFalse(post.call_args.kwargs["follow_redirects"])
+        self.assertIsNone(job.callback_error)
+
+    """
+    KO
+    failures of the callback are recorded in the job, private URLs are not posted to
+    """
+    def test_notify_failed(self):
+        for error in [httpx.ConnectError("refused"), httpx.InvalidURL("invalid"), deadline.DeadlineExceeded("deadline")]:
+            job = self.run_job("https://8.8.8.8/callback", mock.Mock(side_effect=error))
+            self.assertEqual(job.callback_error, repr(error))
+        job = self.run_job("https://8.8.8.8/callback", mock.Mock(return_value=httpx.Response(302)))
+        self.assertEqual(job.callback_error, "Callback returned HTTP 302")
+        post = mock.Mock()
+        job = self.run_job("http://127.0.0.1:5000/api/jobs", post)
+        post.assert_not_called()
+        self.assertIsNotNone(job.callback_error)
+
+if __name__ == '__main__':
+    unittest.main()
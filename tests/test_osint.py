@@ -0,0 +1,72 @@
+import unittest
+from unittest import mock
+import os
+import tempfile
+import trio
+from opp import osint
+
+def make_module(name: str):
+    async def module(email, client, out):
+        pass
+    module.__module__ = "holehe.modules"
+    module.__name__ = name
+    return module
+
+class TestOsintRuntime(unittest.TestCase):
+    """
+    Modules are run by the OSINT runtime in the order of their priority, a limited number at the same time
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.stats = osint.ModuleStats.configure(db_file=os.path.join(self.directory.name, "cache.db"))
+
+    def tearDown(self):
+        self.stats.db_conn.close()
+        osint.ModuleStats._instance = None
+        self.directory.cleanup()
+
+    def investigate(self, modules: list, launch, limit: int, module_timeout: float = 10) -> osint.OsintReport:
+        runtime = object.__new__(osint.OsintRuntime)
+        runtime.client = None
+        async def main():
+            runtime.limiter = trio.CapacityLimiter(limit)
+            return await runtime.investigate_async([("email", "paul@martin.fr")], None, module_timeout)
+        with mock.patch.dict(osint.LAUNCHERS, {"email": (launch, modules)}):
+            return trio.run(main)[0]
+
+    """
+    OK
+    modules start in the order of their score, whatever the order trio starts tasks in
+    """
+    def test_order(self):
+        modules = [make_module("site%d" % i) for i in range(8)]
+        # The faster, the higher the score
+        for i, module in enumerate(modules):
+            self.stats.record(osint.module_name(module), latency=i + 1)
+        started = []
+        async def launch(module, email, client, out):
+            started.append(module.__name__)
+            await trio.sleep(0.01)
+        report = self.investigate(list(reversed(modules)), launch, limit=3)
+        self.assertEqual(started, ["site%d" % i for i in range(8)])
+        self.assertEqual(sorted(report.completed), sorted(osint.module_name(module) for module in modules))
+
+    """
+    OK
+    modules waiting for a slot are bounded by the deadline, and are not counted as failures
+    """
+    def test_deadline(self):
+        modules = [make_module("site%d" % i) for i in range(3)]
+        started = []
+        async def launch(module, email, client, out):
+            started.append(module.__name__)
+            await trio.sleep_forever()
+        report = self.investigate(modules, launch, limit=1, module_timeout=0.1)
+        self.assertEqual(started, ["site0"])
+        self.assertEqual(sorted(report.timed_out), sorted(osint.module_name(module) for module in modules))
+        self.assertEqual(self.stats.get("holehe_site0")["failures"], 1)
+        self.assertEqual(self.stats.get("holehe_site1")["runs"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
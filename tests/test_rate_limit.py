@@ -0,0 +1,170 @@
+import unittest
+from unittest import mock
+from email.utils import formatdate
+import time
+import httpx
+import trio
+from opp import rate_limit
+
+class FakeClock:
+    """
+    Monotonic clock moved forward by the waits of the limiter, so no test sleeps
+    """
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = 0.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, delay: float) -> None:
+        self.now += delay
+        self.slept += delay
+
+    def time(self) -> float:
+        return time.time()
+
+class ClockTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(rate_limit, "time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        rate_limit.RateLimiter.configure(policies={}, default_policy=(1.0, 2, 4))
+        self.addCleanup(rate_limit.RateLimiter.configure)
+
+class TestParseRetryAfter(unittest.TestCase):
+    """
+    Retry-After is given in seconds or as an HTTP date
+    """
+
+    """
+    OK
+    seconds, dates, and delays bounded by MAX_BACKOFF
+    """
+    def test_values(self):
+        self.assertEqual(rate_limit.parse_retry_after("5"), 5.0)
+        self.assertEqual(rate_limit.parse_retry_after("-3"), 0.0)
+        self.assertEqual(rate_limit.parse_retry_after("100000"), rate_limit.MAX_BACKOFF)
+        self.assertAlmostEqual(rate_limit.parse_retry_after(formatdate(time.time() + 60, usegmt=True)), 60, delta=2)
+
+    """
+    KO
+    missing or invalid headers
+    """
+    def test_invalid(self):
+        self.assertIsNone(rate_limit.parse_retry_after(None))
+        self.assertIsNone(rate_limit.parse_retry_after(""))
+        self.assertIsNone(rate_limit.parse_retry_after("soon"))
+
+class TestHostLimiter(ClockTestCase):
+    """
+    Requests to a host are limited by a token bucket and an AIMD concurrency limit
+    """
+
+    """
+    OK
+    the burst is sent at once, then tokens come at the rate of the host
+    """
+    def test_token_bucket(self):
+        limiter = rate_limit.HostLimiter("example.com", rate=2.0, burst=2, max_concurrency=8)
+        self.assertEqual(limiter.reserve(), 0)
+        self.assertEqual(limiter.reserve(), 0)
+        self.assertAlmostEqual(limiter.reserve(), 0.5)
+        self.clock.sleep(0.5)
+        self.assertEqual(limiter.reserve(), 0)
+
+    """
+    OK
+    the concurrency limit grows with successes and shrinks with errors and slow responses
+    """
+    def test_aimd(self):
+        limiter = rate_limit.HostLimiter("example.com", rate=100.0, burst=100, max_concurrency=4)
+        self.assertEqual(limiter.limit, 2)
+        limiter.reserve(), limiter.reserve()
+        self.assertEqual(limiter.reserve(), rate_limit.POLL_INTERVAL)
+        limiter.release(0.1)
+        self.assertEqual(limiter.limit, 2.5)
+        limiter.reserve()
+        limiter.release(0.1, error=True)
+        self.assertAlmostEqual(limiter.limit, 2.5 * 0.75)
+        limiter.reserve()
+        limiter.release(2.0)
+        self.assertAlmostEqual(limiter.limit, 2.5 * 0.75 * 0.9)
+        for _ in range(50):
+            limiter.reserve()
+            limiter.release(0.1)
+        self.assertEqual(limiter.limit, 4)
+
+    """
+    OK
+    throttling blocks the host for Retry-After, or a backoff doubled until a success
+    """
+    def test_throttling(self):
+        limiter = rate_limit.HostLimiter("example.com", rate=100.0, burst=100, max_concurrency=4)
+        for backoff in [1, 2, 4]:
+            limiter.reserve()
+            limiter.release(0.1, status=503)
+            self.assertEqual(limiter.reserve(), backoff)
+            self.clock.sleep(backoff)
+        self.assertEqual(limiter.limit, 1)
+        limiter.reserve()
+        limiter.release(0.1, status=429, retry_after=10)
+        self.assertEqual(limiter.reserve(), 10)
+        self.clock.sleep(10)
+        limiter.reserve()
+        limiter.release(0.1, status=200)
+        self.assertEqual(limiter.backoff, rate_limit.INITIAL_BACKOFF)
+        self.assertEqual(limiter.stats()["throttled"], 4)
+
+class TestRateLimitedTransport(ClockTestCase):
+    """
+    Throttled GET requests are sent again once the host accepts requests
+    """
+
+    def get_client(self, statuses: list) -> httpx.Client:
+        self.calls = []
+        def handler(request):
+            self.calls.append(request.method)
+            status = statuses[min(len(self.calls), len(statuses)) - 1]
+            return httpx.Response(status, headers={"Retry-After": "3"} if status == 429 else {})
+        return httpx.Client(transport=rate_limit.RateLimitedTransport(httpx.MockTransport(handler)))
+
+    """
+    OK
+    a 429 response is retried after its Retry-After
+    """
+    def test_retry(self):
+        response = self.get_client([429, 200]).get("https://example.com/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.calls, ["GET", "GET"])
+        self.assertGreaterEqual(self.clock.slept, 3)
+
+    """
+    KO
+    other methods are not retried, and retries are bounded
+    """
+    def test_no_retry(self):
+        self.assertEqual(self.get_client([429, 200]).post("https://example.com/").status_code, 429)
+        self.assertEqual(self.calls, ["POST"])
+        self.assertEqual(self.get_client([503]).get("https://example.com/").status_code, 503)
+        self.assertEqual(len(self.calls), rate_limit.MAX_RETRIES + 1)
+
+    """
+    OK
+    a request cancelled by its caller does not change the limits of the host
+    """
+    def test_cancelled(self):
+        async def handler(request):
+            await trio.sleep_forever()
+        async def main():
+            async with httpx.AsyncClient(transport=rate_limit.AsyncRateLimitedTransport(httpx.MockTransport(handler))) as client:
+                with trio.move_on_after(0.01):
+                    await client.get("https://example.com/")
+        trio.run(main)
+        stats = rate_limit.RateLimiter().get("https://example.com/").stats()
+        self.assertEqual((stats["in_flight"], stats["errors"], stats["limit"]), (0, 0, 2))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+import os
+import tempfile
+from opp import fingerprint_handler
+from opp import footprint
+from opp import ftype
+from opp import refresh
+from opp import search
+from opp import storage
+
+def build_tree(children: list, initial_filters: list = []) -> footprint.Footprint:
+    """ This function builds a fingerprint without any search : a name, one of its profiles, and the footprints found on the profile.
+
+    Args:
+        children (list): Results of the profile.
+        initial_filters (list, optional): Initial filters of the fingerprint. Defaults to [].
+
+    Returns:
+        footprint.Footprint: Root of the fingerprint.
+    """
+    fingerprint = fingerprint_handler.FingerprintHandler(target="Paul Martin", search_depth=3, initial_filters=initial_filters)
+    root = footprint.RecursionHandler.get_root(fingerprint=fingerprint, target=fingerprint.target, search_depth=fingerprint.search_depth, initial_filters=initial_filters)
+    profile = root.add_child(ftype.Result("url", "https://github.com/paulmartin", "google"))
+    for child in children:
+        profile.add_child(child)
+    return root
+
+class TestPreviousFingerprint(unittest.TestCase):
+    """
+    A stored fingerprint is reused by a new run of the same target, with the same settings
+    """
+
+    CHILDREN = [ftype.Result("location", "Paris", "github_scrapper"), ftype.Result("description", "Developer", "github_scrapper")]
+    FILTERS = [{"value": "Paris", "type": "location", "positive": True}]
+    SETTINGS = search.SearchContext(active_search=True, osint_allow=["holehe_github"]).get_settings()
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db = storage.Storage(os.path.join(self.directory.name, "opp.db"))
+        self.root = build_tree(self.CHILDREN, [dict(f) for f in self.FILTERS])
+        self.profile = self.root.children_footprints[0]
+        self.db.store_graph(self.root, initial_filters=self.FILTERS, fetched_at={self.root.key: None}, search_context=self.SETTINGS)
+
+    def tearDown(self):
+        self.db.db_conn.close()
+        self.directory.cleanup()
+
+    def load(self, initial_filters: list = None, search_context: dict = None) -> refresh.PreviousFingerprint:
+        return refresh.PreviousFingerprint.load(self.db, "paul martin", dict(refresh.DEFAULT_TTL, scrap=3600),
+                                                initial_filters=self.FILTERS if initial_filters is None else initial_filters,
+                                                search_context=self.SETTINGS if search_context is None else search_context)
+
+    """
+    OK
+    results younger than their lifetime are reused, older ones are not
+    """
+    def test_ttl(self):
+        previous = self.load()
+        results, fetched_at = previous.get_fresh_results(self.profile)
+        self.assertEqual(results, self.CHILDREN)
+        self.assertIsNone(previous.get_fresh_results(self.profile, now=fetched_at + 3601))
+
+    """
+    OK
+    footprints which were not investigated, and terminal footprints, have no results to reuse
+    """
+    def test_not_fetched(self):
+        previous = self.load()
+        self.assertIsNone(previous.get_fresh_results(self.root))
+        self.assertIsNone(previous.get_fresh_results(self.profile.children_footprints[1]))
+
+    """
+    OK
+    filters in another order, case or spacing are the same settings
+    """
+    def test_same_settings(self):
+        self.assertIsNotNone(self.load(initial_filters=[{"value": " PARIS", "type": "location", "positive": True}]))
+
+    """
+    KO
+    a run with other initial filters or search settings is not reused
+    """
+    def test_other_settings(self):
+        self.assertIsNone(self.load(initial_filters=[]))
+        self.assertIsNone(self.load(initial_filters=[{"value": "Paris", "type": "location", "positive": False}]))
+        self.assertIsNone(self.load(search_context=search.SearchContext(active_search=True).get_settings()))
+        self.assertIsNone(self.load(search_context=search.SearchContext().get_settings()))
+
+    """
+    OK
+    values found again are not changes, whatever their case
+    """
+    def test_diff(self):
+        new_root = build_tree([ftype.Result("location", "PARIS", "github_scrapper"), ftype.Result("email", "paul@martin.fr", "github_scrapper")], self.FILTERS)
+        changes = self.load().diff(new_root)
+        self.assertEqual(changes["added"], [{"type": "email", "value": "paul@martin.fr", "method": "github_scrapper"}])
+        self.assertEqual(changes["removed"], [{"type": "description", "value": "Developer", "method": "github_scrapper"}])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,255 @@
+import unittest
+from unittest import mock
+import os
+import time
+from opp import scrap
+from opp import ftype
+from opp import extract
+from opp import parse_pool
+from opp import deadline
+
+class TestScrapParse(unittest.TestCase):
+    """
+    Scrappers are given saved pages, so no request is done
+    """
+
+    """
+    OK
+    nitter profile card
+    """
+    def test_twitter(self):
+        content = b'<a class="profile-card-fullname">Paul Martin</a><a class="profile-card-username">@paulmartin</a><div class="profile-bio"> Developer </div>'
+        result = scrap.Scrap("https://twitter.com/paulmartin", content).scrapper.result
+        self.assertEqual(result, [
+            ftype.Result("name", "Paul Martin", "twitter_scrapper"),
+            ftype.Result("username", "@paulmartin", "twitter_scrapper"),
+            ftype.Result("description", "Developer", "twitter_scrapper")
+        ])
+
+    """
+    OK
+    social links are only read when a website is displayed, one link per social media
+    """
+    def test_github(self):
+        content = b'<span class="vcard-fullname">Paul Martin</span><li class="vcard-detail" itemprop="url">https://paulmartin.fr</li>' \
+                  b'<li class="vcard-detail" itemprop="social"><a href="https://twitter.com/paulmartin">@paulmartin</a></li>' \
+                  b'<li class="vcard-detail" itemprop="social"><a href="https://mastodon.social/@paulmartin">@paulmartin</a> <a href="https://mastodon.social/about">about</a></li>'
+        result = scrap.Scrap("https://github.com/paulmartin", content).scrapper.result
+        self.assertEqual(result, [
+            ftype.Result("name", "Paul Martin", "github_scrapper"),
+            ftype.Result("url", "https://paulmartin.fr", "github_scrapper"),
+            ftype.Result("url", "https://twitter.com/paulmartin", "github_scrapper"),
+            ftype.Result("url", "https://mastodon.social/@paulmartin", "github_scrapper")
+        ])
+        self.assertEqual(scrap.Scrap("https://github.com/paulmartin", content.replace(b'itemprop="url"', b'itemprop="email"')).scrapper.result,
+                         [ftype.Result("name", "Paul Martin", "github_scrapper")])
+
+    """
+    OK
+    authwall : no name means no result
+    """
+    def test_linkedin_authwall(self):
+        content = b'<div class="top-card-layout__headline">Developer</div>'
+        self.assertEqual(scrap.Scrap("https://fr.linkedin.com/in/paulmartin", content).scrapper.result, [])
+
+    """
+    OK
+    a tiktok page which is not a profile is not fetched
+    """
+    def test_tiktok_not_profile(self):
+        self.assertEqual(scrap.Scrap("https://www.tiktok.com/discover").scrapper.result, [])
+
+    """
+    OK
+    generic pages are not scrapped
+    """
+    def test_generic(self):
+        self.assertEqual(scrap.Scrap("https://example.com/paulmartin").scrapper.result, [])
+
+class TestScrapperRegistry(unittest.TestCase):
+    """
+    Scrappers are found from the host of the URL
+    """
+
+    """
+    OK
+    exact hosts, case insensitive, and unknown hosts
+    """
+    def test_hosts(self):
+        registry = scrap.ScrapperRegistry()
+        self.assertIs(registry.get("https://Mobile.Twitter.com/paulmartin"), scrap.TwitterScrapper)
+        self.assertIs(registry.get("https://us.linkedin.com/in/paulmartin"), scrap.LinkedinScrapper)
+        self.assertIs(registry.get("https://linkedin.com/in/paulmartin"), scrap.GenericScrapper)
+        self.assertIs(registry.get("not an url"), scrap.GenericScrapper)
+
+    """
+    OK
+    domain patterns match subdomains only, built-in scrappers are kept
+    """
+    def test_patterns(self):
+        registry = scrap.ScrapperRegistry.create()
+        registry.register(scrap.GenericScrapper, ("*.example.com", "github.com"))
+        self.assertIs(registry.match("https://blog.paul.example.com/"), scrap.GenericScrapper)
+        self.assertIsNone(registry.match("https://example.com/"))
+        self.assertIs(registry.get("https://github.com/paulmartin"), scrap.GithubScrapper)
+
+    """
+    OK
+    a third-party scrapper is imported when an URL first matches one of its patterns, once for all its patterns
+    """
+    def test_entry_points(self):
+        loads = []
+        class FakeEntryPoint:
+            def __init__(self, name):
+                self.name = name
+                self.value = "paulmartin.scrappers:PaulScrapper"
+            def load(self):
+                loads.append(self.name)
+                return scrap.GenericScrapper
+        fake_entry_points = [FakeEntryPoint("*.example.org"), FakeEntryPoint("paul.example.net")]
+        with mock.patch.object(scrap, "entry_points", lambda group: fake_entry_points if group == scrap.ENTRY_POINT_GROUP else []):
+            registry = scrap.ScrapperRegistry.create()
+        self.assertIs(registry.match("https://blog.example.org/"), fake_entry_points[0])
+        self.assertIs(registry.get("https://twitter.com/paulmartin"), scrap.TwitterScrapper)
+        self.assertEqual(loads, [])
+        self.assertIs(registry.get("https://blog.example.org/"), scrap.GenericScrapper)
+        self.assertIs(registry.get("https://paul.example.net/"), scrap.GenericScrapper)
+        self.assertIs(registry.get("https://www.example.org/"), scrap.GenericScrapper)
+        self.assertEqual(loads, ["*.example.org"])
+        self.assertIs(registry.match("https://paul.example.net/"), scrap.GenericScrapper)
+
+class TestExtractor(unittest.TestCase):
+    """
+    Fields are extracted in a single walk, with each installed parser backend
+    """
+
+    """
+    OK
+    descendant, class and attribute selectors, first match or all matches
+    """
+    def test_selectors(self):
+        extractor = extract.Extractor([
+            extract.Field("name", "div.card h1"),
+            extract.Field("url", 'ul li[itemprop="social"] a', attribute="href", all=True),
+            extract.Field("image", ".avatar", attribute="src", transform=extract.strip_query)
+        ])
+        content = b'<h1>Menu</h1><div class="card main"><h1> Paul Martin </h1><h1>Other</h1><img class="avatar" src="/paul.png?s=40"></div>' \
+                  b'<ul><li itemprop="social"><a href="https://twitter.com/paulmartin">t</a></li><li><a href="/home">h</a></li>' \
+                  b'<li itemprop="social"><a href="https://github.com/paulmartin">g</a></li></ul>'
+        for backend in extract.available_backends():
+            self.assertEqual(extractor.extract(content, "test", backend=backend), [
+                ftype.Result("name", "Paul Martin", "test"),
+                ftype.Result("url", "https://twitter.com/paulmartin", "test"),
+                ftype.Result("url", "https://github.com/paulmartin", "test"),
+                ftype.Result("image", "/paul.png", "test")
+            ], backend)
+
+    """
+    OK
+    first match inside each element matched by the outermost selector
+    """
+    def test_first_per_ancestor(self):
+        extractor = extract.Extractor([
+            extract.Field("url", "li a", attribute="href", all=True, first_per_ancestor=True),
+            extract.Field("url", "a.social", attribute="href", all=True, first_per_ancestor=True)
+        ])
+        content = b'<ul><li><a>no link</a><span><a href="/a1">a</a></span><a href="/a2">a</a></li><li><a href="/b1">b</a></li></ul>' \
+                  b'<a class="social" href="/s1">s</a><a class="social" href="/s2">s</a>'
+        for backend in extract.available_backends():
+            self.assertEqual(extractor.extract(content, "test", backend=backend), [
+                ftype.Result("url", "/a1", "test"),
+                ftype.Result("url", "/b1", "test"),
+                ftype.Result("url", "/s1", "test"),
+                ftype.Result("url", "/s2", "test")
+            ], backend)
+
+    """
+    OK
+    required fields and fields requiring another one
+    """
+    def test_required(self):
+        extractor = extract.Extractor([
+            extract.Field("name", "h1", required=True),
+            extract.Field("url", "a.website", attribute="href", name="website"),
+            extract.Field("url", "a.social", attribute="href", requires="website")
+        ])
+        for backend in extract.available_backends():
+            self.assertEqual(extractor.extract(b'<a class="website" href="/">w</a>', "test", backend=backend), [], backend)
+            self.assertEqual(extractor.extract(b'<h1>Paul</h1><a class="social" href="/s">s</a>', "test", backend=backend),
+                             [ftype.Result("name", "Paul", "test")], backend)
+
+    """
+    OK
+    attributes without value match presence selectors, and empty values
+    """
+    def test_attribute_without_value(self):
+        extractor = extract.Extractor([
+            extract.Field("name", "span[itemprop][hidden]"),
+            extract.Field("username", 'span[data-user=""]')
+        ])
+        content = b'<span itemprop="name" hidden>Paul Martin</span><span data-user>paulm</span>'
+        for backend in extract.available_backends():
+            self.assertEqual(extractor.extract(content, "test", backend=backend),
+                             [ftype.Result("name", "Paul Martin", "test"), ftype.Result("username", "paulm", "test")], backend)
+
+    """
+    OK
+    the default backend is only looked for once
+    """
+    def test_default_backend(self):
+        default = extract.get_backend()
+        with mock.patch.object(extract, "available_backends", side_effect=AssertionError):
+            self.assertIs(extract.get_backend(), default)
+            extract.Extractor([extract.Field("name", "h1")]).extract(b"<h1>Paul</h1>", "test")
+
+    """
+    KO
+    unsupported selectors and unknown backends
+    """
+    def test_errors(self):
+        self.assertRaises(ValueError, extract.Field, "name", "div > h1")
+        self.assertRaises(ValueError, extract.Extractor, [extract.Field("url", "a", requires="website")])
+        self.assertRaises(ValueError, extract.get_backend, "html5lib")
+
+class TestParsePool(unittest.TestCase):
+    """
+    Pages are parsed in a pool of processes, which returns plain records
+    """
+
+    def tearDown(self):
+        parse_pool.ParsePool.configure(workers=0)
+
+    """
+    OK
+    records of a page, in the calling thread and in a worker
+    """
+    def test_extract(self):
+        content = b'<span class="vcard-fullname">Paul Martin</span><span class="vcard-username">paulmartin</span>'
+        records = parse_pool.extract_records(scrap.GithubScrapper, content)
+        self.assertEqual(records, [
+            {"type": "name", "value": "Paul Martin", "method": "github_scrapper"},
+            {"type": "username", "value": "paulmartin", "method": "github_scrapper"}
+        ])
+        parse_pool.ParsePool.configure(workers=1, max_in_flight=1)
+        result = scrap.Scrap("https://github.com/paulmartin", content).scrapper.result
+        self.assertEqual(result, [ftype.Result(**record) for record in records])
+        self.assertEqual(parse_pool.ParsePool().stats()["parsed"], 1)
+
+    """
+    KO
+    a page not parsed before the deadline
+    """
+    def test_deadline(self):
+        parse_pool.ParsePool.configure(workers=1, max_in_flight=1)
+        with deadline.scope(time.monotonic() + 0.001):
+            self.assertRaises(deadline.DeadlineExceeded, parse_pool.ParsePool().extract, scrap.GithubScrapper, b'<span class="vcard-fullname">Paul Martin</span>')
+
+    """
+    OK/KO
+    options are read from the environment when the pool is created, malformed ones are reported
+    """
+    def test_environment(self):
+        with mock.patch.dict(os.environ, {"OPP_PARSE_WORKERS": "0", "OPP_PARSE_MAX_IN_FLIGHT": "3"}):
+            self.assertEqual(parse_pool.ParsePool.configure().max_in_flight, 3)
+        with mock.patch.dict(os.environ, {"OPP_PARSE_WORKERS": "two"}):
+            self.assertRaisesRegex(ValueError, "OPP_PARSE_WORKERS", parse_pool.ParsePool.configure)
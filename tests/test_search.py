@@ -0,0 +1,54 @@
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import time
+import httplib2
+from opp import deadline
+from opp import search
+
+class OKHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, format, *args):
+        pass
+
+class TestHttpTimeout(unittest.TestCase):
+    """
+    The HTTP connection of a thread is kept between requests, its timeout follows the deadline of the run
+    """
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), OKHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    """
+    OK
+    the open connection is reused with the timeout left before the deadline
+    """
+    def test_reuse(self):
+        http = httplib2.Http(timeout=search.CSE_TIMEOUT)
+        http.request(self.url)
+        connection = next(iter(http.connections.values()))
+        sock = connection.sock
+        with deadline.scope(time.monotonic() + 2):
+            search.set_http_timeout(http, deadline.clip(search.CSE_TIMEOUT))
+        self.assertLessEqual(sock.gettimeout(), 2)
+        http.request(self.url)
+        self.assertIs(next(iter(http.connections.values())).sock, sock)
+        search.set_http_timeout(http, search.CSE_TIMEOUT)
+        self.assertEqual(sock.gettimeout(), search.CSE_TIMEOUT)
+        self.assertEqual(http.timeout, search.CSE_TIMEOUT)
+
+if __name__ == '__main__':
+    unittest.main()